@@ -0,0 +1,291 @@
+"""
+Benchmarks of every generation stage over a sweep of square grid sizes.
+
+    python -m benchmarks --sizes 128 512 --output results.json
+    python -m benchmarks --baseline baseline.json   # Exit status 1 on regressions
+
+Each case is timed BENCHMARK_REPEATS times (the fastest run counts), then run once more under
+tracemalloc for its peak memory, so tracing never slows the timed runs.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from utilities.logger import Profiler
+from config import (
+    GRID_SIZE,
+    MAX_ELEVATION,
+    MAX_DEPTH,
+    SEED,
+    PERLIN_SCALE,
+    PERLIN_OCTAVES,
+    VORONOI_REGIONS,
+    VORONOI_SITE_SPACING,
+    EROSION_ITERATIONS,
+    BENCHMARK_SIZES,
+    BENCHMARK_BATCH_SEEDS,
+    BENCHMARK_REPEATS,
+    BENCHMARK_TOLERANCE,
+)
+
+
+@dataclass
+class Case:
+    """
+    A benchmark: setup(size) prepares the inputs outside the timing, and run(inputs) is timed.
+
+    Attributes:
+        name (str): Name used in the results.
+        setup (Callable[[int], Any]): Builds the inputs for a size x size grid.
+        run (Callable[[Any], Any]): The timed work.
+        max_size (int): Larger sizes of the sweep are skipped (for the slowest stages).
+        teardown (Optional[Callable[[Any], None]]): Releases the inputs (temporary files, ...).
+    """
+    name: str
+    setup: Callable[[int], Any]
+    run: Callable[[Any], Any]
+    max_size: int = max(BENCHMARK_SIZES)
+    teardown: Optional[Callable[[Any], None]] = None
+
+
+@dataclass
+class Result:
+    """Measurements of one case at one size."""
+    case: str
+    size: int
+    cells: int
+    seconds: float
+    cells_per_second: float
+    peak_bytes: int
+
+
+def _heightmap(size: int) -> np.ndarray:
+    from terrain.noise_ops import PerlinNoise
+
+    return PerlinNoise(scale=PERLIN_SCALE * 128 / size, seed=SEED, octaves=4).generate((size, size)) * 0.5 + 0.5
+
+
+def _perlin(size: int) -> Any:
+    from terrain.noise_ops import PerlinNoise
+
+    return PerlinNoise(scale=PERLIN_SCALE, seed=SEED, octaves=PERLIN_OCTAVES), size
+
+
+def _voronoi(size: int) -> Any:
+    from terrain.noise_ops import VoronoiNoise
+
+    # Keep the configured site density rather than the configured site count (world windows place
+    # one site per VORONOI_SITE_SPACING cells whatever the size)
+    regions = max(1, round(VORONOI_REGIONS * size * size / (GRID_SIZE[0] * GRID_SIZE[1])))
+    return VoronoiNoise(regions=regions, seed=SEED, spacing=VORONOI_SITE_SPACING), size
+
+
+def _erosion(size: int) -> Any:
+    return _heightmap(size)
+
+
+def _run_erosion(heightmap: np.ndarray) -> Any:
+    from terrain.erosion import Erosion
+
+    return Erosion.apply(heightmap, iterations=EROSION_ITERATIONS, rng=np.random.default_rng(SEED))
+
+
+def _labels(size: int) -> Any:
+    return _voronoi(size)[0].generate_regions((size, size))[0]
+
+
+def _run_voronoi_map(labels: np.ndarray) -> Any:
+    from maps.voronoi_map import VoronoiMap
+
+    return VoronoiMap.from_labels(labels)
+
+
+def _grid(size: int) -> Any:
+    return size, _heightmap(size) * (MAX_ELEVATION + MAX_DEPTH) - MAX_DEPTH
+
+
+def _run_grid(inputs: Any) -> Any:
+    from maps.grid import Grid2D
+
+    size, elevation = inputs
+    grid = Grid2D((size, size), MAX_ELEVATION, MAX_DEPTH)
+    grid.set_elevation_map(elevation)
+    return grid.elevation_map().sum(), grid.type_map().max(), grid.get_cell(size // 2, size // 2)
+
+
+def _run_viewshed(inputs: Any) -> Any:
+    from terrain.viewshed import LineOfSight
+
+    size, elevation = inputs
+    return LineOfSight().viewshed(elevation, (size // 2, size // 2))
+
+
+def _orchestrator(size: int) -> Any:
+    from maps.map_orchestrator import MapOrchestrator
+
+    return MapOrchestrator(size=(size, size), max_elevation=MAX_ELEVATION, max_depth=MAX_DEPTH, seed=SEED)
+
+
+def _run_graph(orchestrator: Any) -> Any:
+    orchestrator.initialize_graph()
+    return orchestrator.graph.csr()
+
+
+def _batch(size: int) -> Any:
+    from terrain.batch import BatchGenerator
+
+    return BatchGenerator((size, size), max_elevation=MAX_ELEVATION, max_depth=MAX_DEPTH)
+
+
+def _run_batch(batch: Any) -> Any:
+    return batch.sweep(range(SEED, SEED + BENCHMARK_BATCH_SEEDS))
+
+
+def _world(size: int) -> Any:
+    from maps.height_map import HeightMap
+    from world.world_data import WorldData
+
+    world = WorldData(meta_data={"width": size, "height": size, "seed": SEED})
+    heights = HeightMap(width=size, height=size)
+    heights.grid = _heightmap(size).astype(np.float32)
+    heights.normal_grid = heights.grid
+    world.add_map("heights", heights)
+    return world, tempfile.mkdtemp(prefix="benchmark-world-")
+
+
+def _saved_world(size: int) -> Any:
+    world, directory = _world(size)
+    world.save(directory)
+    return world, directory
+
+
+def _run_world_load(inputs: Any) -> Any:
+    from world.world_data import WorldData
+
+    world = WorldData.load(inputs[1])
+    return float(world.get_map("heights").grid.sum())  # Touch every page of the memory map
+
+
+def _remove_world(inputs: Any) -> None:
+    shutil.rmtree(inputs[1], ignore_errors=True)
+
+
+CASES: List[Case] = [
+    Case("perlin_generate", _perlin, lambda inputs: inputs[0].generate((inputs[1], inputs[1]))),
+    Case("voronoi_generate", _voronoi, lambda inputs: inputs[0].generate_window((inputs[1], inputs[1]))),
+    Case("voronoi_map", _labels, _run_voronoi_map),
+    Case("erosion_apply", _erosion, _run_erosion, max_size=1024),
+    Case("grid2d", _grid, _run_grid),
+    Case("viewshed", _grid, _run_viewshed),
+    Case("batch_sweep", _batch, _run_batch, max_size=512),
+    Case("initialize_graph", _orchestrator, _run_graph),
+    Case("world_save", _world, lambda inputs: inputs[0].save(inputs[1]), teardown=_remove_world),
+    Case("world_load", _saved_world, _run_world_load, teardown=_remove_world),
+]
+
+
+def measure(case: Case, size: int, repeats: int = BENCHMARK_REPEATS) -> Result:
+    """Times one case at one size, then measures its peak memory in a separate traced run."""
+    inputs = case.setup(size)
+    try:
+        seconds = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            case.run(inputs)
+            seconds = min(seconds, (time.perf_counter_ns() - start) / 1e9)
+        profiler = Profiler(trace_memory=True)
+        with profiler.span(case.name):
+            case.run(inputs)
+        peak_bytes = profiler.stages[case.name]["peak_bytes"]
+    finally:
+        if case.teardown is not None:
+            case.teardown(inputs)
+    cells = size * size
+    return Result(case.name, size, cells, seconds, cells / seconds if seconds > 0 else float("inf"), peak_bytes)
+
+
+def run_benchmarks(sizes: Sequence[int] = BENCHMARK_SIZES, cases: Optional[Sequence[str]] = None,
+                   repeats: int = BENCHMARK_REPEATS) -> List[Result]:
+    """Runs the selected cases (all by default) over the sizes, printing each result as it comes."""
+    selected = [case for case in CASES if cases is None or case.name in cases]
+    results = []
+    for case in selected:
+        for size in sizes:
+            if size > case.max_size:
+                continue
+            result = measure(case, size, repeats)
+            results.append(result)
+            print(f"{result.case:<18} {size:>6}  {result.seconds:>10.4f} s  {result.cells_per_second:>14,.0f} cells/s  {result.peak_bytes / 2**20:>9.1f} MiB")
+    return results
+
+
+def save_results(results: Sequence[Result], path: str) -> None:
+    """Writes results, with the machine they ran on, as JSON."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({
+            "machine": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(), "cpus": os.cpu_count()},
+            "results": [asdict(result) for result in results],
+        }, file, indent=4)
+
+
+def load_results(path: str) -> List[Result]:
+    """Reads results written by save_results."""
+    with open(path, "r") as file:
+        return [Result(**result) for result in json.load(file)["results"]]
+
+
+def compare(results: Sequence[Result], baseline: Sequence[Result], tolerance: float = BENCHMARK_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Matches results with the baseline by case and size. Returns one row per match, with the time
+    ratio (current / baseline) and whether it is a regression (slower by more than tolerance).
+    """
+    reference = {(result.case, result.size): result for result in baseline}
+    rows = []
+    for result in results:
+        if (result.case, result.size) not in reference:
+            continue
+        before = reference[(result.case, result.size)]
+        ratio = result.seconds / before.seconds if before.seconds > 0 else float("inf")
+        rows.append({
+            "case": result.case,
+            "size": result.size,
+            "baseline_seconds": before.seconds,
+            "seconds": result.seconds,
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance,
+        })
+    return rows
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Command line entry point; returns 1 if a comparison found regressions."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the generation stages.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(BENCHMARK_SIZES), help="Square grid sides to sweep.")
+    parser.add_argument("--cases", nargs="+", choices=[case.name for case in CASES], help="Cases to run (default: all).")
+    parser.add_argument("--repeats", type=int, default=BENCHMARK_REPEATS, help="Timed runs per case and size.")
+    parser.add_argument("--output", default="benchmarks/results.json", help="Where to write the results.")
+    parser.add_argument("--baseline", help="Results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE, help="Allowed slowdown before a regression.")
+    arguments = parser.parse_args(argv)
+
+    results = run_benchmarks(arguments.sizes, arguments.cases, arguments.repeats)
+    save_results(results, arguments.output)
+    print(f"Results written to {arguments.output}.")
+    if not arguments.baseline:
+        return 0
+    rows = compare(results, load_results(arguments.baseline), arguments.tolerance)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<18} {row['size']:>6}  {row['baseline_seconds']:>10.4f} s -> {row['seconds']:>10.4f} s  x{row['ratio']:.2f}  {flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{regressions} regression(s) against {arguments.baseline}.")
+    return 1 if regressions else 0
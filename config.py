@@ -1,5 +1,5 @@
 
-from typing import Tuple
+from typing import Optional, Tuple
 
 # Logging settings
 LOGGING_LEVEL = "DEBUG"  # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL
@@ -9,6 +9,12 @@ VERBOSE_LOGGING = False  # Enable/disable verbose logging
 LOG_FILE_PATH = "logs/app.log"  # Path for the log file
 DEBUG_OUTPUT_FILE = "logs/debug_output.log"  # Path for debug output
 
+# Profiling settings
+LOG_METHOD_ENABLED = True  # False makes LoggerUtility.log_method return methods untouched (no logging, no timing)
+PROFILE_MEMORY = False  # Record each span's peak traced memory with tracemalloc (slows allocation-heavy code)
+PROFILE_MAX_RECORDS = 10000  # Individual spans kept for the report's timeline; per-stage totals are always kept
+PROFILE_REPORT_PATH = "logs/profile.json"  # Per-run JSON report of stage timings
+
 
 # Grid settings
 GRID_SIZE: Tuple[int, int] = (500, 500)  # X and Y dimensions
@@ -18,8 +24,105 @@ SEED: int = 42  # Random seed for reproducibility
 
 # Noise settings
 PERLIN_SCALE: float = 0.1
+PERLIN_OCTAVES: int = 1
+PERLIN_PERSISTENCE: float = 0.5  # Amplitude multiplier between octaves
+PERLIN_LACUNARITY: float = 2.0  # Frequency multiplier between octaves
+PERLIN_CHUNK_ROWS: Optional[int] = None  # Rows of noise evaluated at once (None = whole grid)
 VORONOI_REGIONS: int = 10
+VORONOI_SITE_SPACING: float = (GRID_SIZE[0] * GRID_SIZE[1] / VORONOI_REGIONS) ** 0.5  # World cells between sites
 
 # Erosion settings
-EROSION_ITERATIONS: int = 5
-        
\ No newline at end of file
+EROSION_ITERATIONS: int = 50  # Hydraulic erosion steps per erosion tile
+EROSION_TILE_SIZE: int = 256  # Erosion runs on world-aligned tiles of this size, seeded per tile
+EROSION_TILE_HALO: int = 16  # Extra cells simulated around each erosion tile so flow crosses tile borders
+EROSION_TILE_CACHE_SIZE: int = 64  # Eroded tiles kept in memory per generator (least recently used are dropped)
+EROSION_TIME_STEP: float = 0.05
+EROSION_RAIN_RATE: float = 0.02  # Mean rainfall per unit time
+EROSION_EVAPORATION_RATE: float = 0.05  # Fraction of water evaporating per unit time
+EROSION_SEDIMENT_CAPACITY: float = 1.0
+EROSION_DISSOLVE_RATE: float = 0.3
+EROSION_DEPOSITION_RATE: float = 0.3
+EROSION_MAX_DEPTH: float = 0.1  # Water depth at which flow reaches full sediment capacity
+EROSION_HEIGHT_SCALE: float = 20.0  # Vertical exaggeration while simulating (noise units to cell widths)
+
+# Batch settings
+BATCH_CHUNK_WORLDS: int = 8  # Worlds generated together (memory grows with it times the erosion tile area)
+BATCH_HISTOGRAM_BINS: int = 24  # Elevation bins of the per-world histogram, from 0 to MAX_ELEVATION + MAX_DEPTH
+
+# Hydrology settings
+RIVER_ACCUMULATION_THRESHOLD: float = 100.0  # Upstream area (cells) from which a cell is part of a river
+
+# Climate settings
+CLIMATE_WIND_DIRECTION: float = 270.0  # Degrees clockwise from north (up) the prevailing wind blows from
+CLIMATE_HUMIDITY: float = 1.0  # Moisture of the air entering the map, in precipitation units
+CLIMATE_BASE_RATE: float = 0.002  # Fraction of the air's moisture raining out per cell over flat ground
+CLIMATE_OROGRAPHIC_RATE: float = 2.0  # Extra fraction raining out per unit of upslope grade (rise / run)
+CLIMATE_LEE_DRYING: float = 20.0  # Rain on downslopes is damped by exp(-drying * grade)
+CLIMATE_MAX_RAIN_FRACTION: float = 0.5  # Upper bound of the fraction raining out per cell
+CLIMATE_OCEAN_RECHARGE: float = 0.05  # Fraction of the missing moisture the air regains per cell over water
+CLIMATE_SCAN_BLOCK: int = 64  # Rows along the wind scanned at once
+
+# Biome settings
+BIOME_NORTH_TEMPERATURE: float = 0.0  # Mean sea-level temperature (degrees C) along the top edge of the map (y = 0)
+BIOME_SOUTH_TEMPERATURE: float = 26.0  # Mean sea-level temperature along the bottom edge
+BIOME_LAPSE_RATE: float = 6.5  # Degrees C lost per kilometer of elevation
+BIOME_TEMPERATURE_LEVELS: Tuple[float, ...] = (-5.0, 5.0, 18.0)  # Temperature bin edges (polar, boreal, temperate, tropical)
+BIOME_MOISTURE_LEVELS: Tuple[float, ...] = (0.0005, 0.001, 0.002, 0.005)  # Precipitation bin edges, per cell
+
+# Pathfinding settings
+PATH_CELL_SIZE: float = 1.0  # Kilometers between neighbouring cell centres
+PATH_UPHILL_WEIGHT: float = 10.0  # Extra cost per unit of uphill grade (rise / run)
+PATH_DOWNHILL_WEIGHT: float = 5.0  # Extra cost per unit of downhill grade
+PATH_MAX_GRADE: float = 1.0  # Steeper steps are impassable
+PATH_WATER_COST: float = 10.0  # Extra cost per cell of distance over water (inf = impassable)
+PATH_FIELD_CACHE_SIZE: int = 16  # Distance fields kept per cost function (least recently used are dropped)
+PATH_FIELD_MIN_TARGETS: int = 4  # Sources with this many targets in a batch get a reusable distance field
+
+# Viewshed settings
+VIEWSHED_OBSERVER_HEIGHT: float = 0.02  # Kilometers of the observer's eye above the ground (a 20 m tower)
+VIEWSHED_TARGET_HEIGHT: float = 0.0  # Kilometers above the ground of the point that must be seen
+VIEWSHED_MAX_DISTANCE: float = float("inf")  # Cells; farther cells are never visible
+VIEWSHED_CHUNK_SAMPLES: int = 1 << 22  # Ray samples processed at once
+
+# Spatial index settings
+SPATIAL_INDEX_LEAF: int = 8  # Cells per side of the blocks of the finest pyramid level
+SPATIAL_INDEX_CHUNK_CELLS: int = 1 << 20  # Cells read at once when (re)building the finest level
+
+# World file settings
+WORLD_CHUNK_ROWS: int = 256  # Rows of a map array copied at once when saving a world
+
+# Rendering settings
+RENDER_OUTPUT_DIR: str = "output/tiles"  # Root of the z/x/y.png tile pyramid
+RENDER_TILE_SIZE: int = 256  # Pixels per tile side
+RENDER_HILLSHADE: bool = True  # Shade the colormap by the terrain's relief
+RENDER_HILLSHADE_AZIMUTH: float = 315.0  # Degrees clockwise from north (up)
+RENDER_HILLSHADE_ALTITUDE: float = 45.0  # Degrees above the horizon
+RENDER_HILLSHADE_EXAGGERATION: float = 10.0  # Vertical exaggeration of the elevation (kilometers per cell)
+RENDER_PNG_COMPRESSION: int = 1  # zlib level, 0-9 (higher is smaller and slower)
+RENDER_WORKERS: int = 8  # Threads encoding and writing tiles
+
+# Benchmark settings
+BENCHMARK_SIZES: Tuple[int, ...] = (128, 256, 512, 1024, 2048, 4096)  # Square grid sides swept by the benchmarks
+BENCHMARK_REPEATS: int = 3  # Timed runs per case and size; the fastest counts
+BENCHMARK_TOLERANCE: float = 0.25  # Slowdown against the baseline reported as a regression (0.25 = 25%)
+BENCHMARK_BATCH_SEEDS: int = 4  # Worlds per batch_sweep run (its cells count one world)
+IMPORT_TIME_BUDGET: float = 1.0  # Seconds allowed for importing the generation modules in a fresh interpreter
+
+# Stage cache settings
+STAGE_CACHE_DIR: Optional[str] = "cache/stages"  # Where stage outputs are stored (None keeps them in memory only)
+STAGE_CACHE_MEMORY_ENTRIES: int = 8  # Stage outputs kept in memory (least recently used are dropped)
+
+# Server settings
+SERVER_HOST: str = "127.0.0.1"  # The job server only listens locally
+SERVER_PORT: int = 8765
+SERVER_OUTPUT_DIR: str = "output/jobs"  # One directory of tiles per job
+SERVER_MAX_PENDING: int = 16  # Queued and running jobs accepted before new ones are refused
+SERVER_RESULT_CACHE: int = 32  # Completed jobs remembered, so identical requests reuse their tiles
+SERVER_MAX_SIZE: int = 4096  # Largest grid side a request may ask for
+SERVER_MAX_ITERATIONS: int = 500  # Most erosion iterations a request may ask for
+SERVER_MAX_BODY: int = 1 << 16  # Bytes of a request body
+
+# Parallel settings
+GENERATION_WORKERS: int = 1  # Worker processes for heightmap generation (1 = serial)
+VIEWSHED_WORKERS: int = 1  # Worker processes for batched viewsheds (1 = serial)
+SERVER_WORKERS: int = 2  # Worker processes running generation jobs
@@ -1,10 +1,11 @@
 import numpy as np
 
-from config import GRID_SIZE, MAX_ELEVATION, MAX_DEPTH, SEED
+from config import GRID_SIZE, MAX_ELEVATION, MAX_DEPTH, SEED, RENDER_OUTPUT_DIR, RENDER_HILLSHADE, PROFILE_REPORT_PATH
 from maps.map_orchestrator import MapOrchestrator
+from rendering.tiles import TileRenderer
 from terrain.terrain_generator import TerrainGenerator
 from utilities.logger import LoggerUtility as log
-import matplotlib.pyplot as plt
+from utilities.stage_cache import StageCache
 import json
 
 if __name__ == "__main__":
@@ -19,22 +20,25 @@ if __name__ == "__main__":
     )
     
 
-    # Generate terrain
-    terrain_generator = TerrainGenerator(map_orchestrator)
+    # Generate terrain, reusing the stages whose parameters did not change since the last run
+    terrain_generator = TerrainGenerator(map_orchestrator, cache=StageCache())
     terrain_generator.generate()
     print("Terrain generation complete.")
     print()
     
     
     # Dump all objects to debug_output.json
-    print(terrain_generator.map.grid.normalized_elevation_map().shape)
-    print(terrain_generator.map.grid.normalized_elevation_map())
-    
-    # Plot elevation map
-    plt.imshow(terrain_generator.map.grid.normalized_elevation_map(), cmap="terrain")
-    plt.colorbar()
-    plt.title("Terrain Map")
-    plt.show()
+    normalized_elevation = terrain_generator.map.grid.normalized_elevation_map()
+    print(normalized_elevation.shape)
+    print(normalized_elevation)
+    
+    # Render elevation map tiles
+    relief = terrain_generator.map.grid.elevation_map() if RENDER_HILLSHADE else None
+    TileRenderer(RENDER_OUTPUT_DIR).render(normalized_elevation, relief)
+    print(f"Tiles written to {RENDER_OUTPUT_DIR}.")
+
+    # Stage timings of this run
+    log.write_report(PROFILE_REPORT_PATH)
     
     
 
@@ -1,8 +1,35 @@
+import importlib
+from typing import Any
 
-__all__ = {
+# Module of every exported class; a class (and its dependencies) is only imported on first access
+_EXPORTS = {
+    "GenericMap": ".generic_map",
+    "GridMap": ".grid_map",
+    "HeightMap": ".height_map",
+    "PrecipitationMap": ".precipitation_map",
+    "VoronoiMap": ".voronoi_map",
+    "BiomeMap": ".biome_map",
+    "MinMaxPyramid": ".spatial_index",
+}
+
+__all__ = [
     "GenericMap",
     "GridMap",
     "HeightMap",
     "PrecipitationMap",
     "VoronoiMap",
-}
\ No newline at end of file
+    "BiomeMap",
+    "MinMaxPyramid",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,49 @@
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .grid_map import GridMap
+
+
+class BiomeMap(GridMap):
+    """
+    A class for 2D grid-based biome maps: uint8 biome codes indexed [y, x], with the name and
+    RGB color of every code.
+    """
+    map_type = "BiomeMap"
+    def __init__(self, **kwargs) -> None:
+        kwargs.update(dtype=np.uint8, value_range=(0, 255))  # Codes decode to themselves
+        super().__init__(**kwargs)
+        self.names  : List[str] = list(kwargs.get("names", []))
+        self.palette: np.ndarray = np.array(kwargs.get("palette", np.zeros((len(self.names), 3))), dtype=np.uint8).reshape(-1, 3)
+
+    def metadata(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = super().metadata()
+        data.update({
+            "names": self.names,
+            "palette": self.palette.tolist(),
+        })
+        return data
+
+    def from_dict(self, data: Dict[str, Any]) -> None:
+        super().from_dict(data)
+        self._restore_palette(data)
+
+    def from_arrays(self, metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        super().from_arrays(metadata, arrays)
+        self._restore_palette(metadata)
+
+    def _restore_palette(self, data: Dict[str, Any]) -> None:
+        self.names   = list(data.get("names", self.names))
+        self.palette = np.array(data.get("palette", self.palette), dtype=np.uint8).reshape(-1, 3)
+
+    def get_biome(self, x: int, y: int) -> str:
+        return self.names[int(self.get_data(x, y))]
+
+    def coverage(self) -> Dict[str, int]:
+        """Returns the number of cells of every biome present."""
+        counts = np.bincount(self.grid.ravel(), minlength=len(self.names))
+        return {self.names[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def colors(self, origin: Tuple[int, int] = (0, 0), size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Returns the (height, width, 3) RGB image of a window (the whole map by default), one palette lookup per cell."""
+        size = size if size is not None else (self.width, self.height)
+        return self.palette[self.grid[self._window(origin, size)]]
@@ -1,18 +1,33 @@
-import inspect
-import os
-import sys
-from typing import Any, Dict, Type
+from typing import Any, Dict, Tuple, Type
 from abc import ABC, abstractmethod
 import importlib
-from maps import *
+import numpy as np
+
+# Module defining each map type, imported the first time the type is looked up
+MAP_MODULES: Dict[str, str] = {
+    "GridMap": "maps.grid_map",
+    "HeightMap": "maps.height_map",
+    "PrecipitationMap": "maps.precipitation_map",
+    "VoronoiMap": "maps.voronoi_map",
+    "BiomeMap": "maps.biome_map",
+}
 
 
 class GenericMap(ABC):
     """
     Abstract base class for maps.
     Defines the interface for map storage and operations.
+
+    Every subclass defining its own map_type is registered under it when its module is imported;
+    from_type imports a type's module (see MAP_MODULES) only when the type is first needed.
     """
     map_type = "GenericMap"
+    registry: Dict[str, Type["GenericMap"]] = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if "map_type" in cls.__dict__:
+            GenericMap.registry[cls.map_type] = cls
     
     @abstractmethod
     def __init__(self, **kwargs) -> None:
@@ -34,7 +49,42 @@ class GenericMap(ABC):
     def get_data(self, *args, **kwargs) -> Any:
         """Retrieve data from the map."""
         pass
-        
+
+    def to_arrays(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """
+        Split the map into JSON-serializable metadata and named arrays, for binary storage.
+        Maps without large arrays keep everything in the metadata.
+        """
+        return self.to_dict(), {}
+
+    def from_arrays(self, metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        """Restore the map from to_arrays output. The arrays may be read-only memory maps."""
+        self.from_dict(metadata)
+
+    @classmethod
+    def map_class(cls, map_type: str) -> Type["GenericMap"]:
+        """Returns the class registered under map_type, importing its module if needed."""
+        if map_type not in GenericMap.registry and map_type in MAP_MODULES:
+            importlib.import_module(MAP_MODULES[map_type])
+        if map_type not in GenericMap.registry:
+            raise KeyError(f"Unknown map type '{map_type}'.")
+        return GenericMap.registry[map_type]
+
+    @classmethod
+    def from_type(cls, map_type: str, **kwargs) -> "GenericMap":
+        """Create an empty map of the class whose map_type is given."""
+        return cls.map_class(map_type)(**kwargs)
+
+    @classmethod
+    def discover_map_classes(cls) -> Dict[str, Type["GenericMap"]]:
+        """Imports every known map module and returns the registered classes by map_type."""
+        for module in MAP_MODULES.values():
+            importlib.import_module(module)
+        return dict(GenericMap.registry)
+
+
 if __name__ == "__main__":
-    map_classes = GenericMap.discover_map_classes()
+    # Map modules register with the importable maps.generic_map, not with this __main__ copy
+    from maps.generic_map import GenericMap as RegisteredMap
+    map_classes = RegisteredMap.discover_map_classes()
     print(map_classes)
\ No newline at end of file
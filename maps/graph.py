@@ -1,33 +1,159 @@
-
-from typing import Tuple
-import networkx as nx
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
 from utilities.logger import LoggerUtility as log
+from .grid import CELL_TYPES, Grid2D, _read_only
+
+# Directed grid edges leave every cell towards these (dx, dy) offsets, when the target is on the grid
+EDGE_OFFSETS: Tuple[Tuple[int, int], ...] = ((1, 0), (0, 1), (1, 1), (-1, 1), (1, -1), (-1, -1))
+
 
 class TerrainGraph:
-    """Graph structure to manage dynamic relationships."""
+    """
+    Graph structure to manage dynamic relationships.
+
+    Grid cells are the nodes and their edges follow EDGE_OFFSETS, so nothing is stored per node:
+    attributes are views of the grid arrays, and neighbours come from CSR arrays of flat cell
+    indices (x * size_y + y) built on first use. Edges and nodes added explicitly are kept on top
+    of the implicit grid graph.
+    """
 
-    def __init__(self) -> None:
-        self.graph = nx.DiGraph()
+    def __init__(self, grid: Optional[Grid2D] = None) -> None:
+        self.grid: Optional[Grid2D] = grid
+        self.extra_nodes: Dict[Tuple[int, ...], Dict[str, Any]] = {}  # Nodes added with add_node
+        self.extra_edges: Dict[Tuple[int, ...], Dict[Tuple[int, ...], Dict[str, Any]]] = {}  # source -> target -> attributes
+        self._indptr: Optional[np.ndarray] = None
+        self._targets: Optional[np.ndarray] = None
         log.success("Terrain graph initialized.")
 
-    
+
     def __repr__(self) -> str:
         """Returns a concise string representation of the object."""
-        return f"{self.__class__.__name__}(graph={self.graph})"
+        return f"{self.__class__.__name__}(grid={self.grid!r})"
 
     def __str__(self) -> str:
         """Returns a human-readable string representation of the object."""
-        return f"{self.__class__.__name__} with {len(self.graph)} nodes and {len(self.graph.edges)} edges"
+        return f"{self.__class__.__name__} with {self.number_of_nodes()} nodes and {self.number_of_edges()} edges"
+
+    def bind(self, grid: Grid2D) -> None:
+        """Makes the cells of grid the nodes of the graph. Nothing is copied."""
+        if self.grid is None or self.grid.size != grid.size:
+            self._indptr = self._targets = None
+        self.grid = grid
+
+    def number_of_nodes(self) -> int:
+        """Number of grid cells plus explicitly added nodes outside the grid."""
+        grid_nodes = 0 if self.grid is None else self.grid.size[0] * self.grid.size[1]
+        return grid_nodes + sum(not self._on_grid(node) for node in self.extra_nodes)
+
+    def number_of_edges(self) -> int:
+        """Number of grid edges plus explicitly added edges."""
+        grid_edges = 0
+        if self.grid is not None:
+            size_x, size_y = self.grid.size
+            grid_edges = sum(max(size_x - abs(dx), 0) * max(size_y - abs(dy), 0) for dx, dy in EDGE_OFFSETS)
+        return grid_edges + sum(not self._is_grid_edge(source, target) for source, targets in self.extra_edges.items() for target in targets)
+
+    def attributes(self) -> Dict[str, np.ndarray]:
+        """Node attributes of the grid cells, as read-only views of the grid arrays indexed [x, y]."""
+        attributes = {
+            "elevation": self.grid.elevation_map(),
+            "normalized_elevation": self.grid.normalized_elevation_map(),
+            "type": self.grid.type_map(),  # uint8 codes into CELL_TYPES
+        }
+        attributes.update({key: _read_only(layer) for key, layer in self.grid.properties.items()})
+        return attributes
+
+    def get_node(self, position: Tuple[int, ...]) -> Dict[str, Any]:
+        """Returns the attributes of a node."""
+        attributes = self.grid.get_cell(*position) if self._on_grid(position) else {}
+        attributes.update(self.extra_nodes.get(tuple(position), {}))
+        return attributes
 
     def add_node(self, position: Tuple[int, int, int], **attributes) -> None:
-        """Adds a node representing a grid cell."""
-        self.graph.add_node(position, **attributes)
+        """Adds a node, or attributes to an existing node, on top of the grid cells."""
+        self.extra_nodes.setdefault(tuple(position), {}).update(attributes)
 
     def add_edge(self, source: Tuple[int, int, int], target: Tuple[int, int, int], **attributes) -> None:
         """Adds a directed edge between nodes."""
-        self.graph.add_edge(source, target, **attributes)
+        self.extra_edges.setdefault(tuple(source), {}).setdefault(tuple(target), {}).update(attributes)
+
+    def get_neighbors(self, position: Tuple[int, int, int]) -> np.ndarray:
+        """Returns the (x, y) positions a node has edges to, as a (k, 2) array."""
+        neighbors = np.empty((0, 2), dtype=np.int32)
+        if self._on_grid(position):
+            neighbors = np.stack(np.divmod(self.get_neighbor_indices(position), self.grid.size[1]), axis=1).astype(np.int32)
+        extra = self.extra_edges.get(tuple(position))
+        if extra:
+            added = [target for target in extra if not self._is_grid_edge(position, target)]
+            neighbors = np.concatenate([neighbors, np.array(added, dtype=np.int32).reshape(len(added), -1)]) if added else neighbors
+        return neighbors
+
+    def get_neighbor_indices(self, position: Tuple[int, int]) -> np.ndarray:
+        """
+        Returns the flat indices (x * size_y + y) of the grid cells a grid cell has grid edges to:
+        a read-only view into the CSR arrays, so nothing is allocated. Explicitly added edges are
+        not included (see get_neighbors).
+        """
+        index = position[0] * self.grid.size[1] + position[1]
+        indptr, targets = self.csr()
+        return targets[indptr[index]:indptr[index + 1]]
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the grid edges in compressed sparse row form: the edges leaving the cell with flat
+        index x * size_y + y go to the cells with flat indices targets[indptr[index]:indptr[index + 1]].
+        targets is int32 unless the grid has 2**31 cells or more.
+        """
+        if self._indptr is None:
+            size_x, size_y = self.grid.size
+            index_type = np.int32 if size_x * size_y < 2 ** 31 else np.int64
+            x, y = np.indices(self.grid.size, dtype=index_type)
+            target_x = x[..., np.newaxis] + np.array([dx for dx, _ in EDGE_OFFSETS], dtype=index_type)
+            target_y = y[..., np.newaxis] + np.array([dy for _, dy in EDGE_OFFSETS], dtype=index_type)
+            valid = (target_x >= 0) & (target_x < size_x) & (target_y >= 0) & (target_y < size_y)
+            indptr = np.zeros(size_x * size_y + 1, dtype=np.int64)
+            np.cumsum(valid.reshape(size_x * size_y, -1).sum(axis=1), out=indptr[1:])
+            targets = target_x[valid] * index_type(size_y) + target_y[valid]
+            indptr.flags.writeable = targets.flags.writeable = False
+            self._indptr, self._targets = indptr, targets
+        return self._indptr, self._targets
+
+    def to_networkx(self):
+        """Builds the equivalent networkx DiGraph (allocates per node and edge; for export and analysis)."""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        if self.grid is not None:
+            size_x, size_y = self.grid.size
+            attributes = self.attributes()
+            names = [key for key in attributes if key != "type"]
+            columns = [attributes[key].ravel().tolist() for key in names]
+            types = np.asarray(CELL_TYPES)[attributes["type"]].ravel().tolist()
+            positions = [(x, y) for x in range(size_x) for y in range(size_y)]
+            graph.add_nodes_from(
+                (position, dict(zip(names, values), type=cell_type))
+                for position, cell_type, *values in zip(positions, types, *columns)
+            )
+            indptr, targets = self.csr()
+            sources = np.repeat(np.arange(size_x * size_y), np.diff(indptr))
+            graph.add_edges_from(zip(map(positions.__getitem__, sources.tolist()), map(positions.__getitem__, targets.tolist())))
+        for position, attributes in self.extra_nodes.items():
+            graph.add_node(position, **attributes)
+        for source, targets in self.extra_edges.items():
+            for target, attributes in targets.items():
+                graph.add_edge(source, target, **attributes)
+        return graph
+
+    def _on_grid(self, position: Tuple[int, ...]) -> bool:
+        """Whether position is an (x, y) cell of the bound grid."""
+        return (
+            self.grid is not None and len(position) == 2 and
+            0 <= position[0] < self.grid.size[0] and 0 <= position[1] < self.grid.size[1]
+        )
 
-    def get_neighbors(self, position: Tuple[int, int, int]) -> list:
-        """Returns neighbors of a given node."""
-        return list(self.graph.neighbors(position))
-            
\ No newline at end of file
+    def _is_grid_edge(self, source: Tuple[int, ...], target: Tuple[int, ...]) -> bool:
+        """Whether source -> target is one of the implicit grid edges."""
+        return (
+            self._on_grid(source) and self._on_grid(target) and
+            (target[0] - source[0], target[1] - source[1]) in EDGE_OFFSETS
+        )
@@ -1,55 +1,203 @@
 
-from typing import Tuple
+from typing import Any, Dict, List, Tuple
 import numpy as np
 from utilities.logger import LoggerUtility as log
 from utilities.utils import dict_to_str
+from .spatial_index import MinMaxPyramid
+
+CELL_TYPES: List[str] = ["water", "land", "air"]  # Index is the uint8 code stored in the grids
+WATER, LAND, AIR = 0, 1, 2
+
+
+def cell_type_code(name: str) -> int:
+    """Returns the uint8 code for a cell type, registering unknown names."""
+    if name not in CELL_TYPES:
+        if len(CELL_TYPES) > np.iinfo(np.uint8).max:
+            raise ValueError(f"Cannot register cell type '{name}': uint8 code space exhausted.")
+        CELL_TYPES.append(name)
+    return CELL_TYPES.index(name)
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """Returns a zero-copy, non-writeable view of an array."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
 
 class Grid3D:
-    """Represents a 3D grid for terrain."""
+    """
+    Represents a 3D grid for terrain.
+
+    Cell properties are derived from z on the fly ("elevation", "normalized_elevation", "type"),
+    so nothing is allocated per cell. Only overridden cells are stored, as sorted linear
+    indices and a value array per property.
+    """
 
     def __init__(self, size: Tuple[int, int], max_elevation: float, max_depth: float) -> None:
         self.size: Tuple[int, int] = size  # (X, Y)
         self.max_elevation: float = max_elevation  # in kilometers
         self.max_depth: float = max_depth  # in kilometers
         self.z_levels: int = int((max_elevation + max_depth) * 1000)  # Normalize to meters
-        self.grid: np.ndarray = np.empty((size[0], size[1], self.z_levels), dtype=object)
+        self.shape: Tuple[int, int, int] = (size[0], size[1], self.z_levels)
+        self.overrides: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}  # key -> (sorted linear indices, values)
+        self._pending: Dict[str, Tuple[List[int], List[Any]]] = {}  # Single-cell writes not merged yet
         self.initialize_cells()
         
         log.success("3D grid initialized.")
 
+    def __repr__(self) -> str:
+        """Returns a concise string representation of the object."""
+        return f"{self.__class__.__name__}(size={self.size}, max_elevation={self.max_elevation}, max_depth={self.max_depth})"
+
     @log.log_method
     def initialize_cells(self) -> None:
-        """Populates the 3D grid with default properties."""
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                for z in range(self.z_levels):
-                    self.grid[x, y, z] = {
-                        "elevation": z / 1000,  # Non-normalized (kilometers)
-                        "normalized_elevation": z / self.z_levels,  # Normalized
-                        "type": "air" if z > self.max_depth * 1000 else "water",
-                    }
+        """Resets every cell to the default properties derived from z."""
+        self.overrides.clear()
+        self._pending.clear()
+
+    @property
+    def override_count(self) -> int:
+        """Number of stored (overridden) cell values across all properties."""
+        self._flush()
+        return sum(len(index) for index, _ in self.overrides.values())
+
+    def default_property(self, z: np.ndarray, key: str) -> np.ndarray:
+        """Returns the implicit value of a property for an array of z levels."""
+        z = np.asarray(z)
+        if key == "elevation":
+            return (z / 1000).astype(np.float32)  # Non-normalized (kilometers)
+        if key == "normalized_elevation":
+            return (z / self.z_levels).astype(np.float32)
+        if key == "type":
+            return np.where(z > self.max_depth * 1000, AIR, WATER).astype(np.uint8)
+        return np.full(z.shape, np.nan, dtype=np.float32)
 
     # @log.log_method
-    def set_cell_property(self, x: int, y: int, z: int, key: str, value: float) -> None:
+    def set_cell_property(self, x: int, y: int, z: int, key: str, value: Any) -> None:
         """Sets a property for a specific cell."""
         if 0 <= x < self.size[0] and 0 <= y < self.size[1] and 0 <= z < self.z_levels:
-            self.grid[x, y, z][key] = value
+            if key == "type":
+                value = cell_type_code(value)
+            indices, values = self._pending.setdefault(key, ([], []))
+            indices.append(self._linear_index(x, y, z))
+            values.append(value)
+
+    def set_cells_property(self, xs: np.ndarray, ys: np.ndarray, zs: np.ndarray, key: str, values: Any) -> None:
+        """Vectorized set_cell_property for arrays of coordinates; out-of-bounds cells are ignored."""
+        self._flush()  # Earlier single-cell writes must not win over this one
+        xs, ys, zs = np.broadcast_arrays(np.asarray(xs), np.asarray(ys), np.asarray(zs))
+        if key == "type" and np.asarray(values).dtype.kind in "US":
+            names, inverse = np.unique(np.asarray(values), return_inverse=True)
+            values = np.array([cell_type_code(name) for name in names], dtype=np.uint8)[inverse]
+        values = np.broadcast_to(np.asarray(values), xs.shape)
+        inside = (
+            (xs >= 0) & (xs < self.size[0]) & (ys >= 0) & (ys < self.size[1]) & (zs >= 0) & (zs < self.z_levels)
+        )
+        self._merge(key, self._linear_index(xs[inside], ys[inside], zs[inside]), values[inside])
+
+    def fill_columns(self, xs: np.ndarray, ys: np.ndarray, z_start: np.ndarray, z_stop: np.ndarray, key: str, value: Any) -> None:
+        """Sets key to value for z in [z_start, z_stop) of each (x, y) column, e.g. strata or water columns."""
+        xs, ys, z_start, z_stop = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in (xs, ys, z_start, z_stop)))
+        z_start = np.clip(z_start.ravel(), 0, self.z_levels)
+        z_stop = np.clip(z_stop.ravel(), z_start, self.z_levels)
+        lengths = z_stop - z_start
+        # Expand every [z_start, z_stop) run into its z levels without a Python loop
+        run = np.repeat(np.arange(len(lengths)), lengths)
+        zs = z_start[run] + (np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+        self.set_cells_property(xs.ravel()[run], ys.ravel()[run], zs, key, value)
 
     @log.log_method
-    def get_cell_property(self, x: int, y: int, z: int, key: str) -> float:
+    def get_cell_property(self, x: int, y: int, z: int, key: str) -> Any:
         """Gets a property for a specific cell."""
-        return self.grid[x, y, z].get(key, None)
+        value = self.get_column(x, y, key, z_range=(z, z + 1))[0]
+        if key == "type":
+            return CELL_TYPES[value]
+        return None if np.isnan(value) else value.item()
+
+    def get_column(self, x: int, y: int, key: str, z_range: Tuple[int, int] = None) -> np.ndarray:
+        """Returns a property for every z level of one column."""
+        return self.get_columns(np.array([x]), np.array([y]), key, z_range)[0]
+
+    def get_columns(self, xs: np.ndarray, ys: np.ndarray, key: str, z_range: Tuple[int, int] = None) -> np.ndarray:
+        """Returns a (len(xs), nz) array of a property for many columns at once."""
+        z0, z1 = z_range if z_range is not None else (0, self.z_levels)
+        xs, ys = np.asarray(xs, dtype=np.int64).ravel(), np.asarray(ys, dtype=np.int64).ravel()
+        result = np.repeat(self.default_property(np.arange(z0, z1), key)[np.newaxis, :], len(xs), axis=0)
+        index, values = self._layer(key)
+        if len(index):
+            column_start = self._linear_index(xs, ys, 0)
+            lo = np.searchsorted(index, column_start + z0)
+            hi = np.searchsorted(index, column_start + z1)
+            counts = hi - lo
+            # Gather the overrides that fall inside every requested column span
+            hits = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            rows = np.repeat(np.arange(len(xs)), counts)
+            result[rows, index[hits] % self.z_levels - z0] = values[hits]
+        return result
+
+    def get_slab(self, key: str, z_range: Tuple[int, int], x_range: Tuple[int, int] = None, y_range: Tuple[int, int] = None) -> np.ndarray:
+        """Returns a (nx, ny, nz) block of a property for a box of the grid."""
+        x0, x1 = x_range if x_range is not None else (0, self.size[0])
+        y0, y1 = y_range if y_range is not None else (0, self.size[1])
+        z0, z1 = z_range
+        result = np.broadcast_to(self.default_property(np.arange(z0, z1), key), (x1 - x0, y1 - y0, z1 - z0)).copy()
+        index, values = self._layer(key)
+        if len(index):
+            xs, rest = np.divmod(index, self.size[1] * self.z_levels)
+            ys, zs = np.divmod(rest, self.z_levels)
+            inside = (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1) & (zs >= z0) & (zs < z1)
+            result[xs[inside] - x0, ys[inside] - y0, zs[inside] - z0] = values[inside]
+        return result
+
+    def _linear_index(self, x: Any, y: Any, z: Any) -> Any:
+        """Flattens (x, y, z) into a C-order linear index."""
+        return (np.asarray(x, dtype=np.int64) * self.size[1] + y) * self.z_levels + z
+
+    def _layer(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the merged overrides of a property."""
+        self._flush()
+        return self.overrides.get(key, (np.empty(0, dtype=np.int64), np.empty(0)))
+
+    def _flush(self) -> None:
+        """Merges pending single-cell writes into the sorted override arrays."""
+        pending, self._pending = self._pending, {}
+        for key, (indices, values) in pending.items():
+            self._merge(key, np.asarray(indices, dtype=np.int64), np.asarray(values))
+
+    def _merge(self, key: str, indices: np.ndarray, values: np.ndarray) -> None:
+        """Merges new overrides into a property; later writes win."""
+        if key in self.overrides:
+            old_indices, old_values = self.overrides[key]
+            indices = np.concatenate([old_indices, indices])
+            values = np.concatenate([old_values, values.astype(old_values.dtype, copy=False)])
+        elif key == "type":
+            values = values.astype(np.uint8)
+        else:
+            values = values.astype(np.float32)
+        # Keep the last write for every index: unique over the reversed arrays
+        unique, last = np.unique(indices[::-1], return_index=True)
+        self.overrides[key] = (unique, values[::-1][last])
 
 
 class Grid2D:
-    """Represents a 2D grid for terrain."""
+    """
+    Represents a 2D grid for terrain, stored as one typed array per field.
+
+    Elevations run from 0 at the deepest sea floor to max_elevation + max_depth, so sea level is
+    at max_depth (normalized_sea_level once normalized); cells below it are water.
+    """
 
     def __init__(self, size: Tuple[int, int], max_elevation: float, max_depth: float) -> None:
         self.size: Tuple[int, int] = size  # (X, Y)
         self.max_elevation: float = max_elevation  # in kilometers
         self.max_depth: float = max_depth  # in kilometers
         self.normalized_sea_level: float = self.max_depth / (self.max_elevation + self.max_depth)
-        self.grid: np.ndarray = np.empty(size, dtype=object)
+        self.elevation: np.ndarray = np.empty(size, dtype=np.float32)  # in kilometers
+        self.normalized_elevation: np.ndarray = np.empty(size, dtype=np.float32)
+        self.cell_type: np.ndarray = np.empty(size, dtype=np.uint8)  # Codes into CELL_TYPES
+        self.properties: Dict[str, np.ndarray] = {}  # Extra per-cell layers, created on first use
+        self.indexes: Dict[str, MinMaxPyramid] = {}  # Spatial indexes of layers, built by spatial_index
         self.initialize_cells()
         
         log.success("2D grid initialized.")
@@ -57,50 +205,165 @@ class Grid2D:
     
     def __repr__(self) -> str:
         """Returns a concise string representation of the object."""
-        return f"{self.__class__.__name__}({', '.join(f'{k}={v}' for k, v in self.__dict__.items())})"
+        return f"{self.__class__.__name__}(size={self.size}, max_elevation={self.max_elevation}, max_depth={self.max_depth})"
 
     def __str__(self) -> str:
         """Returns a human-readable string representation of the object."""
         return f"{self.__class__.__name__}(size={self.size}, max_elevation={self.max_elevation}, max_depth={self.max_depth}, normalized_sea_level={self.normalized_sea_level})\n \
-Grid:\n" + "\n".join(f"{x},{y} : {dict_to_str(self.grid[x, y])}" for x in range(self.size[0]) for y in range(self.size[1]))
+Grid:\n" + "\n".join(f"{x},{y} : {dict_to_str(self.get_cell(x, y))}" for x in range(self.size[0]) for y in range(self.size[1]))
 
     def elevation_map(self) -> np.ndarray:
-        return np.array([[self.grid[x, y]["elevation"] for y in range(self.size[1])] for x in range(self.size[0])])
+        """Returns a read-only view of the elevation array (kilometers)."""
+        return _read_only(self.elevation)
+
     def normalized_elevation_map(self) -> np.ndarray:
-        return np.array([[self.grid[x, y]["normalized_elevation"] for y in range(self.size[1])] for x in range(self.size[0])])
+        """Returns a read-only view of the normalized elevation array."""
+        return _read_only(self.normalized_elevation)
+
     def type_map(self) -> np.ndarray:
-        return np.array([[self.grid[x, y]["type"] for y in range(self.size[1])] for x in range(self.size[0])])
+        """Returns a read-only view of the uint8 cell type codes (see CELL_TYPES)."""
+        return _read_only(self.cell_type)
+
+    def type_name_map(self) -> np.ndarray:
+        """Returns the cell types as strings. Allocates; prefer type_map() for comparisons."""
+        return np.asarray(CELL_TYPES)[self.cell_type]
 
     @log.log_method
     def initialize_cells(self) -> None:
         """Populates the 2D grid with default properties."""
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                self.grid[x, y] = {
-                    "elevation": 0.0,
-                    "normalized_elevation": 0.0,
-                    "type": "water",
-                }
+        self.elevation.fill(0.0)
+        self.normalized_elevation.fill(0.0)
+        self.cell_type.fill(WATER)
+        self.properties.clear()
+        self.indexes.clear()
+
+    def spatial_index(self, key: str = "elevation") -> MinMaxPyramid:
+        """
+        Returns the min/max pyramid of a layer (elevation, normalized_elevation, type or an extra
+        property), built on first use and kept current by the setters. Windows are ((x, y), (X, Y)).
+        """
+        if key not in self.indexes:
+            self.indexes[key] = MinMaxPyramid(self.cell_type if key == "type" else self._layer_array(key))
+        return self.indexes[key]
+
+    def get_cell(self, x: int, y: int) -> Dict[str, Any]:
+        """Returns the properties of a cell as a dictionary."""
+        cell = {
+            "elevation": float(self.elevation[x, y]),
+            "normalized_elevation": float(self.normalized_elevation[x, y]),
+            "type": CELL_TYPES[self.cell_type[x, y]],
+        }
+        cell.update({key: layer[x, y].item() for key, layer in self.properties.items() if not np.isnan(layer[x, y])})
+        return cell
 
     # @log.log_method
-    def set_cell_property(self, x: int, y: int, key: str, value: float) -> None:
+    def set_cell_property(self, x: int, y: int, key: str, value: Any) -> None:
         """Sets a property for a specific cell."""
         if 0 <= x < self.size[0] and 0 <= y < self.size[1]:
             if key == "elevation":
-                self.grid[x, y]["normalized_elevation"] = value / (self.max_elevation + self.max_depth)
-            self.grid[x, y][key] = value
-            
+                self.normalized_elevation[x, y] = value / (self.max_elevation + self.max_depth)
+                self.elevation[x, y] = value
+            elif key == "normalized_elevation":
+                self.normalized_elevation[x, y] = value
+            elif key == "type":
+                self.cell_type[x, y] = cell_type_code(value)
+            else:
+                self._property_layer(key)[x, y] = value
+            self._refresh_indexes((slice(x, x + 1), slice(y, y + 1)), key)
+
+    def set_property_map(self, key: str, values: np.ndarray, origin: Tuple[int, int] = (0, 0)) -> None:
+        """Vectorized set_cell_property for a whole window whose top-left cell is origin."""
+        window = self._window(origin, np.shape(values))
+        if key == "elevation":
+            self.elevation[window] = values
+            np.multiply(self.elevation[window], 1.0 / (self.max_elevation + self.max_depth), out=self.normalized_elevation[window])
+        elif key == "normalized_elevation":
+            self.normalized_elevation[window] = values
+        elif key == "type":
+            values = np.asarray(values)
+            if values.dtype.kind in "US":
+                names, inverse = np.unique(values, return_inverse=True)
+                codes = np.array([cell_type_code(name) for name in names], dtype=np.uint8)
+                values = codes[inverse].reshape(values.shape)
+            self.cell_type[window] = values
+        else:
+            self._property_layer(key)[window] = values
+        self._refresh_indexes(window, key)
     
     @log.log_method
     def set_cell_elevation(self, x: int, y: int, elevation: float) -> None:
         """Sets a property for a specific cell."""
         if 0 <= x < self.size[0] and 0 <= y < self.size[1]:
             normalized_elevation = elevation / (self.max_elevation + self.max_depth)
-            self.grid[x, y]["elevation"] = elevation
-            self.grid[x, y]["normalized_elevation"] = normalized_elevation
-            self.grid[x, y]["type"] = "water" if normalized_elevation < -self.normalized_sea_level else "land"
+            self.elevation[x, y] = elevation
+            self.normalized_elevation[x, y] = normalized_elevation
+            self.cell_type[x, y] = WATER if normalized_elevation < self.normalized_sea_level else LAND
+            self._refresh_indexes((slice(x, x + 1), slice(y, y + 1)), "elevation", "type")
 
     @log.log_method
-    def get_cell_property(self, x: int, y: int, key: str) -> float:
-        """Gets a property for a specific cell."""
-        return self.grid[x, y].get(key, None)
+    def set_elevation_map(self, elevation: np.ndarray, origin: Tuple[int, int] = (0, 0)) -> None:
+        """Vectorized set_cell_elevation for a whole window whose top-left cell is origin."""
+        window = self._window(origin, np.shape(elevation))
+        self.elevation[window] = elevation
+        Grid2D.classify(
+            self.elevation[window],
+            self.max_elevation,
+            self.max_depth,
+            out_normalized=self.normalized_elevation[window],
+            out_type=self.cell_type[window],
+        )
+        self._refresh_indexes(window, "elevation", "type")
+
+    @staticmethod
+    def classify(elevation: np.ndarray, max_elevation: float, max_depth: float,
+                 out_normalized: np.ndarray, out_type: np.ndarray) -> None:
+        """Writes normalized elevation and cell type codes for an elevation array into the given outputs."""
+        np.multiply(elevation, 1.0 / (max_elevation + max_depth), out=out_normalized)
+        normalized_sea_level = max_depth / (max_elevation + max_depth)
+        np.copyto(out_type, LAND)
+        np.copyto(out_type, WATER, where=out_normalized < normalized_sea_level)
+
+    @log.log_method
+    def get_cell_property(self, x: int, y: int, key: str) -> Any:
+        """Gets a property for a specific cell; None for an extra property the cell does not have."""
+        if key == "elevation":
+            return float(self.elevation[x, y])
+        if key == "normalized_elevation":
+            return float(self.normalized_elevation[x, y])
+        if key == "type":
+            return CELL_TYPES[self.cell_type[x, y]]
+        layer = self.properties.get(key)
+        if layer is None or np.isnan(layer[x, y]):
+            return None  # Unset cells of an extra layer hold NaN
+        return layer[x, y].item()
+
+    def _layer_array(self, key: str) -> np.ndarray:
+        if key == "elevation":
+            return self.elevation
+        if key == "normalized_elevation":
+            return self.normalized_elevation
+        return self._property_layer(key)
+
+    def _refresh_indexes(self, window: Tuple[slice, slice], *keys: str) -> None:
+        """Brings the spatial indexes of the given layers up to date after window was written."""
+        if not self.indexes:
+            return
+        if "elevation" in keys:
+            keys += ("normalized_elevation",)
+        for key in keys:
+            if key in self.indexes:
+                self.indexes[key].refresh((window[0].start, window[1].start), (window[0].stop - window[0].start, window[1].stop - window[1].start))
+
+    def _property_layer(self, key: str) -> np.ndarray:
+        """Returns the array for an extra property, creating it (NaN-filled) on first use."""
+        if key not in self.properties:
+            self.properties[key] = np.full(self.size, np.nan, dtype=np.float32)
+        return self.properties[key]
+
+    def _window(self, origin: Tuple[int, int], shape: Tuple[int, ...]) -> Tuple[slice, slice]:
+        """Returns the slices for a window of the grid, checking that it lies inside the grid."""
+        x0, y0 = origin
+        x1, y1 = x0 + shape[0], y0 + shape[1]
+        if x0 < 0 or y0 < 0 or x1 > self.size[0] or y1 > self.size[1]:
+            raise IndexError(f"Window {origin}+{tuple(shape)} is outside grid of size {self.size}.")
+        return slice(x0, x1), slice(y0, y1)
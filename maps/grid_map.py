@@ -1,34 +1,221 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple, Union
 import numpy as np
-from generic_map import GenericMap
+from .generic_map import GenericMap
+from .spatial_index import MinMaxPyramid
 
 
 class GridMap(GenericMap):
     """
     A class for 2D grid-based maps (e.g., terrain, temperature).
+
+    The grid is indexed [y, x] and stored in a chosen dtype. Float dtypes hold the values
+    themselves; integer dtypes (e.g. int16) hold them quantized over value_range, as
+    value = offset + scale * code. Bulk accessors take windows (origin (x, y), size
+    (width, height)) or masks, and the in-place operations write through out= ufuncs, so on
+    float grids they allocate nothing. spatial_index answers window aggregate and value range
+    queries without scanning the grid.
     """
     map_type = "GridMap"
-    
+
     def __init__(self, **kwargs) -> None:
         self.width   : int = kwargs.get("width", 10)  # Default to 10 if not provided in kwargs
         self.height  : int = kwargs.get("height", 10)  # Default to 10 if not provided in kwargs
         default_value: float = kwargs.get("default_value", 0)  # Default to 0 if not provided in kwargs
-        self.grid    : np.ndarray = np.full((self.height, self.width), default_value)
+        dtype        : np.dtype = np.dtype(kwargs.get("dtype", np.float64))
+        self.scale   : float = 1.0  # Value of one quantization step (integer dtypes only)
+        self.offset  : float = 0.0  # Value of code 0 (integer dtypes only)
+        self._spatial_index: Optional[MinMaxPyramid] = None
+        if np.issubdtype(dtype, np.integer):
+            self._quantize(dtype, kwargs.get("value_range", (0.0, 1.0)))
+        self.grid    : np.ndarray = np.empty((self.height, self.width), dtype=dtype)
+        self.grid[...] = self._encode(default_value)
 
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "type": "GridMap",
+    #region Properties
+    @property
+    def quantized(self) -> bool:
+        return bool(np.issubdtype(self.grid.dtype, np.integer))
+
+    #endregion Properties
+
+    def metadata(self) -> Dict[str, Any]:
+        """Everything to_dict stores except the grid itself."""
+        data: Dict[str, Any] = {
+            "type": self.map_type,
             "width": self.width,
             "height": self.height,
-            "grid": self.grid.tolist(),
+            "dtype": self.grid.dtype.name,
         }
+        if self.quantized:
+            data.update({"scale": self.scale, "offset": self.offset})
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = self.metadata()
+        data["grid"] = self.grid.tolist()
+        return data
 
     def from_dict(self, data: Dict[str, Any]) -> None:
         self.width  = data.get("width", 10)
         self.height = data.get("height", 10)
-        self.grid   = np.array(data.get("grid", np.full((self.height, self.width), 0)))
+        self.grid   = np.array(data.get("grid", np.full((self.height, self.width), 0)), dtype=data.get("dtype"))
+        self._restore_encoding(data)
+
+    def to_arrays(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        return self.metadata(), {"grid": self.grid}
+
+    def from_arrays(self, metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        self.width  = metadata.get("width", 10)
+        self.height = metadata.get("height", 10)
+        self.grid   = arrays["grid"]
+        self._restore_encoding(metadata)
 
     def get_data(self, x: int, y: int) -> float:
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.grid[y, x]
-        raise IndexError("Coordinates out of bounds.")
\ No newline at end of file
+            return self._decode(self.grid[y, x])
+        raise IndexError("Coordinates out of bounds.")
+
+    def set_data(self, x: int, y: int, value: float) -> None:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError("Coordinates out of bounds.")
+        self.grid[y, x] = self._encode(value)
+        self._changed((slice(y, y + 1), slice(x, x + 1)))
+
+    def get_values(self) -> np.ndarray:
+        """Returns the values of the whole grid: the grid itself for float dtypes, decoded (float32) otherwise."""
+        return self._decode(self.grid)
+
+    def get_region(self, origin: Tuple[int, int], size: Tuple[int, int]) -> np.ndarray:
+        """Returns the (height, width) values of a window; a view of the grid for float dtypes."""
+        return self._decode(self.grid[self._window(origin, size)])
+
+    def set_region(self, origin: Tuple[int, int], values: np.ndarray) -> None:
+        """Writes a (height, width) array of values into the window whose top-left cell is origin."""
+        window = self._window(origin, np.shape(values)[::-1])
+        self.grid[window] = self._encode(values)
+        self._changed(window)
+
+    def set_masked(self, mask: np.ndarray, values: Union[float, np.ndarray]) -> None:
+        """Writes values (a scalar or a full-grid array) into the cells where mask is True."""
+        np.copyto(self.grid, self._encode(values), where=mask)
+        self._changed(mask=mask)
+
+    def spatial_index(self) -> MinMaxPyramid:
+        """
+        Returns the min/max pyramid of the grid's values, built on first use and kept current by
+        the setters. Like the grid, it is indexed [y, x]: windows are ((y, x), (height, width)).
+        """
+        if self._spatial_index is None or self._spatial_index.base is not self.grid:
+            self._spatial_index = MinMaxPyramid(self.grid, decode=self._decode if self.quantized else None)
+        return self._spatial_index
+
+    def data_range(self) -> Tuple[float, float]:
+        """Returns the smallest and largest value of the grid."""
+        return self._decode(self.grid.min()), self._decode(self.grid.max())
+
+    def rescale(self, min_value: float = 0.0, max_value: float = 1.0) -> None:
+        """
+        Maps the values linearly, in place, so they span [min_value, max_value] (a constant grid
+        becomes min_value). Quantized grids only change their scale and offset.
+        """
+        if max_value < min_value:
+            raise ValueError("max_value must not be smaller than min_value.")
+        low, high = self.data_range()
+        if self.quantized:
+            if high > low:
+                factor = (max_value - min_value) / (high - low)
+                self.offset = min_value + (self.offset - low) * factor
+                self.scale *= factor
+            else:
+                self.offset += min_value - low
+        else:
+            np.subtract(self.grid, low, out=self.grid)
+            if high > low:
+                np.divide(self.grid, high - low, out=self.grid)
+                if max_value - min_value != 1:
+                    np.multiply(self.grid, max_value - min_value, out=self.grid)
+            if min_value != 0:
+                np.add(self.grid, min_value, out=self.grid)
+        self._changed()
+
+    def normalize(self) -> None:
+        """Rescales the values, in place, to [0, 1]."""
+        self.rescale(0.0, 1.0)
+
+    def clamp(self, min_value: Optional[float] = None, max_value: Optional[float] = None) -> None:
+        """Limits the values, in place, to [min_value, max_value]; None leaves that side open."""
+        if self.quantized:
+            info = np.iinfo(self.grid.dtype)
+            # The codes whose values lie within the bounds
+            min_value = info.min if min_value is None else max(info.min, int(np.ceil((min_value - self.offset) / self.scale)))
+            max_value = info.max if max_value is None else min(info.max, int(np.floor((max_value - self.offset) / self.scale)))
+        np.clip(self.grid, min_value, max_value, out=self.grid)
+        self._changed()
+
+    def convert(self, dtype: Union[str, np.dtype], value_range: Optional[Tuple[float, float]] = None) -> None:
+        """
+        Stores the grid in another dtype. Integer dtypes quantize over value_range, by default the
+        current data range.
+        """
+        dtype = np.dtype(dtype)
+        value_range = value_range if value_range is not None else self.data_range()
+        values = self.get_values()
+        self.scale, self.offset = 1.0, 0.0
+        if np.issubdtype(dtype, np.integer):
+            self._quantize(dtype, value_range)
+            self.grid = np.empty(values.shape, dtype=dtype)
+            self.grid[...] = self._encode(values)
+        else:
+            self.grid = values.astype(dtype)
+        self._changed()
+
+    def _window(self, origin: Tuple[int, int], size: Tuple[int, int]) -> Tuple[slice, slice]:
+        """Returns the [y, x] slices of a window, raising IndexError when it leaves the grid."""
+        (x, y), (width, height) = origin, size
+        if x < 0 or y < 0 or width < 0 or height < 0 or x + width > self.width or y + height > self.height:
+            raise IndexError("Region out of bounds.")
+        return slice(y, y + height), slice(x, x + width)
+
+    def _changed(self, window: Optional[Tuple[slice, slice]] = None, mask: Optional[np.ndarray] = None) -> None:
+        """Called after the cells of window (the whole grid if None) or under mask were written."""
+        index = self._spatial_index
+        if index is None or index.base is not self.grid:
+            return  # A replaced grid gets a new index when one is next asked for
+        if window is None or mask is not None:
+            index.refresh()
+        else:
+            rows, columns = window
+            index.refresh((rows.start, columns.start), (rows.stop - rows.start, columns.stop - columns.start))
+
+    def _quantize(self, dtype: np.dtype, value_range: Tuple[float, float]) -> None:
+        """Spreads the codes of an integer dtype evenly over value_range."""
+        info = np.iinfo(dtype)
+        low, high = value_range
+        self.scale = (high - low) / (int(info.max) - int(info.min)) or 1.0
+        self.offset = low - int(info.min) * self.scale
+
+    def _encode(self, values: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        """Values to what the grid stores: themselves for float dtypes, rounded and clipped codes otherwise."""
+        if not self.quantized:
+            return values
+        info = np.iinfo(self.grid.dtype)
+        codes = np.array(values, dtype=np.float64)
+        codes -= self.offset
+        codes /= self.scale
+        np.rint(codes, out=codes)
+        np.clip(codes, info.min, info.max, out=codes)
+        return codes.astype(self.grid.dtype)
+
+    def _decode(self, codes: Union[np.generic, np.ndarray]) -> Union[float, np.ndarray]:
+        """What the grid stores back to values (float32 arrays, or floats, when quantized)."""
+        if not self.quantized:
+            return codes
+        if np.ndim(codes) == 0:
+            return self.offset + self.scale * float(codes)
+        values = codes.astype(np.float32)
+        values *= np.float32(self.scale)
+        values += np.float32(self.offset)
+        return values
+
+    def _restore_encoding(self, data: Dict[str, Any]) -> None:
+        self.scale  = data.get("scale", 1.0)
+        self.offset = data.get("offset", 0.0)
@@ -1,20 +1,24 @@
 
 
-from typing import Any, Dict
-from grid_map import GridMap
+from typing import Any, Dict, Optional, Tuple
+from .grid_map import GridMap
 import numpy as np
 
 
 class HeightMap(GridMap):
     """
     A class for 2D grid-based height maps.
+
+    normal_grid follows every write to the grid; quantized height maps span height_range by default.
     """
     map_type = "HeightMap"
     def __init__(self, **kwargs) -> None:
+        kwargs.setdefault("value_range", kwargs.get("height_range", (0,10000)))
         super().__init__(**kwargs)
         self.height_range           : tuple[float, float] = kwargs.get("height_range", (0,10000))
         self.height_range_normalized: tuple[float, float] = kwargs.get("height_range_normalized", (0,1))
-        self.normal_grid            : np.ndarray = np.full((self.height, self.width), 0.0)
+        self.normal_grid            : np.ndarray = self._empty_normal_grid()
+        self._changed()
 
     #region Properties
     @property
@@ -27,8 +31,8 @@ class HeightMap(GridMap):
 
     #endregion Properties
     
-    def to_dict(self) -> Dict[str, Any]:
-        data: Dict[str, Any] = super().to_dict()
+    def metadata(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = super().metadata()
         data.update({
             "type": "HeightMap",
             "height_range": self.height_range,
@@ -38,16 +42,46 @@ class HeightMap(GridMap):
 
     def from_dict(self, data: Dict[str, Any]) -> None:
         super().from_dict(data)
-        self.min_height = data["height_range"]
-        self.max_height = data["height_range_normalized"]
-        self.normal_grid = (self.grid - self.min_height) / (self.max_height - self.min_height)
+        self._restore_ranges(data)
+        self.normal_grid = self._empty_normal_grid()
+        self._changed()
+
+    def to_arrays(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        metadata, arrays = super().to_arrays()
+        arrays["normal_grid"] = self.normal_grid
+        return metadata, arrays
+
+    def from_arrays(self, metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        super().from_arrays(metadata, arrays)
+        self._restore_ranges(metadata)
+        self.normal_grid = arrays["normal_grid"]
+
+    def _restore_ranges(self, data: Dict[str, Any]) -> None:
+        self.height_range            = tuple(data.get("height_range", self.height_range))
+        self.height_range_normalized = tuple(data.get("height_range_normalized", self.height_range_normalized))
 
     def get_height(self, x: int, y: int) -> float:
         return self.get_data(x, y)
 
     def set_height(self, x: int, y: int, value: float) -> None:
         self.set_data(x, y, value)
-        self.normal_grid[y, x] = (value - self.min_height) / (self.max_height - self.min_height)
 
     def get_normalized_height(self, x: int, y: int) -> float:
-        return self.normal_grid[y, x]
\ No newline at end of file
+        return self.normal_grid[y, x]
+
+    def _empty_normal_grid(self) -> np.ndarray:
+        return np.empty(self.grid.shape, dtype=self._normal_dtype())
+
+    def _normal_dtype(self) -> np.dtype:
+        return np.dtype(np.float32) if self.quantized else self.grid.dtype
+
+    def _changed(self, window: Optional[Tuple[slice, slice]] = None, mask: Optional[np.ndarray] = None) -> None:
+        """Recomputes normal_grid where the grid changed."""
+        super()._changed(window, mask)
+        if self.normal_grid.shape != self.grid.shape or self.normal_grid.dtype != self._normal_dtype():
+            self.normal_grid, window, mask = self._empty_normal_grid(), None, None  # The grid was converted
+        window = window if window is not None else (slice(None), slice(None))
+        where = mask[window] if mask is not None else True
+        normal = self.normal_grid[window]
+        np.subtract(self._decode(self.grid[window]), self.min_height, out=normal, where=where)
+        np.divide(normal, self.max_height - self.min_height, out=normal, where=where)
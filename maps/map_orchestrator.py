@@ -1,7 +1,9 @@
 
-from typing import Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
 from .grid import Grid2D
 from .graph import TerrainGraph
+from .pathfinding import PathCost, PathFinder
 
 from utilities.logger import LoggerUtility as log
 
@@ -10,8 +12,13 @@ class MapOrchestrator:
 
     def __init__(self, size: Tuple[int, int], max_elevation: float, max_depth: float, seed: int) -> None:
         self.grid = Grid2D(size, max_elevation, max_depth)
-        self.graph = TerrainGraph()
+        self.graph = TerrainGraph(self.grid)
         self.seed = seed
+        self.depressions = None  # Depressions (filled surface, lakes, basins), set by the terrain generator
+        self.rivers = None  # RiverNetwork, set by the terrain generator's river stage
+        self.precipitation = None  # PrecipitationMap, set by the terrain generator's climate stage
+        self.biomes = None  # BiomeMap, set by the terrain generator's biome stage
+        self.pathfinders: Dict[PathCost, PathFinder] = {}  # One per cost function, with its cached distance fields
 
         log.success("Map orchestrator initialized.")
 
@@ -31,21 +38,26 @@ class MapOrchestrator:
 
     @log.log_method
     def initialize_graph(self) -> None:
-        """Populates the graph based on the grid's state."""
-        for x in range(self.grid.size[0]):
-            for y in range(self.grid.size[1]):
-                cell = self.grid.grid[x, y]
-                self.graph.add_node((x, y), **cell)
-                if x > 0:  # Link horizontal neighbors
-                    self.graph.add_edge((x - 1, y), (x, y))
-                if y > 0:  # Link vertical neighbors
-                    self.graph.add_edge((x, y - 1), (x, y))
-                if x > 0 and y > 0:  # Link top-left neighbors
-                    self.graph.add_edge((x - 1, y - 1), (x, y))
-                if x < self.grid.size[0] - 1 and y > 0:  # Link top-right neighbors
-                    self.graph.add_edge((x + 1, y - 1), (x, y))
-                if x > 0 and y < self.grid.size[1] - 1:  # Link bottom-left neighbors
-                    self.graph.add_edge((x - 1, y + 1), (x, y))
-                if x < self.grid.size[0] - 1 and y < self.grid.size[1] - 1:  # Link bottom-right neighbors
-                    self.graph.add_edge((x + 1, y + 1), (x, y))
-            
\ No newline at end of file
+        """
+        Binds the graph to the grid's state. The graph reads the grid arrays directly, so there is
+        nothing to copy and the two stay synchronized; use self.graph.to_networkx() for a networkx copy.
+        """
+        self.graph.bind(self.grid)
+        for pathfinder in self.pathfinders.values():
+            pathfinder.invalidate()
+
+    def pathfinder(self, cost: Optional[PathCost] = None) -> PathFinder:
+        """Returns the path finder for a cost function (the configured default when None)."""
+        cost = cost if cost is not None else PathCost()
+        if cost not in self.pathfinders:
+            self.pathfinders[cost] = PathFinder(self.grid, cost)
+        return self.pathfinders[cost]
+
+    def find_path(self, source: Tuple[int, int], target: Tuple[int, int], cost: Optional[PathCost] = None) -> Optional[np.ndarray]:
+        """Returns the cheapest (k, 2) path of cells from source to target, or None if there is none."""
+        return self.pathfinder(cost).find_path(source, target)
+
+    def find_paths(self, pairs: Sequence[Tuple[Tuple[int, int], Tuple[int, int]]],
+                   cost: Optional[PathCost] = None) -> List[Optional[np.ndarray]]:
+        """Answers a batch of (source, target) path queries, reusing distance fields between them."""
+        return self.pathfinder(cost).find_paths(pairs)
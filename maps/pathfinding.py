@@ -0,0 +1,227 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import heapq
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from utilities.logger import LoggerUtility as log
+from .grid import WATER, Grid2D
+from config import (
+    PATH_CELL_SIZE,
+    PATH_UPHILL_WEIGHT,
+    PATH_DOWNHILL_WEIGHT,
+    PATH_MAX_GRADE,
+    PATH_WATER_COST,
+    PATH_FIELD_CACHE_SIZE,
+    PATH_FIELD_MIN_TARGETS,
+)
+
+# The eight moves between neighbouring cells, as (dx, dy)
+MOVES: Tuple[Tuple[int, int], ...] = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+MOVE_LENGTHS: np.ndarray = np.hypot(*np.array(MOVES, dtype=np.float64).T)  # In cells
+
+
+@dataclass(frozen=True)
+class PathCost:
+    """
+    Cost of moving between neighbouring cells: the distance (in cells) times a factor growing with
+    the grade of the step, plus a penalty for entering water. Every factor is at least 1.
+    """
+    cell_size: float = PATH_CELL_SIZE  # Kilometers between neighbouring cell centres
+    uphill_weight: float = PATH_UPHILL_WEIGHT
+    downhill_weight: float = PATH_DOWNHILL_WEIGHT
+    max_grade: float = PATH_MAX_GRADE  # Steeper steps are impassable
+    water_cost: float = PATH_WATER_COST  # Per cell of distance; inf makes water impassable
+
+    def step_costs(self, elevation: np.ndarray, water: np.ndarray) -> np.ndarray:
+        """
+        Returns the (8, X, Y) cost of the move MOVES[d] out of every cell; inf where the move
+        leaves the grid or is impassable.
+        """
+        size_x, size_y = elevation.shape
+        padded = np.pad(np.asarray(elevation, dtype=np.float64), 1, mode="edge")
+        padded_water = np.pad(np.asarray(water, dtype=bool), 1, mode="edge")
+        inside = np.pad(np.ones(elevation.shape, dtype=bool), 1)
+        costs = np.empty((len(MOVES),) + elevation.shape, dtype=np.float64)
+        for direction, ((dx, dy), length) in enumerate(zip(MOVES, MOVE_LENGTHS)):
+            target = (slice(1 + dx, 1 + dx + size_x), slice(1 + dy, 1 + dy + size_y))
+            grade = (padded[target] - elevation) / (length * self.cell_size)
+            factor = 1 + self.uphill_weight * np.maximum(grade, 0) + self.downhill_weight * np.maximum(-grade, 0)
+            factor = factor + np.where(padded_water[target], self.water_cost, 0)
+            passable = inside[target] & (np.abs(grade) <= self.max_grade)
+            costs[direction] = np.where(passable, length * factor, np.inf)
+        return costs
+
+
+@dataclass
+class DistanceField:
+    """
+    Cheapest cost from the nearest of a set of sources to every cell, and the tree of moves behind it.
+
+    Attributes:
+        sources (Tuple[Tuple[int, int], ...]): The (x, y) source cells.
+        distance (np.ndarray): (X, Y) cost from the nearest source, inf where unreachable.
+        parent (np.ndarray): (X, Y) flat index (x * Y + y) of the previous cell on the cheapest path; -1 where unreachable.
+    """
+    sources: Tuple[Tuple[int, int], ...]
+    distance: np.ndarray
+    parent: np.ndarray
+
+    def path_to(self, target: Tuple[int, int]) -> Optional[np.ndarray]:
+        """Returns the (k, 2) cells from the nearest source to target, or None if it is unreachable."""
+        return _trace(self.parent.ravel(), self.parent.shape, target)
+
+
+class PathFinder:
+    """
+    Shortest paths over a Grid2D's elevation arrays under a PathCost.
+
+    Searches expand cells in buckets of increasing cost: every cell in a bucket is relaxed at once
+    with array operations, and the open and closed sets are plain arrays. Single routes use A*
+    (the bucket key includes an octile-distance lower bound). Sources with many targets get a full
+    distance field instead, kept in an LRU cache and reused by later batches.
+    """
+
+    def __init__(self, grid: Grid2D, cost: PathCost = PathCost(), cache_size: int = PATH_FIELD_CACHE_SIZE) -> None:
+        self.grid = grid
+        self.cost = cost
+        self.cache_size = cache_size
+        self.fields: "OrderedDict[Tuple[Tuple[int, int], ...], DistanceField]" = OrderedDict()
+        self._costs: Optional[np.ndarray] = None
+        log.success("Path finder initialized.")
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(grid={self.grid!r}, cost={self.cost})"
+
+    def invalidate(self) -> None:
+        """Drops the step costs and cached fields, for when the grid's elevation or types changed."""
+        self._costs = None
+        self.fields.clear()
+
+    def step_costs(self) -> np.ndarray:
+        """Returns the step costs of the grid (computed once, until invalidate)."""
+        if self._costs is None:
+            self._costs = self.cost.step_costs(self.grid.elevation_map(), self.grid.type_map() == WATER)
+        return self._costs
+
+    @log.log_method
+    def distance_field(self, sources: Sequence[Tuple[int, int]]) -> DistanceField:
+        """Returns the distance field of a set of sources, from the cache when it was computed before."""
+        key = tuple(sorted({(int(x), int(y)) for x, y in sources}))
+        if key in self.fields:
+            self.fields.move_to_end(key)
+            return self.fields[key]
+        distance, parent = self._search(key)
+        field = DistanceField(sources=key, distance=distance, parent=parent)
+        self.fields[key] = field
+        while len(self.fields) > self.cache_size:
+            self.fields.popitem(last=False)
+        return field
+
+    def find_path(self, source: Tuple[int, int], target: Tuple[int, int]) -> Optional[np.ndarray]:
+        """Returns the cheapest (k, 2) path of cells from source to target (A*), or None if there is none."""
+        _, parent = self._search(((int(source[0]), int(source[1])),), target)
+        return _trace(parent.ravel(), parent.shape, target)
+
+    @log.log_method
+    def find_paths(self, pairs: Sequence[Tuple[Tuple[int, int], Tuple[int, int]]],
+                   min_targets: int = PATH_FIELD_MIN_TARGETS) -> List[Optional[np.ndarray]]:
+        """
+        Answers a batch of (source, target) queries, in order. Sources with at least min_targets
+        targets, or with a cached field, are answered from their distance field; the rest by A*.
+        """
+        targets_by_source: Dict[Tuple[int, int], List[int]] = {}
+        for query, (source, _) in enumerate(pairs):
+            targets_by_source.setdefault((int(source[0]), int(source[1])), []).append(query)
+        paths: List[Optional[np.ndarray]] = [None] * len(pairs)
+        for source, queries in targets_by_source.items():
+            if len(queries) >= min_targets or (source,) in self.fields:
+                field = self.distance_field([source])
+                for query in queries:
+                    paths[query] = field.path_to(pairs[query][1])
+            else:
+                for query in queries:
+                    paths[query] = self.find_path(source, pairs[query][1])
+        return paths
+
+    def path_cost(self, path: np.ndarray) -> float:
+        """Returns the total cost of a path of neighbouring cells."""
+        costs = self.step_costs()
+        steps = np.diff(path, axis=0)
+        directions = [MOVES.index((int(dx), int(dy))) for dx, dy in steps]
+        return float(costs[directions, path[:-1, 0], path[:-1, 1]].sum())
+
+    def _search(self, sources: Tuple[Tuple[int, int], ...],
+                target: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bucketed Dijkstra from sources, or A* towards target: returns the (X, Y) cost and parent arrays.
+        Without a target every reachable cell is settled.
+        """
+        size_x, size_y = self.grid.size
+        costs = self.step_costs().reshape(len(MOVES), -1)
+        offsets = [dx * size_y + dy for dx, dy in MOVES]
+        # Every move costs at least width, and at least unit per cell of length (keeps the A* bound consistent)
+        width = float(costs.min()) if np.isfinite(costs.min()) else 1.0
+        unit = float((costs / MOVE_LENGTHS[:, np.newaxis]).min()) if np.isfinite(costs.min()) else 0.0
+
+        distance = np.full(size_x * size_y, np.inf)
+        parent = np.full(size_x * size_y, -1, dtype=np.int64)
+        closed = np.zeros(size_x * size_y, dtype=bool)
+        if target is not None:
+            x, y = np.divmod(np.arange(size_x * size_y), size_y)
+            dx, dy = np.abs(x - target[0]), np.abs(y - target[1])
+            bound = unit * (np.maximum(dx, dy) + (np.sqrt(2) - 1) * np.minimum(dx, dy))
+            goal = target[0] * size_y + target[1]
+        else:
+            bound = np.zeros(size_x * size_y)
+            goal = None
+
+        start = np.array([x * size_y + y for x, y in sources], dtype=np.int64)
+        distance[start] = 0
+        parent[start] = start
+        buckets: Dict[int, List[np.ndarray]] = {}
+        keys: List[int] = []
+
+        def push(cells: np.ndarray) -> None:
+            bucket = np.floor((distance[cells] + bound[cells]) / width).astype(np.int64)
+            for key in np.unique(bucket).tolist():
+                if key not in buckets:
+                    buckets[key] = []
+                    heapq.heappush(keys, key)
+                buckets[key].append(cells[bucket == key])
+
+        push(start)
+        while keys:
+            key = heapq.heappop(keys)
+            while buckets.get(key):
+                cells = np.unique(np.concatenate(buckets.pop(key)))
+                buckets[key] = []
+                # Skip settled cells and entries left behind by a later improvement
+                cells = cells[~closed[cells] & (np.floor((distance[cells] + bound[cells]) / width) == key)]
+                closed[cells] = True
+                for direction, offset in enumerate(offsets):
+                    candidate = distance[cells] + costs[direction, cells]
+                    neighbours = cells + offset
+                    better = np.isfinite(candidate)
+                    better[better] = candidate[better] < distance[neighbours[better]]
+                    neighbours = neighbours[better]
+                    distance[neighbours] = candidate[better]
+                    parent[neighbours] = cells[better]
+                    closed[neighbours] = False
+                    if len(neighbours):
+                        push(neighbours)
+            buckets.pop(key, None)
+            if goal is not None and closed[goal]:
+                break
+        return distance.reshape(self.grid.size), parent.reshape(self.grid.size)
+
+
+def _trace(parent: np.ndarray, shape: Tuple[int, int], target: Tuple[int, int]) -> Optional[np.ndarray]:
+    """Follows the parent links from target back to its source; returns the path from the source."""
+    cell = int(target[0]) * shape[1] + int(target[1])
+    if parent[cell] < 0:
+        return None
+    path = [cell]
+    while parent[cell] != cell:
+        cell = int(parent[cell])
+        path.append(cell)
+    return np.stack(np.divmod(np.array(path[::-1], dtype=np.int64), shape[1]), axis=1)
@@ -1,11 +1,11 @@
 
 
-from grid_map import GridMap
+from .grid_map import GridMap
 
 
 class PrecipitationMap(GridMap):
     """
-    A class for 2D grid-based height maps.
+    A class for 2D grid-based precipitation maps, indexed [y, x] (filled by the terrain generator's climate stage).
     """
     map_type = "PrecipitationMap"
     def __init__(self, **kwargs) -> None:
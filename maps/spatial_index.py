@@ -0,0 +1,235 @@
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from config import SPATIAL_INDEX_LEAF, SPATIAL_INDEX_CHUNK_CELLS
+
+# (row, column) offsets of the four children of a block, one level down
+CHILD_OFFSETS: np.ndarray = np.array([[0, 0], [0, 1], [1, 0], [1, 1]], dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class WindowStats:
+    """Aggregates of the cells of a window, NaN cells left out (minimum, maximum and mean are NaN if none is left)."""
+    minimum: float
+    maximum: float
+    mean: float
+    count: int
+
+
+class MinMaxPyramid:
+    """
+    A min/max/sum pyramid over a 2D array, for window aggregates and value range queries.
+
+    The finest level holds the minimum, maximum, sum and (non-NaN) count of every leaf x leaf
+    block of the array; every coarser level combines 2x2 blocks of the one below, up to a single
+    block. Coordinates are array indices: (axis 0, axis 1), i.e. (x, y) on a Grid2D layer and
+    (y, x) on a GridMap grid.
+
+    - stats covers a window with whole blocks from as coarse a level as fits, plus thin strips of
+      finer levels along its edges, so it reads O(perimeter) values instead of O(area).
+    - find and any_in_range descend from the top, dropping every block whose [min, max] misses
+      the value range, so only blocks that may hold matches are opened.
+    - refresh recomputes the blocks over a window after its cells changed, and their ancestors.
+
+    The pyramid references the array rather than copying it; decode (e.g. GridMap._decode) turns
+    stored values into the values queries see.
+    """
+
+    def __init__(self, base: np.ndarray, decode: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 leaf: int = SPATIAL_INDEX_LEAF) -> None:
+        if np.ndim(base) != 2:
+            raise ValueError("MinMaxPyramid indexes 2D arrays.")
+        self.base = base
+        self.decode = decode
+        self.leaf = leaf
+        self.blocks: List[int] = []  # Cells per block side, finest level first
+        self.mins: List[np.ndarray] = []
+        self.maxs: List[np.ndarray] = []
+        self.sums: List[np.ndarray] = []
+        self.counts: List[np.ndarray] = []
+        block = leaf
+        while True:
+            shape = (-(-base.shape[0] // block), -(-base.shape[1] // block))
+            self.blocks.append(block)
+            self.mins.append(np.full(shape, np.inf))
+            self.maxs.append(np.full(shape, -np.inf))
+            self.sums.append(np.zeros(shape))
+            self.counts.append(np.zeros(shape, dtype=np.int64))
+            if shape == (1, 1):
+                break
+            block *= 2
+        self.refresh()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(shape={self.base.shape}, leaf={self.leaf}, levels={len(self.blocks)})"
+
+    def refresh(self, origin: Tuple[int, int] = (0, 0), shape: Optional[Tuple[int, int]] = None) -> None:
+        """Recomputes the blocks over a window (the whole array by default) after its cells changed."""
+        lo, hi = self._box(origin, shape)
+        if lo[0] >= hi[0] or lo[1] >= hi[1]:
+            return
+        leaf = self.leaf
+        first = [lo[0] // leaf, lo[1] // leaf]
+        last = [-(-hi[0] // leaf), -(-hi[1] // leaf)]
+        # The finest level, from the array, a band of block rows at a time
+        band = max(1, SPATIAL_INDEX_CHUNK_CELLS // (leaf * leaf * (last[1] - first[1])))
+        for row in range(first[0], last[0], band):
+            end = min(row + band, last[0])
+            values = self._values((slice(row * leaf, end * leaf), slice(first[1] * leaf, last[1] * leaf)))
+            missing = np.isnan(values)
+            if missing.any():
+                low, high, total = np.where(missing, np.inf, values), np.where(missing, -np.inf, values), np.where(missing, 0.0, values)
+            else:
+                low = high = total = values
+            window = (slice(row, end), slice(first[1], last[1]))
+            self.mins[0][window] = self._reduce(low, leaf, np.inf, np.minimum)
+            self.maxs[0][window] = self._reduce(high, leaf, -np.inf, np.maximum)
+            self.sums[0][window] = self._reduce(total, leaf, 0.0, np.add)
+            self.counts[0][window] = self._reduce(~missing, leaf, False, np.add)
+        # Every coarser level, from the one below
+        for level in range(1, len(self.blocks)):
+            child = (slice(2 * (first[0] // 2), 2 * -(-last[0] // 2)), slice(2 * (first[1] // 2), 2 * -(-last[1] // 2)))
+            first = [first[0] // 2, first[1] // 2]
+            last = [-(-last[0] // 2), -(-last[1] // 2)]
+            window = (slice(first[0], last[0]), slice(first[1], last[1]))
+            self.mins[level][window] = self._reduce(self.mins[level - 1][child], 2, np.inf, np.minimum)
+            self.maxs[level][window] = self._reduce(self.maxs[level - 1][child], 2, -np.inf, np.maximum)
+            self.sums[level][window] = self._reduce(self.sums[level - 1][child], 2, 0.0, np.add)
+            self.counts[level][window] = self._reduce(self.counts[level - 1][child], 2, 0, np.add)
+
+    def stats(self, origin: Tuple[int, int] = (0, 0), shape: Optional[Tuple[int, int]] = None) -> WindowStats:
+        """Returns the minimum, maximum, mean and count of the cells of a window (the whole array by default)."""
+        lo, hi = self._box(origin, shape)
+        totals = [np.inf, -np.inf, 0.0, 0]
+        level, factor = -1, self.leaf  # Level -1 is the array itself
+        while True:
+            size = self._level_shape(level)
+            inner_lo = [-(-lo[axis] // factor) for axis in range(2)]
+            # A partial block at the edge of the array is whole as far as the window goes
+            inner_hi = [-(-hi[axis] // factor) if hi[axis] == size[axis] else hi[axis] // factor for axis in range(2)]
+            if level == len(self.blocks) - 1 or inner_lo[0] >= inner_hi[0] or inner_lo[1] >= inner_hi[1]:
+                self._accumulate(level, (slice(lo[0], hi[0]), slice(lo[1], hi[1])), totals)
+                break
+            # The strips of this level the next level's blocks do not cover
+            a0, b0 = inner_lo[0] * factor, min(inner_hi[0] * factor, size[0])
+            a1, b1 = inner_lo[1] * factor, min(inner_hi[1] * factor, size[1])
+            for window in ((slice(lo[0], a0), slice(lo[1], hi[1])), (slice(b0, hi[0]), slice(lo[1], hi[1])),
+                           (slice(a0, b0), slice(lo[1], a1)), (slice(a0, b0), slice(b1, hi[1]))):
+                self._accumulate(level, window, totals)
+            lo, hi = inner_lo, inner_hi
+            level, factor = level + 1, 2
+        minimum, maximum, total, count = totals
+        if count == 0:
+            return WindowStats(float("nan"), float("nan"), float("nan"), 0)
+        return WindowStats(float(minimum), float(maximum), float(total / count), int(count))
+
+    def find(self, low: float, high: float, origin: Tuple[int, int] = (0, 0),
+             shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Returns the (N, 2) indices, in order, of the cells of a window whose values lie in [low, high]."""
+        lo, hi = self._box(origin, shape)
+        cells = self._cells(self._descend(low, high, lo, hi), lo, hi)
+        values = self._values((cells[:, 0], cells[:, 1]))
+        cells = cells[(values >= low) & (values <= high)]
+        return cells[np.lexsort((cells[:, 1], cells[:, 0]))]
+
+    def any_in_range(self, low: float, high: float, origin: Tuple[int, int] = (0, 0),
+                     shape: Optional[Tuple[int, int]] = None) -> bool:
+        """Returns whether any cell of a window has a value in [low, high]."""
+        lo, hi = self._box(origin, shape)
+        blocks = self._descend(low, high, lo, hi, stop_early=True)
+        if blocks is None:
+            return True
+        # Open the remaining finest blocks a chunk at a time, stopping at the first match
+        chunk = max(1, SPATIAL_INDEX_CHUNK_CELLS // (64 * self.leaf * self.leaf))
+        for start in range(0, len(blocks), chunk):
+            cells = self._cells(blocks[start:start + chunk], lo, hi)
+            values = self._values((cells[:, 0], cells[:, 1]))
+            if np.any((values >= low) & (values <= high)):
+                return True
+        return False
+
+    def highest(self, origin: Tuple[int, int] = (0, 0), shape: Optional[Tuple[int, int]] = None) -> Tuple[float, Tuple[int, int]]:
+        """Returns the largest value of a window and the first cell holding it."""
+        maximum = self.stats(origin, shape).maximum
+        if np.isnan(maximum):
+            raise ValueError("The window holds no values.")
+        cell = self.find(maximum, maximum, origin, shape)[0]
+        return maximum, (int(cell[0]), int(cell[1]))
+
+    def _descend(self, low: float, high: float, lo: List[int], hi: List[int],
+                 stop_early: bool = False) -> Optional[np.ndarray]:
+        """
+        Returns the (N, 2) finest blocks overlapping the window [lo, hi) that may hold values in
+        [low, high]. With stop_early, returns None as soon as a block inside the window is known to
+        hold one.
+        """
+        candidates = np.zeros((1, 2), dtype=np.int64)
+        for level in range(len(self.blocks) - 1, -1, -1):
+            block = self.blocks[level]
+            start, end = candidates * block, (candidates + 1) * block
+            overlaps = np.all((start < hi) & (end > lo), axis=1)
+            candidates, start, end = candidates[overlaps], start[overlaps], end[overlaps]
+            rows, columns = candidates[:, 0], candidates[:, 1]
+            minimum, maximum = self.mins[level][rows, columns], self.maxs[level][rows, columns]
+            if stop_early:
+                # Blocks whose every value lies in the range (and inside the window)
+                inside = np.all((start >= lo) & (np.minimum(end, self.base.shape) <= hi), axis=1)
+                if np.any(inside & (minimum >= low) & (maximum <= high) & (self.counts[level][rows, columns] > 0)):
+                    return None
+            candidates = candidates[(minimum <= high) & (maximum >= low)]
+            if len(candidates) == 0:
+                return candidates
+            if level > 0:
+                candidates = (candidates[:, np.newaxis, :] * 2 + CHILD_OFFSETS).reshape(-1, 2)
+                candidates = candidates[np.all(candidates < self.mins[level - 1].shape, axis=1)]
+        return candidates
+
+    def _cells(self, blocks: np.ndarray, lo: List[int], hi: List[int]) -> np.ndarray:
+        """Returns the (N, 2) cells of finest blocks that lie in the window [lo, hi)."""
+        offsets = np.stack(np.meshgrid(np.arange(self.leaf), np.arange(self.leaf), indexing="ij"), axis=-1).reshape(-1, 2)
+        cells = (blocks[:, np.newaxis, :] * self.leaf + offsets).reshape(-1, 2)
+        return cells[np.all((cells >= lo) & (cells < hi), axis=1)]
+
+    def _accumulate(self, level: int, window: Tuple[slice, slice], totals: list) -> None:
+        """Folds the minimum, maximum, sum and count of a window of a level (-1 is the array) into totals."""
+        if window[0].start >= window[0].stop or window[1].start >= window[1].stop:
+            return
+        if level < 0:
+            values = self._values(window)
+            missing = np.isnan(values)
+            totals[0] = min(totals[0], np.fmin.reduce(values, axis=None, initial=np.inf))
+            totals[1] = max(totals[1], np.fmax.reduce(values, axis=None, initial=-np.inf))
+            totals[2] += np.nansum(values)
+            totals[3] += values.size - int(np.count_nonzero(missing))
+            return
+        totals[0] = min(totals[0], self.mins[level][window].min())
+        totals[1] = max(totals[1], self.maxs[level][window].max())
+        totals[2] += self.sums[level][window].sum()
+        totals[3] += int(self.counts[level][window].sum())
+
+    def _values(self, index: Tuple) -> np.ndarray:
+        values = self.base[index]
+        if self.decode is not None:
+            values = self.decode(values)
+        return np.asarray(values, dtype=np.float64)
+
+    def _level_shape(self, level: int) -> Tuple[int, int]:
+        return self.base.shape if level < 0 else self.mins[level].shape
+
+    def _box(self, origin: Tuple[int, int], shape: Optional[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+        """Returns the [lo, hi) corners of a window, raising IndexError when it leaves the array."""
+        shape = shape if shape is not None else (self.base.shape[0] - origin[0], self.base.shape[1] - origin[1])
+        lo = [int(origin[0]), int(origin[1])]
+        hi = [lo[0] + int(shape[0]), lo[1] + int(shape[1])]
+        if lo[0] < 0 or lo[1] < 0 or hi[0] < lo[0] or hi[1] < lo[1] or hi[0] > self.base.shape[0] or hi[1] > self.base.shape[1]:
+            raise IndexError(f"Window {tuple(origin)}+{tuple(shape)} is outside the indexed array of shape {self.base.shape}.")
+        return lo, hi
+
+    @staticmethod
+    def _reduce(array: np.ndarray, factor: int, fill, ufunc: np.ufunc) -> np.ndarray:
+        """Combines every factor x factor block of array with ufunc, padding partial blocks with fill."""
+        padding = [(0, -side % factor) for side in array.shape]
+        if any(after for _, after in padding):
+            array = np.pad(array, padding, constant_values=fill)
+        blocks = array.reshape(array.shape[0] // factor, factor, array.shape[1] // factor, factor)
+        return ufunc.reduce(ufunc.reduce(blocks, axis=3), axis=1)
@@ -1,12 +1,25 @@
-import networkx as nx
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
 
-from generic_map import GenericMap
+from .generic_map import GenericMap
+
+# The compact arrays of a VoronoiMap, in to_arrays order
+REGION_ARRAYS: Tuple[str, ...] = ("region_ids", "areas", "centroids", "boundaries", "boundary_lengths")
 
 
 class VoronoiMap(GenericMap):
     """
     A class for representing Voronoi diagram-based maps using a graph structure.
+    networkx is imported by the methods that use it, so importing this module stays cheap.
+
+    A map built by from_labels keeps its regions and boundaries in compact arrays:
+        region_ids (R,): the label of every region, sorted.
+        areas (R,): cells per region.
+        centroids (R, 2): mean cell coordinates per region, along axis 0 and axis 1 of the labels.
+        boundaries (B, 2): int32 pairs of region indices (into the arrays above), lower index first.
+        boundary_lengths (B,): cell faces the two regions share.
+    The networkx graph is only built when .graph is first used. From then on the graph is what the
+    map stores (whoever holds it may edit it), so the map is no longer compact.
     """
     map_type = "VoronoiMap"
 
@@ -14,7 +27,84 @@ class VoronoiMap(GenericMap):
         """
         Initialize an empty Voronoi map with a graph-based structure.
         """
-        self.graph = nx.Graph()
+        self.region_ids      : np.ndarray = np.zeros(0, dtype=np.int64)
+        self.areas           : np.ndarray = np.zeros(0, dtype=np.int64)
+        self.centroids       : np.ndarray = np.zeros((0, 2), dtype=np.float64)
+        self.boundaries      : np.ndarray = np.zeros((0, 2), dtype=np.int32)
+        self.boundary_lengths: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.compact         : bool = True  # Whether the arrays (rather than the graph) hold the map
+        self._graph = None
+
+    #region Properties
+    @property
+    def graph(self):
+        """
+        The region graph (nodes carry area and centroid, edges length), built from the arrays on first
+        use. Handing it out makes it the map's storage, so edits made through it are kept.
+        """
+        if self._graph is None:
+            self._graph = self._build_graph()
+        self.compact = False
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph) -> None:
+        self._graph = graph
+        self.compact = False
+
+    #endregion Properties
+
+    @classmethod
+    def from_labels(cls, labels: np.ndarray) -> "VoronoiMap":
+        """
+        Build a map from a 2D label raster (e.g. VoronoiNoise.generate_regions), in one vectorized
+        pass: region areas and centroids come from bincounts, and boundaries from comparing the
+        raster with itself shifted by one cell along each axis, with np.unique on the label pairs.
+
+        Args:
+            labels (np.ndarray): The region label of every cell.
+
+        Returns:
+            VoronoiMap: The map, in compact form.
+        """
+        labels = np.asarray(labels)
+        if labels.ndim != 2 or labels.size == 0:
+            raise ValueError("from_labels needs a non-empty 2D label array.")
+        region_ids, index = cls._region_index(labels)
+        count = len(region_ids)
+        flat = index.ravel()
+
+        voronoi_map = cls()
+        voronoi_map.region_ids = region_ids
+        voronoi_map.areas = np.bincount(flat, minlength=count)
+        # Sum each axis coordinate per region: axis 0 is constant along the rows of the raster
+        row_sums = np.bincount(flat, weights=np.repeat(np.arange(labels.shape[0], dtype=np.float64), labels.shape[1]), minlength=count)
+        column_sums = np.bincount(flat, weights=np.tile(np.arange(labels.shape[1], dtype=np.float64), labels.shape[0]), minlength=count)
+        voronoi_map.centroids = np.stack([row_sums, column_sums], axis=1) / voronoi_map.areas[:, np.newaxis]
+
+        # Every pair of neighbouring cells with different regions is one face of their boundary
+        pairs = []
+        for first, second in ((index[:-1, :], index[1:, :]), (index[:, :-1], index[:, 1:])):
+            differs = first != second
+            first, second = first[differs].astype(np.int64), second[differs].astype(np.int64)
+            pairs.append(np.minimum(first, second) * count + np.maximum(first, second))
+        keys, lengths = np.unique(np.concatenate(pairs), return_counts=True)
+        voronoi_map.boundaries = np.stack([keys // count, keys % count], axis=1).astype(np.int32)
+        voronoi_map.boundary_lengths = lengths
+        return voronoi_map
+
+    @staticmethod
+    def _region_index(labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the sorted distinct labels and the int32 index of every cell's label among them."""
+        if np.issubdtype(labels.dtype, np.integer) and labels.min() >= 0 and labels.max() < 4 * labels.size:
+            # Dense non-negative labels (the usual case) skip the sort of np.unique
+            counts = np.bincount(labels.ravel())
+            region_ids = np.flatnonzero(counts)
+            lookup = np.zeros(len(counts), dtype=np.int32)
+            lookup[region_ids] = np.arange(len(region_ids), dtype=np.int32)
+            return region_ids.astype(labels.dtype), lookup[labels]
+        region_ids, index = np.unique(labels, return_inverse=True)
+        return region_ids, index.reshape(labels.shape).astype(np.int32)
 
     def add_region(self, node_id: Any, properties: Dict[str, Any]):
         """
@@ -44,6 +134,13 @@ class VoronoiMap(GenericMap):
         Returns:
             Dict[str, Any]: A dictionary representation of the Voronoi map.
         """
+        if self.compact:
+            data: Dict[str, Any] = {"type": "VoronoiMap"}
+            data.update({name: getattr(self, name).tolist() for name in REGION_ARRAYS})
+            return data
+
+        import networkx as nx
+
         return {
             "type": "VoronoiMap",
             "graph": nx.node_link_data(self.graph),  # Serialize graph using NetworkX
@@ -56,8 +153,26 @@ class VoronoiMap(GenericMap):
         Args:
             data (Dict[str, Any]): The serialized Voronoi map data.
         """
+        if "graph" not in data:
+            self._set_arrays({name: np.array(data[name]) for name in REGION_ARRAYS})
+            return
+
+        import networkx as nx
+
         self.graph = nx.node_link_graph(data["graph"])
 
+    def to_arrays(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """Compact maps store their region arrays as binary arrays; edited graphs go into the metadata."""
+        if not self.compact:
+            return super().to_arrays()
+        return {"type": "VoronoiMap"}, {name: getattr(self, name) for name in REGION_ARRAYS}
+
+    def from_arrays(self, metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        if not arrays:
+            self.from_dict(metadata)
+            return
+        self._set_arrays(arrays)
+
     def get_data(self, node_id: Any) -> Dict[str, Any]:
         """
         Retrieve properties of a specific region (node).
@@ -71,6 +186,40 @@ class VoronoiMap(GenericMap):
         Raises:
             KeyError: If the region is not found.
         """
-        if self.graph.has_node(node_id):
+        if self.compact:
+            region = self.region_index(node_id)
+            if region is not None:
+                return {"area": int(self.areas[region]), "centroid": tuple(self.centroids[region].tolist())}
+        elif self.graph.has_node(node_id):
             return self.graph.nodes[node_id]
         raise KeyError(f"Node {node_id} not found in the graph.")
+
+    def region_index(self, node_id: Any) -> Optional[int]:
+        """Returns the position of a region in the compact arrays, or None if there is no such region."""
+        position = int(np.searchsorted(self.region_ids, node_id))
+        if position < len(self.region_ids) and self.region_ids[position] == node_id:
+            return position
+        return None
+
+    def _set_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        for name in REGION_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.centroids = self.centroids.reshape(-1, 2)
+        self.boundaries = self.boundaries.reshape(-1, 2)
+        self.compact = True
+        self._graph = None
+
+    def _build_graph(self):
+        import networkx as nx
+
+        graph = nx.Graph()
+        ids = self.region_ids.tolist()
+        graph.add_nodes_from(
+            (node, {"area": area, "centroid": tuple(centroid)})
+            for node, area, centroid in zip(ids, self.areas.tolist(), self.centroids.tolist())
+        )
+        graph.add_edges_from(
+            (ids[first], ids[second], {"length": length})
+            for (first, second), length in zip(self.boundaries.tolist(), self.boundary_lengths.tolist())
+        )
+        return graph
@@ -0,0 +1,62 @@
+from typing import Dict, List, Tuple
+import numpy as np
+
+LUT_SIZE: int = 256
+
+# Piecewise-linear colormaps as (position, (r, g, b)) control points in [0, 1]; "terrain" matches matplotlib's
+COLORMAPS: Dict[str, List[Tuple[float, Tuple[float, float, float]]]] = {
+    "terrain": [
+        (0.00, (0.2, 0.2, 0.6)),
+        (0.15, (0.0, 0.6, 1.0)),
+        (0.25, (0.0, 0.8, 0.4)),
+        (0.50, (1.0, 1.0, 0.6)),
+        (0.75, (0.5, 0.36, 0.33)),
+        (1.00, (1.0, 1.0, 1.0)),
+    ],
+    "gray": [
+        (0.0, (0.0, 0.0, 0.0)),
+        (1.0, (1.0, 1.0, 1.0)),
+    ],
+}
+
+
+def colormap_lut(name: str, size: int = LUT_SIZE) -> np.ndarray:
+    """Returns a (size, 3) uint8 lookup table sampling a colormap evenly over [0, 1]."""
+    if name not in COLORMAPS:
+        raise KeyError(f"Unknown colormap '{name}'. Available: {sorted(COLORMAPS)}")
+    positions = np.array([position for position, _ in COLORMAPS[name]])
+    colors = np.array([color for _, color in COLORMAPS[name]])
+    samples = np.linspace(0.0, 1.0, size)
+    lut = np.stack([np.interp(samples, positions, colors[:, channel]) for channel in range(3)], axis=1)
+    return np.round(lut * 255).astype(np.uint8)
+
+
+def shaded_lut(lut: np.ndarray, shades: int, ambient: float) -> np.ndarray:
+    """
+    Returns a (len(lut) * shades,) table of packed RGBA colors (uint32, one pixel each): entry
+    color * shades + shade is the color darkened to ambient + (1 - ambient) * shade / (shades - 1).
+    """
+    light = ambient + (1 - ambient) * np.linspace(0.0, 1.0, shades) if shades > 1 else np.ones(1)
+    rgba = np.full((len(lut), shades, 4), 255, dtype=np.uint8)
+    rgba[..., :3] = np.round(lut[:, np.newaxis, :] * light[np.newaxis, :, np.newaxis]).astype(np.uint8)
+    return rgba.reshape(-1, 4).view(np.uint32).ravel()
+
+
+def quantize(values: np.ndarray, levels: int) -> np.ndarray:
+    """Maps values in [0, 1] (clipped) to uint16 indices 0..levels-1."""
+    scaled = np.multiply(values, np.float32(levels - 1), dtype=np.float32)
+    np.clip(scaled, 0, levels - 1, out=scaled)
+    scaled += np.float32(0.5)
+    return scaled.astype(np.uint16)
+
+
+def colorize(values: np.ndarray, lut: np.ndarray, shade: np.ndarray = None, shades: int = 1) -> np.ndarray:
+    """
+    Maps values in [0, 1] to packed RGBA pixels (uint32; view as (..., 4) uint8) through a table
+    from shaded_lut, with shade in [0, 1] choosing the brightness. One gather per pixel.
+    """
+    index = quantize(values, len(lut) // shades).astype(np.uint32)
+    if shade is not None:
+        index *= np.uint32(shades)
+        index += quantize(shade, shades)
+    return lut[index]
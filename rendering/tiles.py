@@ -0,0 +1,242 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+from PIL import Image
+from utilities.logger import LoggerUtility as log
+from .colormaps import colorize, colormap_lut, shaded_lut
+from config import (
+    RENDER_TILE_SIZE,
+    RENDER_HILLSHADE_AZIMUTH,
+    RENDER_HILLSHADE_ALTITUDE,
+    RENDER_HILLSHADE_EXAGGERATION,
+    RENDER_PNG_COMPRESSION,
+    RENDER_WORKERS,
+)
+
+TILE_MANIFEST: str = "tiles.json"  # Content hash of every written tile and of the cells behind it, to skip unchanged ones
+IMAGE_CACHE: str = "image.npy"  # Full-resolution pixels of the last render, reused for tiles whose cells did not change
+AMBIENT_LIGHT: float = 0.35  # Share of the color kept on fully shaded slopes
+SHADES: int = 64  # Brightness levels of the hillshaded colormap
+
+
+def hillshade(elevation: np.ndarray, azimuth: float = RENDER_HILLSHADE_AZIMUTH,
+              altitude: float = RENDER_HILLSHADE_ALTITUDE,
+              exaggeration: float = RENDER_HILLSHADE_EXAGGERATION) -> np.ndarray:
+    """
+    Returns the illumination in [0, 1] of an elevation map indexed [x, y] (y grows downwards on
+    screen) lit from azimuth (degrees clockwise from up) and altitude (degrees above the horizon).
+    """
+    elevation = np.asarray(elevation, dtype=np.float32)
+    gradient_x, gradient_y = np.gradient(elevation * np.float32(exaggeration))
+    azimuth, altitude = np.radians(azimuth), np.radians(altitude)
+    # Light direction in (x, y, up) coordinates
+    light = np.array([np.sin(azimuth) * np.cos(altitude), -np.cos(azimuth) * np.cos(altitude), np.sin(altitude)], dtype=np.float32)
+    shade = light[2] - light[0] * gradient_x - light[1] * gradient_y
+    gradient_x *= gradient_x
+    gradient_y *= gradient_y
+    gradient_x += gradient_y
+    gradient_x += np.float32(1)
+    shade /= np.sqrt(gradient_x, out=gradient_x)
+    return np.clip(shade, 0, 1, out=shade)
+
+
+def downsample(image: np.ndarray) -> np.ndarray:
+    """Halves a (rows, columns, channels) uint8 image by averaging 2x2 blocks (odd edges are repeated)."""
+    rows, columns = image.shape[:2]
+    padded = np.pad(image, ((0, rows % 2), (0, columns % 2), (0, 0)), mode="edge").astype(np.uint16)
+    total = padded[0::2, 0::2] + padded[1::2, 0::2] + padded[0::2, 1::2] + padded[1::2, 1::2]
+    return ((total + 2) // 4).astype(np.uint8)
+
+
+@dataclass
+class RenderStats:
+    """Tiles written and skipped (unchanged) by one render."""
+    written: int = 0
+    skipped: int = 0
+
+
+class TileRenderer:
+    """
+    Renders maps as an XYZ tile pyramid of PNGs ({directory}/{z}/{x}/{y}.png), without a display.
+
+    The deepest zoom level shows one map cell per pixel; every level above halves the resolution
+    until the whole map fits into one tile. Pixels come from one lookup per cell in a table of
+    colors by (value, brightness), tiles are RGBA (transparent beyond the map's edge), and only the
+    parts of the map whose cells changed since the last render are colorized, encoded and written.
+    """
+
+    def __init__(self, directory: str, tile_size: int = RENDER_TILE_SIZE, colormap: str = "terrain",
+                 workers: int = RENDER_WORKERS, compression: int = RENDER_PNG_COMPRESSION) -> None:
+        self.directory = directory
+        self.tile_size = tile_size
+        self.lut = shaded_lut(colormap_lut(colormap), 1, AMBIENT_LIGHT)
+        self.shaded_lut = shaded_lut(colormap_lut(colormap), SHADES, AMBIENT_LIGHT)
+        self.workers = workers
+        self.compression = compression
+        self.settings: Optional[str] = None  # Digest of what IMAGE_CACHE was colorized with
+        self.sources: Dict[str, str] = {}  # Digest of the cells behind every deepest-level tile, by "x/y"
+        self.hashes: Dict[str, str] = {}  # Digest of every written tile, by "z/x/y"
+        self._read_manifest()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(directory={self.directory!r}, tile_size={self.tile_size})"
+
+    def max_zoom(self, shape: Tuple[int, int]) -> int:
+        """The zoom level at which an image of shape (rows, columns) is shown at full resolution."""
+        return int(np.ceil(np.log2(max(max(shape) / self.tile_size, 1))))
+
+    def image(self, values: np.ndarray, relief: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the full-resolution (rows, columns, 4) RGBA image of a map indexed [x, y] (as Grid2D
+        is): values in [0, 1] pick the colors, and relief, if given, is the elevation to hillshade by.
+        """
+        return self._pixels(values, relief, (slice(0, values.shape[0]), slice(0, values.shape[1])))
+
+    @log.log_method
+    def render(self, values: np.ndarray, relief: Optional[np.ndarray] = None,
+               on_tile: Optional[Callable[[str], None]] = None) -> RenderStats:
+        """
+        Renders the whole pyramid of a map indexed [x, y]; see image for the arguments. on_tile, if
+        given, is called with the "z/x/y" key of every tile once its file is up to date.
+
+        Only the deepest-level tiles whose cells changed are colorized again (see _update_image), and
+        only the tiles of any level above a changed one are hashed; the others are skipped as they are.
+        """
+        image, changed = self._update_image(values, relief)
+        stats = RenderStats()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = []
+            for zoom in range(self.max_zoom(image.shape[:2]), -1, -1):
+                for (tile_x, tile_y), tile_changed in np.ndenumerate(changed):
+                    key = f"{zoom}/{tile_x}/{tile_y}"
+                    written = key in self.hashes and os.path.exists(self._path(key))
+                    if written and not tile_changed:
+                        stats.skipped += 1
+                        if on_tile is not None:
+                            on_tile(key)
+                        continue
+                    tile = self._tile(image, tile_x, tile_y)
+                    digest = hashlib.blake2b(tile.tobytes(), digest_size=16).hexdigest()
+                    if written and self.hashes[key] == digest:
+                        stats.skipped += 1
+                        if on_tile is not None:
+                            on_tile(key)
+                        continue
+                    self.hashes[key] = digest
+                    futures.append((key, pool.submit(self._write, key, tile)))
+                if zoom:
+                    image = downsample(image)
+                    # A tile changed if any of the 2x2 tiles below it did
+                    changed = np.pad(changed, ((0, changed.shape[0] % 2), (0, changed.shape[1] % 2)))
+                    changed = changed[0::2, 0::2] | changed[1::2, 0::2] | changed[0::2, 1::2] | changed[1::2, 1::2]
+            for key, future in futures:
+                future.result()
+                stats.written += 1
+                if on_tile is not None:
+                    on_tile(key)
+        self._write_manifest()
+        log.success(f"Rendered tiles to {self.directory}: {stats.written} written, {stats.skipped} unchanged.")
+        return stats
+
+    def _update_image(self, values: np.ndarray, relief: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the full-resolution image (see image) and which deepest-level tiles changed, as a
+        mask indexed [tile_x, tile_y].
+
+        A tile changed when the digest of its cells (with relief, also the cells around it, which its
+        hillshade depends on) differs from the last render's. Only changed tiles are colorized; they
+        are written into IMAGE_CACHE in place, which provides the pixels of all the others.
+        """
+        size = self.tile_size
+        columns, rows = values.shape
+        windows = {
+            (tile_x, tile_y): (slice(tile_x * size, min((tile_x + 1) * size, columns)), slice(tile_y * size, min((tile_y + 1) * size, rows)))
+            for tile_x in range(-(-columns // size))
+            for tile_y in range(-(-rows // size))
+        }
+        sources = {}
+        for (tile_x, tile_y), window in windows.items():
+            source = hashlib.blake2b(np.ascontiguousarray(values[window]).tobytes(), digest_size=16)
+            if relief is not None:
+                source.update(np.ascontiguousarray(relief[self._margin(window)]).tobytes())
+            sources[f"{tile_x}/{tile_y}"] = source.hexdigest()
+
+        settings = hashlib.blake2b(repr((
+            values.shape, values.dtype.str, relief is not None and relief.dtype.str, RENDER_HILLSHADE_AZIMUTH,
+            RENDER_HILLSHADE_ALTITUDE, RENDER_HILLSHADE_EXAGGERATION,
+        )).encode() + (self.lut if relief is None else self.shaded_lut).tobytes(), digest_size=16).hexdigest()
+        path = os.path.join(self.directory, IMAGE_CACHE)
+        image = None
+        if settings == self.settings and os.path.exists(path):
+            image = np.load(path, mmap_mode="r+")
+            image = image if image.shape == (rows, columns, 4) and image.dtype == np.uint8 else None
+        if image is None:
+            self.sources = {}
+            os.makedirs(self.directory, exist_ok=True)
+            image = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(rows, columns, 4))
+
+        changed = np.zeros((-(-columns // size), -(-rows // size)), dtype=bool)
+        for tile_x, tile_y in windows:
+            key = f"{tile_x}/{tile_y}"
+            if self.sources.get(key) != sources[key]:
+                changed[tile_x, tile_y] = True
+                # Forgotten until the pixels are written, so an interrupted render never reuses them
+                self.sources.pop(key, None)
+        self.settings = settings
+        self._write_manifest()
+        for tile_x, tile_y in zip(*np.nonzero(changed)):
+            window = windows[(tile_x, tile_y)]
+            image[window[1], window[0]] = self._pixels(values, relief, window)
+        image.flush()
+        self.sources.update(sources)
+        return image, changed
+
+    def _pixels(self, values: np.ndarray, relief: Optional[np.ndarray], window: Tuple[slice, slice]) -> np.ndarray:
+        """Returns the (rows, columns, 4) RGBA image of the cells in window, a pair of slices indexed [x, y]."""
+        if relief is None:
+            pixels = colorize(values[window], self.lut)
+        else:
+            # The hillshade of a cell depends on its neighbours, so it is computed with a margin
+            margin = self._margin(window)
+            crop = tuple(slice(part.start - outer.start, part.stop - outer.start) for part, outer in zip(window, margin))
+            pixels = colorize(values[window], self.shaded_lut, hillshade(relief[margin])[crop], SHADES)
+        # Cells are [x, y]; image rows are y
+        return np.ascontiguousarray(pixels.T).view(np.uint8).reshape(pixels.shape[::-1] + (4,))
+
+    @staticmethod
+    def _margin(window: Tuple[slice, slice]) -> Tuple[slice, ...]:
+        """window grown by one cell on every side (slicing clips it to the map)."""
+        return tuple(slice(max(part.start - 1, 0), part.stop + 1) for part in window)
+
+    def _tile(self, image: np.ndarray, tile_x: int, tile_y: int) -> np.ndarray:
+        """The pixels of one tile of a level; edge tiles are padded transparent."""
+        size = self.tile_size
+        tile = image[tile_y * size:(tile_y + 1) * size, tile_x * size:(tile_x + 1) * size]
+        if tile.shape[:2] != (size, size):
+            tile = np.pad(tile, ((0, size - tile.shape[0]), (0, size - tile.shape[1]), (0, 0)))
+        return np.ascontiguousarray(tile)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, *key.split("/")) + ".png"
+
+    def _write(self, key: str, tile: np.ndarray) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.fromarray(tile).save(path, format="PNG", compress_level=self.compression)
+
+    def _read_manifest(self) -> None:
+        path = os.path.join(self.directory, TILE_MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as file:
+            manifest = json.load(file)
+        self.settings, self.sources, self.hashes = manifest["settings"], manifest["sources"], manifest["tiles"]
+
+    def _write_manifest(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, TILE_MANIFEST), "w") as file:
+            json.dump({"settings": self.settings, "sources": self.sources, "tiles": self.hashes}, file)
@@ -0,0 +1,198 @@
+"""
+A local HTTP front end for the JobManager, on asyncio streams (one request per connection).
+
+    POST /jobs                        Submit a job (JSON JobRequest fields); 202 with its summary.
+    POST /jobs?stream=1               Submit and follow it: an NDJSON stream of its events.
+    GET  /jobs/{id}                   The job's summary.
+    GET  /jobs/{id}/events            NDJSON stream of the job's events (past ones first) until it finishes.
+    GET  /jobs/{id}/tiles/{z}/{x}/{y}.png
+                                      A rendered tile.
+
+Events are {"event": "queued" | "stage" | "tile" | "done" | "failed", ...}; identical submissions
+get the same job id and share its events and tiles.
+"""
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+from utilities.logger import LoggerUtility as log
+from .jobs import JobManager, JobRequest, QueueFull
+from config import SERVER_HOST, SERVER_PORT, SERVER_OUTPUT_DIR, SERVER_WORKERS, SERVER_MAX_BODY
+
+REASONS: Dict[int, str] = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """An error answered with status and a JSON {"error": message} body."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class JobServer:
+    """Serves a JobManager over HTTP; see the module docstring for the routes."""
+
+    def __init__(self, manager: JobManager, host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(host={self.host!r}, port={self.port})"
+
+    async def start(self) -> None:
+        """Starts the manager and listens; with port 0, self.port becomes the port picked by the system."""
+        await self.manager.start()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        log.success(f"Job server listening on http://{self.host}:{self.port}.")
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.manager.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answers one request."""
+        try:
+            method, path, query, body = await self._read_request(reader)
+            await self._route(method, path, query, body, writer)
+        except HTTPError as error:
+            await self._respond(writer, error.status, {"error": str(error)})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, method: str, path: str, query: Dict[str, Any], body: bytes,
+                     writer: asyncio.StreamWriter) -> None:
+        parts = [part for part in path.split("/") if part]
+        if parts == ["jobs"]:
+            self._allow(method, "POST")
+            try:
+                request = JobRequest.from_payload(json.loads(body or b"{}"))
+            except (ValueError, TypeError) as error:
+                raise HTTPError(400, str(error))
+            try:
+                job, reused = self.manager.submit(request)
+            except QueueFull as error:
+                raise HTTPError(503, str(error))
+            summary = dict(job.summary(), reused=reused)
+            if query.get("stream", ["0"])[0] not in ("", "0"):
+                await self._stream(writer, job, summary)
+            else:
+                await self._respond(writer, 202, summary)
+            return
+        if len(parts) < 2 or parts[0] != "jobs":
+            raise HTTPError(404, f"No route for {path}.")
+        job = self.manager.get(parts[1])
+        if job is None:
+            raise HTTPError(404, f"No job {parts[1]}.")
+        self._allow(method, "GET")
+        if len(parts) == 2:
+            await self._respond(writer, 200, job.summary())
+        elif parts[2:] == ["events"]:
+            await self._stream(writer, job)
+        elif parts[2] == "tiles" and parts[-1].endswith(".png"):
+            tile = self.manager.tile_path(job, "/".join(parts[3:])[:-len(".png")])
+            if tile is None:
+                raise HTTPError(404, "No such tile.")
+            with open(tile, "rb") as file:
+                await self._respond_bytes(writer, 200, file.read(), "image/png")
+        else:
+            raise HTTPError(404, f"No route for {path}.")
+
+    async def _stream(self, writer: asyncio.StreamWriter, job: Any, first: Optional[Dict[str, Any]] = None) -> None:
+        """Writes the job's events as chunked NDJSON, one line per event, until it finishes."""
+        writer.write(self._head(200, "application/x-ndjson", {"Transfer-Encoding": "chunked"}))
+        if first is not None:
+            self._chunk(writer, first)
+        async for event in self.manager.events(job):
+            self._chunk(writer, event)
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, Any], bytes]:
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1")
+                if line in ("\r\n", "\n", ""):
+                    break
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Malformed request.")
+        if length > SERVER_MAX_BODY:
+            raise HTTPError(413, f"Bodies are limited to {SERVER_MAX_BODY} bytes.")
+        body = await reader.readexactly(length) if length else b""
+        path, _, query = target.partition("?")
+        return method.upper(), path, parse_qs(query, keep_blank_values=True), body
+
+    @staticmethod
+    def _allow(method: str, allowed: str) -> None:
+        if method != allowed:
+            raise HTTPError(405, f"Use {allowed}.")
+
+    @staticmethod
+    def _head(status: int, content_type: str, headers: Optional[Dict[str, str]] = None) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    @staticmethod
+    def _chunk(writer: asyncio.StreamWriter, event: Dict[str, Any]) -> None:
+        line = json.dumps(event).encode() + b"\n"
+        writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, data: Dict[str, Any]) -> None:
+        await self._respond_bytes(writer, status, json.dumps(data).encode(), "application/json")
+
+    async def _respond_bytes(self, writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str) -> None:
+        writer.write(self._head(status, content_type, {"Content-Length": str(len(body))}) + body)
+        await writer.drain()
+
+
+async def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, **manager_options) -> None:
+    """Runs a job server until cancelled."""
+    server = JobServer(JobManager(**manager_options), host, port)
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m server", description="Serve world generation jobs over local HTTP.")
+    parser.add_argument("--host", default=SERVER_HOST, help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to listen on.")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Worker processes running jobs.")
+    parser.add_argument("--output", default=SERVER_OUTPUT_DIR, help="Where job tiles are written.")
+    arguments = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, workers=arguments.workers, directory=arguments.output))
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,299 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from utilities.logger import LoggerUtility as log
+from config import (
+    SEED,
+    GRID_SIZE,
+    MAX_ELEVATION,
+    MAX_DEPTH,
+    RENDER_HILLSHADE,
+    STAGE_CACHE_DIR,
+    SERVER_OUTPUT_DIR,
+    SERVER_MAX_PENDING,
+    SERVER_RESULT_CACHE,
+    SERVER_MAX_SIZE,
+    SERVER_MAX_ITERATIONS,
+    SERVER_WORKERS,
+)
+
+# TerrainGenerator attributes a request may set, with their types
+GENERATOR_PARAMETERS: Dict[str, type] = {
+    "erosion_iterations": int,
+    "river_threshold": float,
+}
+
+FINISHED = ("done", "failed")
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while SERVER_MAX_PENDING jobs are queued or running."""
+
+
+@dataclass(frozen=True)
+class JobRequest:
+    """What a generation job makes: the world's seed, size and elevation range, and generator parameters."""
+    seed: int = SEED
+    size: Tuple[int, int] = GRID_SIZE
+    max_elevation: float = MAX_ELEVATION
+    max_depth: float = MAX_DEPTH
+    params: Tuple[Tuple[str, Any], ...] = ()  # Sorted (name, value) pairs of GENERATOR_PARAMETERS
+    relief: bool = RENDER_HILLSHADE  # Hillshade the tiles
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "JobRequest":
+        """Builds a request from decoded JSON, raising ValueError on anything it does not accept."""
+        if not isinstance(payload, dict):
+            raise ValueError("A job request is a JSON object.")
+        unknown = set(payload) - {"seed", "size", "max_elevation", "max_depth", "params", "relief"}
+        if unknown:
+            raise ValueError(f"Unknown fields: {sorted(unknown)}.")
+        size = tuple(int(side) for side in payload.get("size", GRID_SIZE))
+        if len(size) != 2 or not all(1 <= side <= SERVER_MAX_SIZE for side in size):
+            raise ValueError(f"size must be two sides between 1 and {SERVER_MAX_SIZE}.")
+        params = payload.get("params", {})
+        if not isinstance(params, dict) or set(params) - set(GENERATOR_PARAMETERS):
+            raise ValueError(f"params may only set {sorted(GENERATOR_PARAMETERS)}.")
+        params = {name: GENERATOR_PARAMETERS[name](value) for name, value in params.items()}
+        if not 0 <= params.get("erosion_iterations", 0) <= SERVER_MAX_ITERATIONS:
+            raise ValueError(f"erosion_iterations must be between 0 and {SERVER_MAX_ITERATIONS}.")
+        if not math.isfinite(params.get("river_threshold", 1.0)) or params.get("river_threshold", 1.0) <= 0:
+            raise ValueError("river_threshold must be finite and positive.")
+        request = cls(
+            seed=int(payload.get("seed", SEED)),
+            size=size,
+            max_elevation=float(payload.get("max_elevation", MAX_ELEVATION)),
+            max_depth=float(payload.get("max_depth", MAX_DEPTH)),
+            params=tuple(sorted(params.items())),
+            relief=bool(payload.get("relief", RENDER_HILLSHADE)),
+        )
+        if not all(0 < value < math.inf for value in (request.max_elevation, request.max_depth)):
+            raise ValueError("max_elevation and max_depth must be finite and positive.")
+        return request
+
+    @property
+    def key(self) -> str:
+        """Hash of everything the request determines: identical requests share it."""
+        recipe = json.dumps(asdict(self), sort_keys=True)
+        return hashlib.blake2b(recipe.encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class Job:
+    """
+    A generation job and everything it reported so far.
+
+    Attributes:
+        id (str): The request's key.
+        request (JobRequest): What the job makes.
+        directory (str): Where its tiles go.
+        status (str): queued (waiting for a worker), running, done or failed.
+        events (List[Dict[str, Any]]): Every event so far, replayed to late subscribers.
+        subscribers (List[asyncio.Queue]): Queues of the clients following the job.
+        requests (int): Submissions coalesced into this job.
+    """
+    id: str
+    request: JobRequest
+    directory: str
+    status: str = "queued"
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
+    requests: int = 1
+
+    def summary(self) -> Dict[str, Any]:
+        data = {"id": self.id, "status": self.status, "requests": self.requests, "request": asdict(self.request)}
+        data["request"]["params"] = dict(self.request.params)
+        if self.status in FINISHED:
+            data["result"] = self.events[-1]
+        return data
+
+
+def run_job(job_id: str, request: JobRequest, directory: str, cache_directory: Optional[str], queue: Any) -> Dict[str, Any]:
+    """
+    Generates and renders one world in a worker process, putting (job id, event) pairs on queue
+    (a multiprocessing manager queue) as stages start and tiles are written.
+    """
+    from maps.map_orchestrator import MapOrchestrator
+    from rendering.tiles import TileRenderer
+    from terrain.terrain_generator import TerrainGenerator
+    from utilities.stage_cache import StageCache
+
+    start = time.perf_counter()
+    generator = TerrainGenerator(
+        MapOrchestrator(size=request.size, max_elevation=request.max_elevation, max_depth=request.max_depth, seed=request.seed),
+        cache=StageCache(cache_directory),
+    )
+    for name, value in request.params:
+        setattr(generator, name, value)
+    generator.generate(progress=lambda stage: queue.put((job_id, {"event": "stage", "stage": stage})))
+    queue.put((job_id, {"event": "stage", "stage": "tiles"}))
+    grid = generator.map.grid
+    renderer = TileRenderer(directory)
+    stats = renderer.render(
+        grid.normalized_elevation_map(),
+        grid.elevation_map() if request.relief else None,
+        on_tile=lambda key: queue.put((job_id, {"event": "tile", "tile": key, "url": f"/jobs/{job_id}/tiles/{key}.png"})),
+    )
+    return {
+        "tiles": stats.written + stats.skipped,
+        "max_zoom": renderer.max_zoom(request.size[::-1]),
+        "seconds": time.perf_counter() - start,
+        "cache_hits": generator.cache.hits,
+        "cache_misses": generator.cache.misses,
+    }
+
+
+class JobManager:
+    """
+    Runs generation jobs on a bounded pool of worker processes and fans their progress out to
+    every client following them.
+
+    Identical requests share one job: a submission whose key matches a queued, running or recently
+    completed job (the last result_cache ones) joins it instead of running again. Failed jobs are
+    forgotten, so resubmitting retries. Workers also share the on-disk StageCache, so jobs that
+    differ only in late-stage parameters reuse the early stages.
+    """
+
+    def __init__(self, directory: str = SERVER_OUTPUT_DIR, workers: int = SERVER_WORKERS,
+                 max_pending: int = SERVER_MAX_PENDING, result_cache: int = SERVER_RESULT_CACHE,
+                 cache_directory: Optional[str] = STAGE_CACHE_DIR) -> None:
+        self.directory = directory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_cache = result_cache
+        self.cache_directory = cache_directory
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.manager: Any = None
+        self.queue: Any = None  # Manager queue of (job id, event) pairs from the workers
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pump: Optional[threading.Thread] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(directory={self.directory!r}, workers={self.workers})"
+
+    async def start(self) -> None:
+        """Starts the worker pool and the thread forwarding worker progress to the event loop."""
+        self.loop = asyncio.get_running_loop()
+        # Spawned, not forked: workers start lazily, and a forked one would inherit the open client
+        # connections (which then never see EOF)
+        context = multiprocessing.get_context("spawn")
+        self.manager = context.Manager()
+        self.queue = self.manager.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        self.pump = threading.Thread(target=self._pump, name="job-progress", daemon=True)
+        self.pump.start()
+
+    async def close(self) -> None:
+        """Stops the pool (waiting for running jobs) and the progress thread."""
+        if self.pool is not None:
+            await self.loop.run_in_executor(None, self.pool.shutdown)
+            self.queue.put(None)
+            self.pump.join()
+            self.manager.shutdown()
+            self.pool = None
+
+    @property
+    def pending(self) -> int:
+        return sum(job.status not in FINISHED for job in self.jobs.values())
+
+    def submit(self, request: JobRequest) -> Tuple[Job, bool]:
+        """Returns the job making request, and whether an existing one was reused."""
+        job = self.jobs.get(request.key)
+        if job is not None:
+            job.requests += 1
+            self.jobs.move_to_end(job.id)
+            log.info(f"Job {job.id} reused ({job.status}, {job.requests} requests).")
+            return job, True
+        if self.pending >= self.max_pending:
+            raise QueueFull(f"{self.pending} jobs are already pending.")
+        job = Job(request.key, request, os.path.join(self.directory, request.key))
+        self.jobs[job.id] = job
+        self._publish(job.id, {"event": "queued", "id": job.id})
+        self.loop.create_task(self._run(job))
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def events(self, job: Job) -> AsyncIterator[Dict[str, Any]]:
+        """Yields every event of a job, past ones first, until it finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in job.events:
+            queue.put_nowait(event)
+        if job.status not in FINISHED:
+            job.subscribers.append(queue)
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in FINISHED:
+                    return
+        finally:
+            if queue in job.subscribers:
+                job.subscribers.remove(queue)
+
+    def tile_path(self, job: Job, key: str) -> Optional[str]:
+        """Returns the file of a job's "z/x/y" tile, or None if it has none."""
+        parts = key.split("/")
+        if len(parts) != 3 or not all(part.isdigit() for part in parts):
+            return None
+        path = os.path.join(job.directory, *parts) + ".png"
+        return path if os.path.exists(path) else None
+
+    async def _run(self, job: Job) -> None:
+        try:
+            result = await self.loop.run_in_executor(
+                self.pool, run_job, job.id, job.request, job.directory, self.cache_directory, self.queue,
+            )
+            event = dict(result, event="done")
+        except Exception as error:
+            event = {"event": "failed", "error": repr(error)}
+        # The final event goes through the progress queue too, so it arrives after all of the job's progress
+        await self.loop.run_in_executor(None, self.queue.put, (job.id, event))
+
+    def _pump(self) -> None:
+        """Forwards (job id, event) pairs from the worker processes to the event loop, in order."""
+        while True:
+            try:
+                item = self.queue.get()
+            except (EOFError, ConnectionError):
+                return  # The manager shut down
+            if item is None:
+                return
+            self.loop.call_soon_threadsafe(self._publish, *item)
+
+    def _publish(self, job_id: str, event: Dict[str, Any]) -> None:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.events.append(event)
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+        if event["event"] == "stage" and job.status == "queued":
+            job.status = "running"  # A worker picked the job up
+        elif event["event"] == "done":
+            job.status = "done"
+            log.success(f"Job {job.id} done in {event['seconds']:.2f} s.")
+            self._forget_old_results()
+        elif event["event"] == "failed":
+            job.status = "failed"
+            log.error(f"Job {job.id} failed: {event['error']}")
+            del self.jobs[job_id]
+            shutil.rmtree(job.directory, ignore_errors=True)  # Partial tiles
+
+    def _forget_old_results(self) -> None:
+        """Drops the least recently requested completed jobs beyond result_cache, and their tiles."""
+        done = [job_id for job_id, job in self.jobs.items() if job.status == "done"]
+        for job_id in done[:max(0, len(done) - self.result_cache)]:
+            shutil.rmtree(self.jobs.pop(job_id).directory, ignore_errors=True)
@@ -0,0 +1,191 @@
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+import numpy as np
+from maps.grid import Grid2D, LAND
+from utilities.logger import LoggerUtility as log
+from .noise_ops import PerlinNoise, VoronoiNoise
+from .erosion import Erosion
+from .terrain_generator import PERLIN_WEIGHT, VORONOI_WEIGHT, HEIGHT_REFERENCE, erosion_rng
+from config import (
+    SEED,
+    MAX_ELEVATION,
+    MAX_DEPTH,
+    PERLIN_SCALE,
+    PERLIN_OCTAVES,
+    PERLIN_PERSISTENCE,
+    PERLIN_LACUNARITY,
+    PERLIN_CHUNK_ROWS,
+    VORONOI_REGIONS,
+    VORONOI_SITE_SPACING,
+    EROSION_ITERATIONS,
+    EROSION_TILE_SIZE,
+    EROSION_TILE_HALO,
+    BATCH_CHUNK_WORLDS,
+    BATCH_HISTOGRAM_BINS,
+)
+
+# The (N,) statistics WorldStats.rank orders seeds by
+STATISTICS: Tuple[str, ...] = ("land_fraction", "mean_elevation", "min_elevation", "max_elevation", "ruggedness")
+
+
+@dataclass(frozen=True)
+class WorldStats:
+    """
+    Summary statistics of a batch of worlds; every array is indexed like seeds.
+
+    Attributes:
+        seeds (np.ndarray): (N,) seeds of the worlds.
+        land_fraction (np.ndarray): Fraction of the cells that are land (at or above sea level, max_depth).
+        mean_elevation (np.ndarray): Mean elevation in kilometers.
+        min_elevation (np.ndarray): Lowest elevation.
+        max_elevation (np.ndarray): Highest elevation.
+        ruggedness (np.ndarray): Mean absolute elevation difference between neighbouring cells.
+        histogram (np.ndarray): (N, bins) fraction of the cells in every elevation bin.
+        bin_edges (np.ndarray): (bins + 1,) elevations bounding the bins, from 0 (the deepest sea floor)
+            to max_elevation + max_depth.
+    """
+    seeds: np.ndarray
+    land_fraction: np.ndarray
+    mean_elevation: np.ndarray
+    min_elevation: np.ndarray
+    max_elevation: np.ndarray
+    ruggedness: np.ndarray
+    histogram: np.ndarray
+    bin_edges: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.seeds)
+
+    def rank(self, statistic: str, descending: bool = True) -> np.ndarray:
+        """Returns the seeds ordered by one of STATISTICS, largest first unless descending is False."""
+        if statistic not in STATISTICS:
+            raise ValueError(f"Unknown statistic {statistic!r}; expected one of {STATISTICS}.")
+        values = getattr(self, statistic)
+        order = np.argsort(-values if descending else values, kind="stable")
+        return self.seeds[order]
+
+    @classmethod
+    def concatenate(cls, parts: Sequence["WorldStats"]) -> "WorldStats":
+        """Joins the statistics of consecutive chunks of seeds."""
+        arrays = {
+            name: np.concatenate([getattr(part, name) for part in parts])
+            for name in ("seeds",) + STATISTICS + ("histogram",)
+        }
+        return cls(bin_edges=parts[0].bin_edges, **arrays)
+
+
+class BatchGenerator:
+    """
+    Generates the heightmaps of many worlds, one per seed, for seed sweeps.
+
+    World n is the heightmap TerrainGenerator.generate_heightmap makes for seeds[n] (the same noise,
+    erosion tiles and tile generators), but the noise, Voronoi and erosion run on stacked (N, X, Y)
+    arrays, without a MapOrchestrator, graph or stage cache per world. Worlds go through chunk_worlds
+    at a time, which bounds the memory of the erosion's stacked arrays.
+    """
+
+    def __init__(self, size: Tuple[int, int], max_elevation: float = MAX_ELEVATION, max_depth: float = MAX_DEPTH,
+                 chunk_worlds: int = BATCH_CHUNK_WORLDS) -> None:
+        self.size = tuple(size)
+        self.max_elevation = max_elevation
+        self.max_depth = max_depth
+        self.chunk_worlds = chunk_worlds
+        self.erosion_iterations = EROSION_ITERATIONS
+        # Noise parameters; their seeds are unused, every world gets its own
+        self.perlin = PerlinNoise(
+            scale=PERLIN_SCALE,
+            seed=SEED,
+            octaves=PERLIN_OCTAVES,
+            persistence=PERLIN_PERSISTENCE,
+            lacunarity=PERLIN_LACUNARITY,
+            chunk_rows=PERLIN_CHUNK_ROWS,
+        )
+        self.voronoi = VoronoiNoise(regions=VORONOI_REGIONS, seed=SEED, spacing=VORONOI_SITE_SPACING)
+        log.success("Batch generator initialized.")
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(size={self.size}, chunk_worlds={self.chunk_worlds})"
+
+    def noise(self, seeds: Sequence[int], size: Tuple[int, int], origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """Returns the (N, X, Y) combined Perlin and Voronoi noise of a window of every seed's world."""
+        return (
+            self.perlin.generate_batch(seeds, size, origin) * PERLIN_WEIGHT +
+            self.voronoi.generate_window_batch(seeds, size, origin) * VORONOI_WEIGHT
+        )
+
+    @log.log_method
+    def heightmaps(self, seeds: Sequence[int]) -> np.ndarray:
+        """Returns the (N, X, Y) elevation (kilometers) of every seed's world."""
+        seeds = np.asarray(seeds, dtype=np.int64).ravel()
+        elevation = np.empty((len(seeds),) + self.size, dtype=np.float32)
+        for start in range(0, len(seeds), self.chunk_worlds):
+            elevation[start:start + self.chunk_worlds] = self._heightmaps(seeds[start:start + self.chunk_worlds])
+        log.success(f"{len(seeds)} heightmaps generated.")
+        return elevation
+
+    def generate(self, seeds: Sequence[int]) -> Tuple[np.ndarray, WorldStats]:
+        """Returns the (N, X, Y) elevation of every seed's world and its summary statistics."""
+        elevation = self.heightmaps(seeds)
+        return elevation, self.statistics(seeds, elevation)
+
+    @log.log_method
+    def sweep(self, seeds: Sequence[int]) -> WorldStats:
+        """Returns the summary statistics of every seed's world, keeping one chunk of heightmaps at a time."""
+        seeds = np.asarray(seeds, dtype=np.int64).ravel()
+        parts = [
+            self.statistics(chunk, self._heightmaps(chunk))
+            for chunk in (seeds[start:start + self.chunk_worlds] for start in range(0, len(seeds), self.chunk_worlds))
+        ]
+        log.success(f"Swept {len(seeds)} seeds.")
+        return WorldStats.concatenate(parts)
+
+    def statistics(self, seeds: Sequence[int], elevation: np.ndarray) -> WorldStats:
+        """Summarizes (N, X, Y) elevations, one world per seed, in a few passes over the stack."""
+        seeds = np.asarray(seeds, dtype=np.int64).ravel()
+        count, cells = len(seeds), elevation.shape[1] * elevation.shape[2]
+        normalized = np.empty(elevation.shape, dtype=np.float32)
+        cell_type = np.empty(elevation.shape, dtype=np.uint8)
+        Grid2D.classify(elevation, self.max_elevation, self.max_depth, out_normalized=normalized, out_type=cell_type)
+
+        # Histogram of every world in one bincount, world n counting into bins [n * bins, (n + 1) * bins)
+        bins = BATCH_HISTOGRAM_BINS
+        height = self.max_elevation + self.max_depth
+        index = (elevation * np.float32(bins / height)).astype(np.int64)
+        np.clip(index, 0, bins - 1, out=index)
+        index += (np.arange(count) * bins)[:, np.newaxis, np.newaxis]
+        histogram = np.bincount(index.ravel(), minlength=count * bins).reshape(count, bins) / cells
+
+        steps = [np.abs(np.diff(elevation, axis=axis)).mean(axis=(1, 2)) for axis in (1, 2) if elevation.shape[axis] > 1]
+        return WorldStats(
+            seeds=seeds,
+            land_fraction=(cell_type == LAND).mean(axis=(1, 2)),
+            mean_elevation=elevation.mean(axis=(1, 2), dtype=np.float64),
+            min_elevation=elevation.min(axis=(1, 2)),
+            max_elevation=elevation.max(axis=(1, 2)),
+            ruggedness=np.mean(steps, axis=0) if steps else np.zeros(count),
+            histogram=histogram,
+            bin_edges=np.linspace(0.0, height, bins + 1),
+        )
+
+    def _heightmaps(self, seeds: np.ndarray) -> np.ndarray:
+        """The heightmaps of one chunk of seeds: TerrainGenerator.generate_window at the origin, stacked."""
+        # The noise under every erosion tile of the map, halos included (TerrainGenerator.noise_bounds)
+        tiles = [-(-side // EROSION_TILE_SIZE) for side in self.size]
+        noise = self.noise(
+            seeds,
+            tuple(count * EROSION_TILE_SIZE + 2 * EROSION_TILE_HALO for count in tiles),
+            (-EROSION_TILE_HALO, -EROSION_TILE_HALO),
+        )
+        heightmap = np.empty((len(seeds),) + self.size, dtype=np.float32)
+        span = EROSION_TILE_SIZE + 2 * EROSION_TILE_HALO
+        for tile_x in range(tiles[0]):
+            for tile_y in range(tiles[1]):
+                # noise[:, 0, 0] is world cell (-EROSION_TILE_HALO, -EROSION_TILE_HALO)
+                x0, y0 = tile_x * EROSION_TILE_SIZE, tile_y * EROSION_TILE_SIZE
+                rngs = [erosion_rng(int(seed), tile_x, tile_y) for seed in seeds]
+                eroded = Erosion.apply(noise[:, x0:x0 + span, y0:y0 + span], iterations=self.erosion_iterations, rng=rngs)
+                x1, y1 = min(self.size[0], x0 + EROSION_TILE_SIZE), min(self.size[1], y0 + EROSION_TILE_SIZE)
+                heightmap[:, x0:x1, y0:y1] = eroded[:, EROSION_TILE_HALO:EROSION_TILE_HALO + x1 - x0,
+                                                    EROSION_TILE_HALO:EROSION_TILE_HALO + y1 - y0]
+        heightmap *= (self.max_elevation + self.max_depth) / HEIGHT_REFERENCE
+        return heightmap
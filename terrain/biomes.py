@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+from utilities.logger import LoggerUtility as log
+from config import (
+    BIOME_NORTH_TEMPERATURE,
+    BIOME_SOUTH_TEMPERATURE,
+    BIOME_LAPSE_RATE,
+    BIOME_TEMPERATURE_LEVELS,
+    BIOME_MOISTURE_LEVELS,
+)
+
+# Name and RGB color of every biome; the index is the uint8 code stored in biome maps
+BIOMES: List[Tuple[str, Tuple[int, int, int]]] = [
+    ("ocean", (38, 76, 150)),
+    ("snow", (240, 240, 245)),
+    ("tundra", (160, 170, 150)),
+    ("cold desert", (190, 180, 150)),
+    ("taiga", (60, 100, 80)),
+    ("desert", (230, 210, 150)),
+    ("grassland", (170, 200, 100)),
+    ("shrubland", (150, 160, 90)),
+    ("temperate forest", (70, 140, 60)),
+    ("temperate rainforest", (30, 110, 70)),
+    ("savanna", (200, 190, 90)),
+    ("tropical seasonal forest", (110, 160, 40)),
+    ("tropical rainforest", (20, 100, 30)),
+]
+(OCEAN, SNOW, TUNDRA, COLD_DESERT, TAIGA, DESERT, GRASSLAND, SHRUBLAND, TEMPERATE_FOREST,
+ TEMPERATE_RAINFOREST, SAVANNA, TROPICAL_SEASONAL_FOREST, TROPICAL_RAINFOREST) = range(len(BIOMES))
+BIOME_NAMES: List[str] = [name for name, _ in BIOMES]
+BIOME_PALETTE: np.ndarray = np.array([color for _, color in BIOMES], dtype=np.uint8)
+
+# Whittaker-style table: one row per temperature bin (cold to hot), one column per moisture bin
+# (dry to wet), plus a last row of water cells
+WHITTAKER_TABLE: np.ndarray = np.array([
+    [TUNDRA, TUNDRA, SNOW, SNOW, SNOW],
+    [COLD_DESERT, TUNDRA, TAIGA, TAIGA, TAIGA],
+    [DESERT, GRASSLAND, SHRUBLAND, TEMPERATE_FOREST, TEMPERATE_RAINFOREST],
+    [DESERT, SAVANNA, SAVANNA, TROPICAL_SEASONAL_FOREST, TROPICAL_RAINFOREST],
+    [OCEAN, OCEAN, OCEAN, OCEAN, OCEAN],
+], dtype=np.uint8)
+
+
+@dataclass(frozen=True)
+class BiomeClassifier:
+    """
+    Classifies cells into biomes from temperature and moisture.
+
+    Temperature falls linearly from south to north and by lapse_rate per kilometer of elevation;
+    moisture is the precipitation. Both are quantized into the bins between their levels, and the
+    biome of every cell is one lookup into a table indexed by (temperature bin, moisture bin),
+    whose last row holds the water cells.
+    """
+    north_temperature: float = BIOME_NORTH_TEMPERATURE
+    south_temperature: float = BIOME_SOUTH_TEMPERATURE
+    lapse_rate: float = BIOME_LAPSE_RATE
+    temperature_levels: Tuple[float, ...] = BIOME_TEMPERATURE_LEVELS
+    moisture_levels: Tuple[float, ...] = BIOME_MOISTURE_LEVELS
+
+    def temperature(self, elevation: np.ndarray) -> np.ndarray:
+        """Returns the (X, Y) float32 mean temperature (degrees C) of an elevation map (kilometers above sea level) indexed [x, y]."""
+        elevation = np.asarray(elevation, dtype=np.float32)
+        latitude = np.linspace(0.0, 1.0, elevation.shape[1], dtype=np.float32)
+        sea_level = np.float32(self.north_temperature) + np.float32(self.south_temperature - self.north_temperature) * latitude
+        temperature = np.maximum(elevation, 0)
+        temperature *= np.float32(-self.lapse_rate)
+        temperature += sea_level[np.newaxis, :]
+        return temperature
+
+    @log.log_method
+    def classify(self, elevation: np.ndarray, precipitation: np.ndarray, water: Optional[np.ndarray] = None,
+                 table: np.ndarray = WHITTAKER_TABLE) -> np.ndarray:
+        """
+        Returns the (X, Y) uint8 biome codes of a map indexed [x, y], from its elevation (kilometers above
+        sea level) and precipitation; water cells are OCEAN.
+        """
+        if table.shape != (len(self.temperature_levels) + 2, len(self.moisture_levels) + 1):
+            raise ValueError(f"A biome table for these levels needs shape {(len(self.temperature_levels) + 2, len(self.moisture_levels) + 1)}.")
+        index_type = np.min_scalar_type(table.size - 1)
+        row = np.searchsorted(np.asarray(self.temperature_levels, dtype=np.float32), self.temperature(elevation), side="right").astype(index_type)
+        if water is not None:
+            row[water] = len(self.temperature_levels) + 1
+        column = np.searchsorted(np.asarray(self.moisture_levels, dtype=np.float32), np.asarray(precipitation, dtype=np.float32), side="right").astype(index_type)
+        # Flat table index row * columns + column, built in place in row
+        row *= index_type.type(table.shape[1])
+        row += column
+        return table.ravel()[row]
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+from utilities.logger import LoggerUtility as log
+from config import (
+    CLIMATE_WIND_DIRECTION,
+    CLIMATE_HUMIDITY,
+    CLIMATE_BASE_RATE,
+    CLIMATE_OROGRAPHIC_RATE,
+    CLIMATE_LEE_DRYING,
+    CLIMATE_MAX_RAIN_FRACTION,
+    CLIMATE_OCEAN_RECHARGE,
+    CLIMATE_SCAN_BLOCK,
+    PATH_CELL_SIZE,
+)
+
+
+def wind_vector(direction: float) -> Tuple[float, float]:
+    """
+    Returns the unit (dx, dy) step of a wind blowing from direction (degrees clockwise from north,
+    which is up: -y on a grid indexed [x, y]).
+    """
+    angle = np.radians(direction)
+    # Rounding makes the cardinal directions exact
+    return float(np.round(-np.sin(angle), 12)), float(np.round(np.cos(angle), 12))
+
+
+def bilinear(image: np.ndarray, rows: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Samples image at fractional (rows, columns) positions. Returns the float32 values and whether
+    each position lies within the image; positions outside get the nearest edge value.
+    """
+    if min(image.shape) < 2:
+        image = np.pad(image, [(0, max(0, 2 - side)) for side in image.shape], mode="edge")
+    image = np.ascontiguousarray(image, dtype=np.float32)
+    height, width = image.shape
+    rows = np.asarray(rows, dtype=np.float32)
+    columns = np.asarray(columns, dtype=np.float32)
+    inside = (rows >= 0) & (rows <= height - 1) & (columns >= 0) & (columns <= width - 1)
+    rows = np.clip(rows, 0, height - 1)
+    columns = np.clip(columns, 0, width - 1)
+    row = np.minimum(rows.astype(np.int32), height - 2)
+    column = np.minimum(columns.astype(np.int32), width - 2)
+    rows -= row
+    columns -= column
+    # Flat index of the top-left corner; the other three are +1, +width and +width + 1
+    index = row.astype(np.int64) * width + column
+    flat = image.ravel()
+    top_left, top_right = flat[index], flat[index + 1]
+    index += width
+    bottom_left, bottom_right = flat[index], flat[index + 1]
+    top_right -= top_left
+    top_right *= columns
+    top_left += top_right
+    bottom_right -= bottom_left
+    bottom_right *= columns
+    bottom_left += bottom_right
+    bottom_left -= top_left
+    bottom_left *= rows
+    top_left += bottom_left
+    return top_left, inside
+
+
+@dataclass(frozen=True)
+class PrecipitationModel:
+    """
+    Orographic precipitation from a prevailing wind.
+
+    Air enters the map upwind with humidity and crosses it cell by cell. On every step a fraction
+    of its moisture rains out: base_rate, plus orographic_rate per unit of upslope grade, damped
+    by exp(-lee_drying * grade) on downslopes. Over water the air regains ocean_recharge of its
+    missing moisture. Mountains therefore get rain on their windward slopes and cast a rain
+    shadow behind them.
+
+    The grid is resampled (bilinearly) onto a frame whose rows run along the wind, so any
+    direction reduces to the same scan down the rows. Moisture follows the linear recurrence
+    q[i + 1] = a[i] * q[i] + b[i], which is solved for a block of rows at once with cumulative
+    sums (in log space) and carried from block to block.
+    """
+    wind_direction: float = CLIMATE_WIND_DIRECTION  # Degrees clockwise from north the wind blows from
+    humidity: float = CLIMATE_HUMIDITY
+    base_rate: float = CLIMATE_BASE_RATE
+    orographic_rate: float = CLIMATE_OROGRAPHIC_RATE
+    lee_drying: float = CLIMATE_LEE_DRYING
+    max_rain_fraction: float = CLIMATE_MAX_RAIN_FRACTION
+    ocean_recharge: float = CLIMATE_OCEAN_RECHARGE
+    cell_size: float = PATH_CELL_SIZE  # Kilometers between neighbouring cell centres, as elevations are in kilometers
+
+    @log.log_method
+    def simulate(self, elevation: np.ndarray, water: Optional[np.ndarray] = None,
+                 block: int = CLIMATE_SCAN_BLOCK) -> np.ndarray:
+        """Returns the (X, Y) float32 precipitation of an elevation map (kilometers) indexed [x, y]."""
+        if self.max_rain_fraction + self.ocean_recharge >= 1:
+            raise ValueError("max_rain_fraction + ocean_recharge must stay below 1.")
+        elevation = np.asarray(elevation, dtype=np.float32)
+        size_x, size_y = elevation.shape
+        wet = None if water is None else np.asarray(water, dtype=np.float32)
+        dx, dy = wind_vector(self.wind_direction)
+
+        # The rotated frame: row u runs along the wind, column v across it
+        corners_x = np.array([0, size_x - 1, 0, size_x - 1], dtype=np.float64)
+        corners_y = np.array([0, 0, size_y - 1, size_y - 1], dtype=np.float64)
+        u0 = float((corners_x * dx + corners_y * dy).min())
+        v0 = float((-corners_x * dy + corners_y * dx).min())
+        rows = int(np.floor((corners_x * dx + corners_y * dy).max() - u0)) + 1
+        columns = int(np.floor((-corners_x * dy + corners_y * dx).max() - v0)) + 1
+        v = v0 + np.arange(columns, dtype=np.float64)
+
+        rain = np.empty((rows, columns), dtype=np.float32)
+        moisture = np.full(columns, self.humidity, dtype=np.float32)
+        previous = None  # Elevation of the last row of the previous block
+        for start in range(0, rows, block):
+            u = (u0 + np.arange(start, min(start + block, rows), dtype=np.float64))[:, np.newaxis]
+            # World (x, y) of the block's cells
+            x, y = u * dx - v * dy, u * dy + v * dx
+            height, inside = bilinear(elevation, x, y)
+            upwind = np.concatenate([(height[:1] if previous is None else previous[np.newaxis]), height[:-1]])
+            grade = (height - upwind) / np.float32(self.cell_size)
+            previous = height[-1]
+
+            fraction = np.float32(self.base_rate) + np.float32(self.orographic_rate) * np.maximum(grade, 0)
+            np.minimum(fraction, np.float32(self.max_rain_fraction), out=fraction)
+            fraction *= np.exp(np.float32(-self.lee_drying) * np.maximum(-grade, 0))
+            fraction *= inside  # Air passes unchanged outside the map
+            recharge = None if wet is None else np.float32(self.ocean_recharge) * bilinear(wet, x, y)[0] * inside
+            rain[start:start + len(u)], moisture = self._scan(moisture, fraction, recharge)
+        log.success(f"Precipitation simulated on a {rows}x{columns} wind-aligned frame.")
+
+        # Back to the grid: every cell samples the rotated frame at its own (u, v)
+        result = np.empty(elevation.shape, dtype=np.float32)
+        y = np.arange(size_y, dtype=np.float64)[np.newaxis, :]
+        for start in range(0, size_x, block):
+            x = np.arange(start, min(start + block, size_x), dtype=np.float64)[:, np.newaxis]
+            result[start:start + len(x)], _ = bilinear(rain, x * dx + y * dy - u0, -x * dy + y * dx - v0)
+        return result
+
+    def _scan(self, moisture: np.ndarray, fraction: np.ndarray,
+              recharge: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Runs a block of rows: returns the rain of every cell and the moisture leaving the last row.
+
+        With a = 1 - fraction - recharge and b = recharge * humidity, q[i] / A[i - 1] (A being the
+        running product of a) grows by b[i] / A[i] per row, so the moisture of every row comes from
+        two cumulative sums. a >= 1 - max_rain_fraction - ocean_recharge keeps A within float32
+        over a block of CLIMATE_SCAN_BLOCK rows.
+        """
+        a = 1 - fraction if recharge is None else 1 - fraction - recharge
+        log_a = np.cumsum(np.log(a), axis=0)
+        # A[i - 1]: the share of the block's incoming moisture left on reaching each row
+        before = np.exp(log_a[:-1])
+        arriving = np.empty_like(a)
+        arriving[0] = moisture
+        arriving[1:] = before * moisture
+        if recharge is not None:
+            scaled = recharge * np.float32(self.humidity) * np.exp(-log_a)
+            # Exclusive prefix sums: what the air gained before reaching each row
+            gained = np.cumsum(scaled[:-1], axis=0)
+            arriving[1:] += before * gained
+        leaving = a[-1] * arriving[-1] + (0 if recharge is None else recharge[-1] * np.float32(self.humidity))
+        arriving *= fraction
+        return arriving, leaving
@@ -1,16 +1,215 @@
-
+from dataclasses import dataclass
+from typing import Sequence, Tuple, Union
 import numpy as np
 from utilities.logger import LoggerUtility as log
+from config import (
+    EROSION_TIME_STEP,
+    EROSION_RAIN_RATE,
+    EROSION_EVAPORATION_RATE,
+    EROSION_SEDIMENT_CAPACITY,
+    EROSION_DISSOLVE_RATE,
+    EROSION_DEPOSITION_RATE,
+    EROSION_HEIGHT_SCALE,
+    EROSION_MAX_DEPTH,
+)
+
+GRAVITY: float = 9.81
+PIPE_AREA: float = 1.0  # Cross-section of the virtual pipes between neighbouring cells
+MIN_TILT: float = 0.05  # Keeps some carrying capacity on flat ground
+
+
+@dataclass
+class HydraulicErosion:
+    """
+    Grid-based hydraulic erosion (virtual pipe model, Mei et al. 2007).
+
+    Every step updates whole arrays: rainfall, outflow flux through the pipes to the four
+    neighbours, water and velocity fields, erosion/deposition towards the sediment capacity,
+    semi-Lagrangian sediment transport along the velocity field and evaporation. Deposition never
+    raises a cell above its highest neighbour, and the sediment still suspended at the end settles
+    over each cell's neighbourhood, so no single cell collects a spike. Cells are one unit apart; the last two
+    axes are the map, so stacked (N, X, Y) heightmaps are eroded independently in one call (with one
+    generator per map, each is eroded exactly as it would be alone).
+    """
+    time_step: float = EROSION_TIME_STEP
+    rain_rate: float = EROSION_RAIN_RATE
+    evaporation_rate: float = EROSION_EVAPORATION_RATE
+    sediment_capacity: float = EROSION_SEDIMENT_CAPACITY
+    dissolve_rate: float = EROSION_DISSOLVE_RATE
+    deposition_rate: float = EROSION_DEPOSITION_RATE
+    height_scale: float = EROSION_HEIGHT_SCALE  # Vertical exaggeration of the heightmap while simulating
+    max_depth: float = EROSION_MAX_DEPTH  # Water depth at which the flow reaches its full carrying capacity
+
+    def run(self, heightmap: np.ndarray, iterations: int,
+            rng: Union[np.random.Generator, Sequence[np.random.Generator]]) -> np.ndarray:
+        """
+        Returns the heightmap after the given number of simulation steps. Rainfall comes from rng, or
+        for stacked heightmaps optionally from a sequence of generators, one per map.
+        """
+        terrain = np.asarray(heightmap, dtype=np.float32) * np.float32(self.height_scale)
+        if not isinstance(rng, np.random.Generator) and len(rng) != int(np.prod(terrain.shape[:-2])):
+            raise ValueError(f"Expected one generator per map, got {len(rng)} for shape {terrain.shape}.")
+        rain = np.empty_like(terrain)
+        water = np.zeros_like(terrain)
+        sediment = np.zeros_like(terrain)
+        flux = np.zeros((4,) + terrain.shape, dtype=np.float32)  # Outflow towards -x, +x, -y, +y
+        dt = np.float32(self.time_step)
+
+        for _ in range(iterations):
+            _uniform(rng, rain)
+            water += rain * (2 * self.rain_rate * dt)
+
+            # Outflow flux, scaled down where it would drain more water than the cell holds
+            surface = terrain + water
+            for direction, neighbour in enumerate(_neighbours(surface)):
+                np.maximum(flux[direction] + dt * PIPE_AREA * GRAVITY * (surface - neighbour), 0, out=flux[direction])
+            _close_edges(flux)
+            outflow = flux.sum(axis=0)
+            np.multiply(flux, np.minimum(1, water * _safe_reciprocal(outflow * dt)), out=flux)
+            outflow = flux.sum(axis=0)
+
+            # Water update from the pipes' inflow and outflow
+            inflow = _inflow(flux)
+            new_water = np.maximum(water + dt * (inflow - outflow), 0)
+            mean_water = (water + new_water) * np.float32(0.5)
+            water = new_water
+
+            # Velocity from the net flux crossing each cell
+            velocity_x = (_shift(flux[1], 1, -2) - flux[0] + flux[1] - _shift(flux[0], -1, -2)) * np.float32(0.5)
+            velocity_y = (_shift(flux[3], 1, -1) - flux[2] + flux[3] - _shift(flux[2], -1, -1)) * np.float32(0.5)
+            reciprocal_depth = _safe_reciprocal(mean_water)
+            velocity_x *= reciprocal_depth
+            velocity_y *= reciprocal_depth
+
+            # Erode where the flow can carry more than it does, deposit where it carries too much
+            gradient_x, gradient_y = _gradient(terrain)
+            slope = np.sqrt(gradient_x * gradient_x + gradient_y * gradient_y)
+            tilt = np.maximum(slope / np.sqrt(1 + slope * slope), MIN_TILT)
+            capacity = self.sediment_capacity * tilt * np.sqrt(velocity_x * velocity_x + velocity_y * velocity_y)
+            capacity *= np.minimum(mean_water * np.float32(1 / self.max_depth), 1)  # Thin films carry little
+            change = (capacity - sediment) * np.where(
+                capacity > sediment, np.float32(self.dissolve_rate * dt), np.float32(self.deposition_rate * dt)
+            )
+            change = np.maximum(change, -sediment)  # Cannot deposit more than is suspended
+            # Deposits fill hollows up to the surrounding relief, never above it
+            left, right, down, up = _neighbours(terrain)
+            highest = np.maximum(np.maximum(left, right), np.maximum(down, up))
+            change = np.maximum(change, np.minimum(terrain - highest, 0))
+            terrain -= change
+            sediment += change
+
+            sediment = _advect(sediment, velocity_x * dt, velocity_y * dt)
+            water *= np.float32(1 - self.evaporation_rate * dt)
+
+        terrain += _spread(sediment)  # Whatever is still suspended settles when the water is gone
+        return terrain / np.float32(self.height_scale)
+
 
 class Erosion:
     """Simulates erosion on a heightmap."""
 
     @staticmethod
     @log.log_method
-    def apply(heightmap: np.ndarray, iterations: int) -> np.ndarray:
-        """Applies erosion over multiple iterations."""
-        for _ in range(iterations):
-            erosion_mask = np.random.rand(*heightmap.shape) * 0.01
-            heightmap = np.maximum(heightmap - erosion_mask, 0)  # Prevent negative values
-        return heightmap
-            
\ No newline at end of file
+    def apply(heightmap: np.ndarray, iterations: int,
+              rng: Union[None, np.random.Generator, Sequence[np.random.Generator]] = None) -> np.ndarray:
+        """Applies hydraulic erosion over multiple iterations, drawing its rainfall from rng."""
+        rng = rng if rng is not None else np.random.default_rng()
+        heightmap = HydraulicErosion().run(heightmap, iterations, rng)
+        return np.maximum(heightmap, 0)  # Prevent negative values
+
+
+def _uniform(rng: Union[np.random.Generator, Sequence[np.random.Generator]], out: np.ndarray) -> None:
+    """Fills out with uniform floats from rng, or map by map from a sequence of generators."""
+    if isinstance(rng, np.random.Generator):
+        rng.random(dtype=np.float32, out=out)
+    else:
+        for generator, layer in zip(rng, out.reshape((-1,) + out.shape[-2:])):
+            generator.random(dtype=np.float32, out=layer)
+
+
+def _shift(array: np.ndarray, offset: int, axis: int) -> np.ndarray:
+    """Returns array[i - offset] along axis, repeating the edge values."""
+    result = np.roll(array, offset, axis=axis)
+    edge = [slice(None)] * array.ndim
+    source = [slice(None)] * array.ndim
+    if offset > 0:
+        edge[axis], source[axis] = slice(0, offset), slice(0, 1)
+    else:
+        edge[axis], source[axis] = slice(offset, None), slice(-1, None)
+    result[tuple(edge)] = array[tuple(source)]
+    return result
+
+
+def _neighbours(array: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Values of the -x, +x, -y and +y neighbours of every cell (edges see themselves)."""
+    return _shift(array, 1, -2), _shift(array, -1, -2), _shift(array, 1, -1), _shift(array, -1, -1)
+
+
+def _close_edges(flux: np.ndarray) -> None:
+    """No water leaves through the map border."""
+    flux[0, ..., 0, :] = 0
+    flux[1, ..., -1, :] = 0
+    flux[2, ..., :, 0] = 0
+    flux[3, ..., :, -1] = 0
+
+
+def _inflow(flux: np.ndarray) -> np.ndarray:
+    """Water entering every cell: the neighbours' outflow pointing at it."""
+    return (
+        _shift(flux[1], 1, -2) + _shift(flux[0], -1, -2) +
+        _shift(flux[3], 1, -1) + _shift(flux[2], -1, -1)
+    )
+
+
+def _gradient(array: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Central-difference gradient along the last two axes."""
+    gradient_x = (_shift(array, -1, -2) - _shift(array, 1, -2)) * np.float32(0.5)
+    gradient_y = (_shift(array, -1, -1) - _shift(array, 1, -1)) * np.float32(0.5)
+    return gradient_x, gradient_y
+
+
+def _safe_reciprocal(array: np.ndarray) -> np.ndarray:
+    """1 / array, with 0 where array is (nearly) zero."""
+    result = np.zeros_like(array)
+    np.divide(1, array, out=result, where=array > 1e-6)
+    return result
+
+
+def _spread(field: np.ndarray) -> np.ndarray:
+    """Averages every cell with its four neighbours (edges see themselves)."""
+    total = field.copy()
+    for neighbour in _neighbours(field):
+        total += neighbour
+    return total * np.float32(0.2)
+
+
+def _advect(field: np.ndarray, displacement_x: np.ndarray, displacement_y: np.ndarray) -> np.ndarray:
+    """
+    Semi-Lagrangian transport: every cell takes the content at the point its displacement came
+    from, interpolated bilinearly from the four cells around it. Gathering never gives a cell more
+    than the cells it samples hold, so content cannot pile up where flows converge; every map is
+    then rescaled to its previous total, which keeps the transport mass conserving overall.
+    """
+    size_x, size_y = field.shape[-2:]
+    source_x = np.clip(np.arange(size_x, dtype=np.float32)[:, np.newaxis] - displacement_x, 0, size_x - 1)
+    source_y = np.clip(np.arange(size_y, dtype=np.float32)[np.newaxis, :] - displacement_y, 0, size_y - 1)
+    x0 = np.minimum(np.floor(source_x), max(size_x - 2, 0))
+    y0 = np.minimum(np.floor(source_y), max(size_y - 2, 0))
+    weight_x, weight_y = source_x - x0, source_y - y0
+    # Gather from the flattened array; leading (batch) axes get their own offset
+    index = x0.astype(np.int64) * size_y + y0.astype(np.int64)
+    if field.ndim > 2:
+        index = index + (np.arange(int(np.prod(field.shape[:-2]))) * (size_x * size_y)).reshape(field.shape[:-2] + (1, 1))
+    step_x, step_y = (size_y if size_x > 1 else 0), (1 if size_y > 1 else 0)
+    flat = np.ascontiguousarray(field, dtype=np.float32).ravel()
+    low = flat[index]
+    low += (flat[index + step_x] - low) * weight_x
+    high = flat[index + step_y]
+    high += (flat[index + step_x + step_y] - high) * weight_x
+    low += (high - low) * weight_y
+    result = low.reshape(field.shape)
+    # Sampling does not conserve the total: scale every map back to the content it had
+    before = field.sum(axis=(-2, -1), dtype=np.float64, keepdims=True)
+    after = result.sum(axis=(-2, -1), dtype=np.float64, keepdims=True)
+    result *= np.divide(before, after, out=np.ones_like(before), where=after > 0).astype(np.float32)
+    return result
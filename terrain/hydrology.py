@@ -0,0 +1,357 @@
+from dataclasses import dataclass
+import heapq
+from typing import Optional, Tuple
+import numpy as np
+from utilities.logger import LoggerUtility as log
+
+# D8 neighbour offsets along (axis 0, axis 1); a flow direction is an index into this table
+D8_OFFSETS: np.ndarray = np.array([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)], dtype=np.int64)
+D8_DISTANCES: np.ndarray = np.hypot(D8_OFFSETS[:, 0], D8_OFFSETS[:, 1]).astype(np.float32)
+NO_FLOW: int = -1  # Direction of sinks, flats and cells draining off the map
+OFF_MAP: int = -1  # Spill target of basins that drain over the map border
+
+
+@dataclass
+class RiverNetwork:
+    """
+    River cells of a heightmap, stored as flat arrays.
+
+    Attributes:
+        shape (Tuple[int, int]): Shape of the heightmap the indices refer to.
+        cells (np.ndarray): Flat (C-order) indices of the river cells.
+        downstream (np.ndarray): Flat index of the cell each river cell drains into (itself at an outlet).
+        accumulation (np.ndarray): Upstream area of each river cell, in cells.
+    """
+    shape: Tuple[int, int]
+    cells: np.ndarray
+    downstream: np.ndarray
+    accumulation: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def mask(self) -> np.ndarray:
+        """Boolean map of the river cells."""
+        mask = np.zeros(self.shape, dtype=bool)
+        mask.flat[self.cells] = True
+        return mask
+
+    def coordinates(self) -> np.ndarray:
+        """(len, 2) array of the river cells' (x, y) coordinates."""
+        return np.stack(np.unravel_index(self.cells, self.shape), axis=1)
+
+    def sources(self) -> np.ndarray:
+        """Flat indices of river cells that no other river cell drains into."""
+        has_upstream = np.isin(self.cells, self.downstream[self.downstream != self.cells])
+        return self.cells[~has_upstream]
+
+
+@dataclass
+class Depressions:
+    """
+    Result of depression filling: the filled surface and the D8 watersheds (basins) it was built from.
+
+    Attributes:
+        filled (np.ndarray): Elevation with every pit raised to the level at which it spills.
+        depth (np.ndarray): Lake depth of every cell (filled - elevation), 0 outside lakes.
+        basins (np.ndarray): Basin label of every cell (int32, 0..len-1): the D8 sink it drains into.
+        spill_levels (np.ndarray): Water level of every basin; cells below it are lake.
+        spill_cells (np.ndarray): Flat index of the cell through which every basin spills over.
+        spill_targets (np.ndarray): Flat index of the cell the spill flows into, or OFF_MAP.
+    """
+    filled: np.ndarray
+    depth: np.ndarray
+    basins: np.ndarray
+    spill_levels: np.ndarray
+    spill_cells: np.ndarray
+    spill_targets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.spill_levels)
+
+    def lakes(self) -> np.ndarray:
+        """Boolean map of the flooded cells."""
+        return self.depth > 0
+
+
+def d8_flow_directions(elevation: np.ndarray) -> np.ndarray:
+    """
+    Returns the D8 flow direction of every cell: the index into D8_OFFSETS of the neighbour with
+    the steepest descent (drop / distance), or NO_FLOW where no neighbour is lower.
+    """
+    elevation = np.asarray(elevation, dtype=np.float32)
+    padded = np.pad(elevation, 1, mode="constant", constant_values=np.inf)  # The map edge is never downhill
+    size_x, size_y = elevation.shape
+    steepest = np.zeros(elevation.shape, dtype=np.float32)
+    codes = np.zeros(elevation.shape, dtype=np.int8)  # direction + 1, 0 while no lower neighbour is found
+    slope = np.empty_like(steepest)
+    for direction, ((dx, dy), distance) in enumerate(zip(D8_OFFSETS, D8_DISTANCES)):
+        neighbour = padded[1 + dx:1 + dx + size_x, 1 + dy:1 + dy + size_y]
+        np.subtract(elevation, neighbour, out=slope)
+        slope *= 1 / distance
+        # Directions are visited in increasing order, so the latest steeper one is also the largest code
+        np.maximum(codes, (slope > steepest).view(np.int8) * np.int8(direction + 1), out=codes)
+        np.maximum(steepest, slope, out=steepest)
+    return codes - np.int8(1)
+
+
+def flow_receivers(directions: np.ndarray) -> np.ndarray:
+    """Returns the flat index each cell drains into; cells without flow drain into themselves."""
+    # Flat index offset of every direction, with NO_FLOW (-1) picking the trailing 0
+    step = np.append(D8_OFFSETS[:, 0] * directions.shape[1] + D8_OFFSETS[:, 1], 0)
+    return np.arange(directions.size, dtype=np.int64) + step[directions.ravel()]
+
+
+def topological_order(receivers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Orders the cells so every cell comes before the cell it drains into.
+
+    Kahn's algorithm, one vectorized step per level of the drainage forest: O(N) total work.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The ordered flat indices, and the offsets in that order
+        where each level starts (plus a final end offset). No cell drains into a cell of its own level.
+    """
+    cells = np.arange(len(receivers))
+    flowing = receivers != cells
+    indegree = np.bincount(receivers[flowing], minlength=len(receivers))
+    order = np.empty(len(receivers), dtype=np.int64)
+    level_starts = [0]
+    frontier = np.flatnonzero(indegree == 0)
+    dense = len(receivers) // 64  # Above this many targets, whole-array passes beat scattered updates
+    while len(frontier):
+        order[level_starts[-1]:level_starts[-1] + len(frontier)] = frontier
+        level_starts.append(level_starts[-1] + len(frontier))
+        targets = receivers[frontier[flowing[frontier]]]
+        if len(targets) > dense:
+            indegree -= np.bincount(targets, minlength=len(receivers))
+            reached = np.zeros(len(receivers), dtype=bool)
+            reached[targets] = True
+            frontier = np.flatnonzero(reached & (indegree == 0))
+        else:
+            np.subtract.at(indegree, targets, 1)
+            targets = targets[indegree[targets] == 0]
+            frontier = np.unique(targets)
+    return order[:level_starts[-1]], np.array(level_starts, dtype=np.int64)
+
+
+def flow_accumulation(receivers: np.ndarray, order: Tuple[np.ndarray, np.ndarray],
+                      weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Returns the upstream area (sum of weights, one per cell by default) draining through every cell.
+
+    Walks the levels of topological_order, pushing each level's totals downstream at once.
+    """
+    accumulation = np.ones(len(receivers), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32).ravel().copy()
+    cells, level_starts = order
+    for start, stop in zip(level_starts[:-1], level_starts[1:]):
+        level = cells[start:stop]
+        level = level[receivers[level] != level]
+        np.add.at(accumulation, receivers[level], accumulation[level])
+    return accumulation
+
+
+def route_flats(elevation: np.ndarray, receivers: np.ndarray) -> np.ndarray:
+    """
+    Gives the interior cells without a lower neighbour (flats, such as filled lakes) a receiver:
+    a neighbour of equal elevation one step closer to where the flat drains. Breadth-first over
+    all flats at once, from the cells that already drain and the map border. Cells of flats with
+    no way out (unfilled pits) keep draining into themselves.
+    """
+    elevation = np.asarray(elevation)
+    size_x, size_y = elevation.shape
+    heights = elevation.ravel()
+    receivers = receivers.copy()
+    resolved = receivers != np.arange(len(receivers))
+    border = np.ones(elevation.shape, dtype=bool)
+    border[1:-1, 1:-1] = False
+    resolved |= border.ravel()
+    # First step on whole arrays (every draining cell is a potential source), then on the frontier only
+    seeds = resolved.reshape(elevation.shape).copy()
+    resolved_map = resolved.reshape(elevation.shape)
+    receiver_map = receivers.reshape(elevation.shape)
+    cells = np.arange(len(receivers)).reshape(elevation.shape)
+    for dx, dy in D8_OFFSETS:
+        source = (slice(max(0, -dx), size_x - max(0, dx)), slice(max(0, -dy), size_y - max(0, dy)))
+        target = (slice(max(0, dx), size_x + min(0, dx)), slice(max(0, dy), size_y + min(0, dy)))
+        joins = ~resolved_map[target] & seeds[source] & (elevation[target] == elevation[source])
+        receiver_map[target][joins] = cells[source][joins]
+        resolved_map[target] |= joins
+    frontier = np.flatnonzero(resolved & ~seeds.ravel())
+    unresolved = len(resolved) - np.count_nonzero(resolved)
+    while len(frontier) and unresolved:
+        x, y = np.divmod(frontier, size_y)
+        reached = []
+        for dx, dy in D8_OFFSETS:
+            inside = (x + dx >= 0) & (x + dx < size_x) & (y + dy >= 0) & (y + dy < size_y)
+            sources = frontier[inside]
+            targets = sources + (dx * size_y + dy)
+            joins = ~resolved[targets] & (heights[targets] == heights[sources])
+            sources, targets = sources[joins], targets[joins]
+            receivers[targets] = sources
+            resolved[targets] = True
+            reached.append(targets)
+        frontier = np.concatenate(reached)
+        unresolved -= len(frontier)
+    return receivers
+
+
+def _watersheds(receivers: np.ndarray) -> np.ndarray:
+    """Returns the sink (self-draining cell) every cell drains into, by pointer jumping."""
+    roots = receivers
+    while True:
+        jumped = roots[roots]
+        if np.array_equal(jumped, roots):
+            return roots
+        roots = jumped
+
+
+def _merge_flat_sinks(elevation: np.ndarray, receivers: np.ndarray) -> np.ndarray:
+    """
+    Makes every flat of sinks (8-connected self-draining cells of equal elevation, such as a pit
+    with a level floor) drain into one of its cells, so it becomes one basin instead of one per
+    cell. Connected components by hooking every equal-height pair of sinks onto the lower root
+    and pointer jumping, on whole arrays.
+    """
+    size_x, size_y = elevation.shape
+    parent = receivers.copy()
+    sink = (receivers == np.arange(len(receivers))).reshape(elevation.shape)
+    firsts, seconds = [], []
+    for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        y0, y1 = max(0, -dy), size_y - max(0, dy)
+        first = (slice(0, size_x - dx), slice(y0, y1))
+        second = (slice(dx, size_x), slice(y0 + dy, y1 + dy))
+        x, y = np.nonzero(sink[first] & sink[second] & (elevation[first] == elevation[second]))
+        cells = x * size_y + (y + y0)
+        firsts.append(cells)
+        seconds.append(cells + (dx * size_y + dy))
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    while len(first):
+        root_first, root_second = parent[first], parent[second]
+        differ = root_first != root_second
+        if not differ.any():
+            break
+        first, second = first[differ], second[differ]
+        np.minimum.at(parent, np.maximum(root_first[differ], root_second[differ]), np.minimum(root_first[differ], root_second[differ]))
+        parent = _watersheds(parent)
+    return parent
+
+
+def _basin_edges(elevation: np.ndarray, basins: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Returns the lowest crossing between every pair of touching basins (8-connected), and from every
+    border basin to the outside (label len(basins)): (basin, other, level, cell, other cell) arrays.
+    """
+    size_x, size_y = elevation.shape
+    outside = basins.max() + 1
+    pairs = []
+    for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        y0, y1 = max(0, -dy), size_y - max(0, dy)
+        first = basins[:size_x - dx, y0:y1]
+        second = basins[dx:, y0 + dy:y1 + dy]
+        x, y = np.nonzero(first != second)
+        cells = x * size_y + (y + y0)
+        pairs.append((cells, cells + (dx * size_y + dy)))
+    border = np.ones(elevation.shape, dtype=bool)
+    border[1:-1, 1:-1] = False
+    border_cells = np.flatnonzero(border)
+    cells = np.concatenate([pair[0] for pair in pairs] + [border_cells])
+    others = np.concatenate([pair[1] for pair in pairs] + [np.full(len(border_cells), -1)])
+
+    heights = elevation.ravel()
+    flat_basins = basins.ravel()
+    basin = flat_basins[cells]
+    other = np.where(others >= 0, flat_basins[others], outside)
+    level = np.where(others >= 0, np.maximum(heights[cells], heights[others]), heights[cells])
+    # Keep the lowest crossing of every (unordered) basin pair
+    swap = basin > other
+    basin, other = np.where(swap, other, basin), np.where(swap, basin, other)
+    cells, others = np.where(swap, others, cells), np.where(swap, cells, others)
+    key = basin.astype(np.int64) * (outside + 1) + other
+    order = np.argsort(key)
+    key, level = key[order], level[order]
+    starts = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+    lowest = np.minimum.reduceat(level, starts)
+    group = np.cumsum(np.isin(np.arange(len(key)), starts)) - 1
+    candidates = np.flatnonzero(level == lowest[group])
+    first = candidates[np.concatenate([[True], group[candidates[1:]] != group[candidates[:-1]]])]
+    order = order[first]
+    return basin[order], other[order], level[first], cells[order], others[order]
+
+
+@log.log_method
+def fill_depressions(elevation: np.ndarray) -> Depressions:
+    """
+    Priority-flood depression filling, run on the graph of D8 watersheds instead of on cells.
+
+    Every cell drains into a sink; the cells sharing a sink form a basin. Flats drain across
+    (route_flats), and the cells of a flat with no way out share one sink, so level areas (such
+    as the sea floor) are one basin rather than one per cell. Flooding starts from
+    outside the map and always continues through the lowest crossing out of the flooded basins,
+    on a heap, so every basin's water level is the lowest level at which it overflows to the map
+    border. Filling each cell up to its basin's level then matches the cell-wise priority-flood,
+    with only the basin graph (not every cell) going through the heap.
+    """
+    elevation = np.asarray(elevation, dtype=np.float32)
+    receivers = route_flats(elevation, flow_receivers(d8_flow_directions(elevation)))
+    roots = _watersheds(_merge_flat_sinks(elevation, receivers))
+    sinks = np.flatnonzero(roots == np.arange(len(roots)))
+    labels = np.empty(len(roots), dtype=np.int32)
+    labels[sinks] = np.arange(len(sinks), dtype=np.int32)
+    basins = labels[roots].reshape(elevation.shape)
+
+    basin, other, level, cells, others = _basin_edges(elevation, basins)
+    outside = len(sinks)
+    # Both directions of every crossing, grouped by the basin they leave
+    sources = np.concatenate([basin, other])
+    order = np.argsort(sources, kind="stable")
+    targets = np.concatenate([other, basin])[order].tolist()
+    levels = np.concatenate([level, level])[order].tolist()
+    exits = np.concatenate([cells, others])[order].tolist()
+    entries = np.concatenate([others, cells])[order].tolist()
+    starts = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=outside + 1))]).tolist()
+
+    spill_levels = np.empty(outside + 1, dtype=np.float32)
+    spill_cells = np.full(outside + 1, OFF_MAP, dtype=np.int64)
+    spill_targets = np.full(outside + 1, OFF_MAP, dtype=np.int64)
+    flooded = [False] * (outside + 1)
+    heap = [(-np.inf, outside, OFF_MAP, OFF_MAP)]
+    while heap:
+        water, node, cell, target = heapq.heappop(heap)
+        if flooded[node]:
+            continue
+        flooded[node] = True
+        spill_levels[node], spill_cells[node], spill_targets[node] = water, cell, target
+        for edge in range(starts[node], starts[node + 1]):
+            neighbour = targets[edge]
+            if not flooded[neighbour]:
+                # The neighbour floods through this crossing: it spills from entries[edge] into exits[edge]
+                heapq.heappush(heap, (max(water, levels[edge]), neighbour, entries[edge], exits[edge]))
+
+    spill_levels, spill_cells, spill_targets = spill_levels[:-1], spill_cells[:-1], spill_targets[:-1]
+    filled = np.maximum(elevation, spill_levels[basins])
+    return Depressions(
+        filled=filled,
+        depth=filled - elevation,
+        basins=basins,
+        spill_levels=spill_levels,
+        spill_cells=spill_cells,
+        spill_targets=spill_targets,
+    )
+
+
+@log.log_method
+def extract_rivers(elevation: np.ndarray, threshold: float) -> RiverNetwork:
+    """
+    Routes flow over elevation with D8 (across flats, see route_flats) and returns the cells whose
+    upstream area reaches threshold. Pass a filled surface (fill_depressions) so flow reaches the border.
+    """
+    receivers = route_flats(elevation, flow_receivers(d8_flow_directions(elevation)))
+    accumulation = flow_accumulation(receivers, topological_order(receivers))
+    cells = np.flatnonzero(accumulation >= threshold)
+    return RiverNetwork(
+        shape=tuple(np.shape(elevation)),
+        cells=cells,
+        downstream=receivers[cells],
+        accumulation=accumulation[cells],
+    )
@@ -1,43 +1,381 @@
 
 from utilities.logger import LoggerUtility as log
-from typing import Tuple
-import noise
+from typing import Optional, Sequence, Tuple
 import numpy as np
 
+# Ken Perlin's reference permutation, the table noise.pnoise2 hashes lattice points with
+_PERM: np.ndarray = np.array([
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225,
+    140, 36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148,
+    247, 120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32,
+    57, 177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175,
+    74, 165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122,
+    60, 211, 133, 230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54,
+    65, 25, 63, 161, 1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169,
+    200, 196, 135, 130, 116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64,
+    52, 217, 226, 250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212,
+    207, 206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213,
+    119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9,
+    129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178, 185, 112, 104,
+    218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144, 12, 191, 179, 162, 241,
+    81, 51, 145, 235, 249, 14, 239, 107, 49, 192, 214, 31, 181, 199, 106, 157,
+    184, 84, 204, 176, 115, 121, 50, 45, 127, 4, 150, 254, 138, 236, 205, 93,
+    222, 114, 67, 29, 24, 72, 243, 141, 128, 195, 78, 66, 215, 61, 156, 180,
+], dtype=np.int32)
+
+# First two components of the GRAD3 table used by noise.pnoise2, indexed by hash & 15
+_GRAD2: np.ndarray = np.array([
+    (1, 1), (-1, 1), (1, -1), (-1, -1), (1, 0), (-1, 0), (1, 0), (-1, 0),
+    (0, 1), (0, -1), (0, 1), (0, -1), (1, 0), (-1, 0), (0, -1), (0, 1),
+], dtype=np.float32)
+
+
+def perlin2(x: np.ndarray, y: np.ndarray, repeat: float = 1024.0, base: int = 0) -> np.ndarray:
+    """
+    Evaluates 2D gradient noise for whole coordinate arrays at once.
+
+    Mirrors noise.pnoise2 (same permutation, gradients and fade curve) in float32,
+    so results agree with the per-pixel reference to float precision. base may be an array
+    broadcasting against the coordinates, e.g. (N, 1, 1) seeds for N stacked worlds.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    x_floor = np.floor(x)
+    y_floor = np.floor(y)
+    i = np.floor(np.fmod(x, repeat)).astype(np.int32)
+    j = np.floor(np.fmod(y, repeat)).astype(np.int32)
+    ii = np.fmod(i + 1, repeat).astype(np.int32)
+    jj = np.fmod(j + 1, repeat).astype(np.int32)
+    i = (i & 255) + base
+    j = (j & 255) + base
+    ii = (ii & 255) + base
+    jj = (jj & 255) + base
+
+    x = x - x_floor
+    y = y - y_floor
+    fx = x * x * x * (x * (x * 6 - 15) + 10)
+    fy = y * y * y * (y * (y * 6 - 15) + 10)
+
+    # The C table is doubled to 512 entries; masking with 255 is the same lookup
+    a = _PERM[i & 255]
+    b = _PERM[ii & 255]
+    aa = _PERM[_PERM[(a + j) & 255]] & 15
+    ab = _PERM[_PERM[(a + jj) & 255]] & 15
+    ba = _PERM[_PERM[(b + j) & 255]] & 15
+    bb = _PERM[_PERM[(b + jj) & 255]] & 15
+
+    x1 = x - 1
+    y1 = y - 1
+    n00 = x * _GRAD2[aa, 0] + y * _GRAD2[aa, 1]
+    n10 = x1 * _GRAD2[ba, 0] + y * _GRAD2[ba, 1]
+    n01 = x * _GRAD2[ab, 0] + y1 * _GRAD2[ab, 1]
+    n11 = x1 * _GRAD2[bb, 0] + y1 * _GRAD2[bb, 1]
+    bottom = n00 + fx * (n10 - n00)
+    top = n01 + fx * (n11 - n01)
+    return bottom + fy * (top - bottom)
+
+
+def lattice_shift(seed: int) -> np.ndarray:
+    """
+    Returns the (..., 2) offset, in lattice cells, that PerlinNoise adds to the coordinates of seed's world.
+
+    perlin2 hashes lattice points modulo 256, so its base only tells 256 seeds apart (and nearby bases
+    give shifted copies of each other). Shifting every world by up to one period, drawn from the
+    full seed, makes worlds whose seeds agree modulo 256 distinct windows of the noise. seed may be
+    an array, e.g. the seeds of a batch.
+    """
+    seed = np.asarray(seed, dtype=np.int64)[..., np.newaxis]
+    return hash_uniform(seed, np.arange(2)) * 256.0
+
+
+def fbm2(x: np.ndarray, y: np.ndarray, octaves: int = 1, persistence: float = 0.5,
+         lacunarity: float = 2.0, repeat: float = 1024.0, base: int = 0) -> np.ndarray:
+    """Sums octaves of perlin2 the way noise.pnoise2 does, normalized by the total amplitude."""
+    if octaves < 1:
+        raise ValueError("Expected octaves value > 0")
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    if octaves == 1:
+        return perlin2(x, y, repeat, base)
+    frequency, amplitude = np.float32(1.0), np.float32(1.0)
+    total, max_amplitude = np.zeros(np.broadcast_shapes(x.shape, y.shape, np.shape(base)), dtype=np.float32), np.float32(0.0)
+    for _ in range(octaves):
+        total += perlin2(x * frequency, y * frequency, repeat * frequency, base) * amplitude
+        max_amplitude += amplitude
+        frequency *= np.float32(lacunarity)
+        amplitude *= np.float32(persistence)
+    return total / max_amplitude
+
+
+
+def hash_uniform(seed: int, *keys: np.ndarray) -> np.ndarray:
+    """
+    Returns uniform floats in [0, 1) that depend only on the seed and integer keys (e.g. world coordinates).
+
+    A counter-based (splitmix64) hash, so any window of an unbounded world can be sampled without
+    generating the cells before it. seed may be an array broadcasting against the keys.
+    """
+    shape = np.broadcast_shapes(np.shape(seed), *(np.shape(key) for key in keys))
+    state = np.broadcast_to(np.asarray(seed, dtype=np.int64), shape).astype(np.uint64)
+    for key in keys:
+        state = _mix64(state ^ np.asarray(key, dtype=np.int64).astype(np.uint64))
+    return (state >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def _mix64(state: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer; uint64 arithmetic wraps around."""
+    state = state + np.uint64(0x9E3779B97F4A7C15)
+    state = (state ^ (state >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    state = (state ^ (state >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return state ^ (state >> np.uint64(31))
+
+
+def nearest_sites(points: np.ndarray, size: Tuple[int, int], origin: Tuple[float, float] = (0.0, 0.0),
+                  sites_per_bucket: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Finds the nearest and second nearest site of every cell in one pass.
+
+    Sites are binned into buckets holding about sites_per_bucket sites each. Every bucket of
+    cells is compared against the sites of its 3x3 bucket neighbourhood only; buckets where a
+    site outside that neighbourhood could still be closer than F2 are re-run with a wider
+    neighbourhood, so the result is exact.
+
+    Stacked (N, R, 2) points are N independent diagrams of R sites each, solved together (the
+    buckets of every diagram only see that diagram's sites); the outputs then have shape (N,) + size.
+
+    Args:
+        points (np.ndarray): (R, 2) or (N, R, 2) site coordinates in cells, along axis 0 and axis 1.
+        size (Tuple[int, int]): Shape of the output arrays.
+        origin (Tuple[float, float]): Coordinates of cell [0, 0].
+        sites_per_bucket (float): Average bucket occupancy; trades candidate count against re-runs.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: int32 index of the nearest site, and float32
+        distances to the nearest (F1) and second nearest (F2) sites. F2 is inf with a single site.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    batch = points.shape[:-2] if points.ndim > 2 else ()
+    points = points.reshape(-1, 2)
+    worlds = int(np.prod(batch))
+    sites = len(points) // max(worlds, 1)  # Per diagram
+    if sites == 0:
+        raise ValueError("nearest_sites needs at least one site.")
+    target = np.sqrt(size[0] * size[1] * sites_per_bucket / sites)
+    buckets = tuple(max(1, int(round(extent / target))) for extent in size)
+    bucket = tuple(-(-extent // count) for extent, count in zip(size, buckets))  # Cells per bucket on each axis
+    per_world = buckets[0] * buckets[1]  # Buckets of one diagram; bucket b of diagram w is w * per_world + b
+
+    # Sort the sites by bucket; sites outside the window go to the nearest edge bucket
+    bucket_x = np.clip(np.floor((points[:, 0] - origin[0]) / bucket[0]), 0, buckets[0] - 1).astype(np.int64)
+    bucket_y = np.clip(np.floor((points[:, 1] - origin[1]) / bucket[1]), 0, buckets[1] - 1).astype(np.int64)
+    site_bucket = np.arange(len(points)) // sites * per_world + bucket_x * buckets[1] + bucket_y
+    order = np.argsort(site_bucket, kind="stable")
+    counts = np.bincount(site_bucket, minlength=worlds * per_world)
+    starts = np.cumsum(counts) - counts
+    site_x = np.append(points[order, 0] - origin[0], np.inf).astype(np.float32)  # Padding candidates sit at infinity
+    site_y = np.append(points[order, 1] - origin[1], np.inf).astype(np.float32)
+    site_label = np.append(order % sites, 0).astype(np.int32)
+
+    labels = np.zeros((worlds * per_world,) + bucket, dtype=np.int32)
+    f1 = np.full(labels.shape, np.inf, dtype=np.float32)
+    f2 = np.full(labels.shape, np.inf, dtype=np.float32)
+    pending = np.arange(worlds * per_world)
+    radius = 1
+    while len(pending):
+        world, local = np.divmod(pending, per_world)
+        px, py = np.divmod(local, buckets[1])
+        # Candidate sites of every pending bucket: the sites of its (2r+1)^2 neighbourhood, padded to equal length
+        dx, dy = np.meshgrid(np.arange(-radius, radius + 1), np.arange(-radius, radius + 1), indexing="ij")
+        nx, ny = px[:, np.newaxis] + dx.ravel(), py[:, np.newaxis] + dy.ravel()
+        valid = (nx >= 0) & (nx < buckets[0]) & (ny >= 0) & (ny < buckets[1])
+        neighbours = np.where(valid, world[:, np.newaxis] * per_world + nx * buckets[1] + ny, 0)
+        neighbour_counts = np.where(valid, counts[neighbours], 0).ravel()
+        neighbour_starts = starts[neighbours].ravel()
+        totals = neighbour_counts.reshape(len(pending), -1).sum(axis=1)
+        candidates = np.full((len(pending), int(totals.max())), len(points), dtype=np.int64)
+        rows = np.repeat(np.arange(len(pending)), totals)
+        columns = np.arange(len(rows)) - np.repeat(np.cumsum(totals) - totals, totals)
+        run_offsets = np.arange(len(rows)) - np.repeat(np.cumsum(neighbour_counts) - neighbour_counts, neighbour_counts)
+        candidates[rows, columns] = np.repeat(neighbour_starts, neighbour_counts) + run_offsets
+
+        cell_x = ((px * bucket[0])[:, np.newaxis, np.newaxis] + np.arange(bucket[0])[:, np.newaxis]).astype(np.float32)
+        cell_y = ((py * bucket[1])[:, np.newaxis, np.newaxis] + np.arange(bucket[1])[np.newaxis, :]).astype(np.float32)
+        best = np.full((len(pending),) + bucket, np.inf, dtype=np.float32)
+        second = np.full_like(best, np.inf)
+        winner = np.zeros(best.shape, dtype=np.uint16)  # Candidate column of the nearest site
+        # Buckets with similar candidate counts are processed together so short lists do not pay for long ones
+        by_count = np.argsort(totals, kind="stable")
+        for group in np.array_split(by_count, max(1, min(len(by_count), 8))):
+            if len(group) == 0:
+                continue
+            group_x, group_y = cell_x[group], cell_y[group]
+            group_best, group_second, group_winner = best[group], second[group], winner[group]
+            distance = np.empty_like(group_best)
+            closer = np.empty(group_best.shape, dtype=bool)
+            for column in range(int(totals[group].max())):
+                candidate = candidates[group, column]
+                np.add(
+                    np.square(group_x - site_x[candidate][:, np.newaxis, np.newaxis]),
+                    np.square(group_y - site_y[candidate][:, np.newaxis, np.newaxis]),
+                    out=distance,
+                )
+                np.less(distance, group_best, out=closer)
+                # Columns only increase, so the last column to win is also the largest
+                np.maximum(group_winner, closer.view(np.uint8) * np.uint16(column), out=group_winner)
+                # The new F2 is the old F1 when the candidate wins, otherwise the smaller of F2 and the candidate
+                np.minimum(group_second, np.maximum(distance, group_best), out=group_second)
+                np.minimum(group_best, distance, out=group_best)
+            best[group], second[group], winner[group] = group_best, group_second, group_winner
+        label = site_label[np.take_along_axis(candidates, winner.reshape(len(pending), -1).astype(np.int64), axis=1)].reshape(best.shape)
+
+        labels[pending], f1[pending], f2[pending] = label, best, second
+        # A site outside the searched neighbourhood is at least this far away (inf where it reaches the map edge)
+        reach = np.full(best.shape, np.inf, dtype=np.float32)
+        for low, high, cell, axis in ((px - radius, px + radius + 1, cell_x, 0), (py - radius, py + radius + 1, cell_y, 1)):
+            low_edge = np.where(low > 0, low * bucket[axis], -np.inf)[:, np.newaxis, np.newaxis]
+            high_edge = np.where(high < buckets[axis], high * bucket[axis], np.inf)[:, np.newaxis, np.newaxis]
+            np.minimum(reach, np.minimum(cell - low_edge, high_edge - cell), out=reach)
+        unresolved = np.any(second > np.square(reach), axis=(1, 2))
+        pending = pending[unresolved]
+        radius += 1
+
+    # Stitch the buckets back into (size[0], size[1]) images
+    def stitch(blocks: np.ndarray) -> np.ndarray:
+        image = blocks.reshape(worlds, buckets[0], buckets[1], bucket[0], bucket[1]).transpose(0, 1, 3, 2, 4)
+        image = image.reshape(worlds, buckets[0] * bucket[0], buckets[1] * bucket[1])[:, :size[0], :size[1]]
+        return image.reshape(batch + tuple(size))
+
+    return stitch(labels), np.sqrt(stitch(f1)), np.sqrt(stitch(f2))
+
+
 class PerlinNoise:
-    """Generates Perlin noise for terrain."""
+    """Generates fractal (fBm) Perlin noise for terrain."""
 
-    def __init__(self, scale: float, seed: int) -> None:
+    def __init__(self, scale: float, seed: int, octaves: int = 1, persistence: float = 0.5, lacunarity: float = 2.0,
+                 offset: Tuple[float, float] = (0.0, 0.0), chunk_rows: Optional[int] = None) -> None:
         self.scale = scale
         self.seed = seed
+        self.octaves = octaves
+        self.persistence = persistence
+        self.lacunarity = lacunarity
+        self.offset = offset  # In grid cells, added to the cell coordinates before scaling
+        self.chunk_rows = chunk_rows  # Rows evaluated at once; None evaluates the whole array
         log.success(f"Perlin noise initialized with scale: {scale} and seed: {seed}.")
 
+    def __repr__(self) -> str:
+        return f"PerlinNoise(scale={self.scale}, seed={self.seed}, octaves={self.octaves})"
+
     @log.log_method
-    def generate(self, size: Tuple[int, int]) -> np.ndarray:
-        """Generates a 2D array of Perlin noise."""
-        np.random.seed(self.seed)
+    def generate(self, size: Tuple[int, int], origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """
+        Generates a 2D array of Perlin noise, evaluating whole rows of coordinates at once.
+
+        origin is the world cell of element [0, 0]; every world cell gets the same value whatever
+        window it is generated in. The noise coordinates are shifted by lattice_shift(seed).
+        """
+        result = np.empty(size, dtype=np.float32)
+        chunk_rows = self.chunk_rows or max(size[0], 1)
+        shift = lattice_shift(self.seed)
+        y = ((np.arange(size[1]) + origin[1] + self.offset[1]) * self.scale + shift[1]).astype(np.float32)
+        for start in range(0, size[0], chunk_rows):
+            stop = min(start + chunk_rows, size[0])
+            x = ((np.arange(start, stop) + origin[0] + self.offset[0]) * self.scale + shift[0]).astype(np.float32)
+            result[start:stop] = fbm2(
+                x[:, np.newaxis], y[np.newaxis, :],
+                self.octaves, self.persistence, self.lacunarity, base=self.seed,
+            )
+        return result
+
+    def generate_batch(self, seeds: Sequence[int], size: Tuple[int, int], origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """
+        Generates the noise of one world per seed as a stacked (N, X, Y) array; world n matches
+        generate with self.seed = seeds[n]. Only the lattice hashing and the (N, 2) lattice shifts
+        differ per world.
+        """
+        bases = np.asarray(seeds, dtype=np.int64).reshape(-1, 1, 1)
+        result = np.empty((len(bases),) + tuple(size), dtype=np.float32)
+        chunk_rows = self.chunk_rows or max(size[0], 1)
+        shift = lattice_shift(bases[:, 0, 0])
+        y = ((np.arange(size[1]) + origin[1] + self.offset[1]) * self.scale + shift[:, 1, np.newaxis]).astype(np.float32)
+        for start in range(0, size[0], chunk_rows):
+            stop = min(start + chunk_rows, size[0])
+            x = ((np.arange(start, stop) + origin[0] + self.offset[0]) * self.scale + shift[:, 0, np.newaxis]).astype(np.float32)
+            result[:, start:stop] = fbm2(
+                x[:, :, np.newaxis], y[:, np.newaxis, :],
+                self.octaves, self.persistence, self.lacunarity, base=bases,
+            )
+        return result
+
+    @log.log_method
+    def generate_reference(self, size: Tuple[int, int]) -> np.ndarray:
+        """Generates the same noise one pixel at a time with noise.pnoise2. Slow; kept as a reference."""
+        import noise
+
+        shift = lattice_shift(self.seed)
         return np.array([
-            [noise.pnoise2(x * self.scale, y * self.scale, base=self.seed) for y in range(size[1])]
+            [
+                noise.pnoise2(
+                    (x + self.offset[0]) * self.scale + shift[0], (y + self.offset[1]) * self.scale + shift[1],
+                    octaves=self.octaves, persistence=self.persistence, lacunarity=self.lacunarity, base=self.seed,
+                )
+                for y in range(size[1])
+            ]
             for x in range(size[0])
         ])
 
 class VoronoiNoise:
     """Generates Voronoi noise for terrain."""
 
-    def __init__(self, regions: int, seed: int) -> None:
+    def __init__(self, regions: int, seed: int, spacing: Optional[float] = None) -> None:
         self.regions = regions
         self.seed = seed
+        self.spacing = spacing  # Site spacing in cells for world windows, one site per spacing x spacing cell
         log.success(f"Voronoi noise initialized with regions: {regions} and seed: {seed}.")
 
+    def __repr__(self) -> str:
+        return f"VoronoiNoise(regions={self.regions}, seed={self.seed})"
+
+    def sites(self, size: Tuple[int, int]) -> np.ndarray:
+        """Returns the (regions, 2) seed points of the diagram."""
+        np.random.seed(self.seed)
+        return np.random.rand(self.regions, 2) * np.array(size)
+
     @log.log_method
     def generate(self, size: Tuple[int, int]) -> np.ndarray:
         """Generates Voronoi regions."""
-        np.random.seed(self.seed)
-        points = np.random.rand(self.regions, 2) * np.array(size)
-        grid = np.zeros(size)
-        for x in range(size[0]):
-            for y in range(size[1]):
-                distances = np.linalg.norm(points - np.array([x, y]), axis=1)
-                grid[x, y] = np.argmin(distances) / self.regions
-        return grid
-            
\ No newline at end of file
+        labels, _, _ = self.generate_regions(size)
+        return labels / self.regions
+
+    @log.log_method
+    def generate_regions(self, size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the region label, F1 distance and F2 distance of every cell."""
+        return nearest_sites(self.sites(size), size)
+
+    @log.log_method
+    def generate_window(self, size: Tuple[int, int], origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """
+        Generates Voronoi values for a window of the unbounded world.
+
+        Every spacing x spacing world cell holds one site, jittered and valued by hashing its cell
+        coordinates with the seed, so a window only needs the sites around it.
+        """
+        return self.generate_window_batch([self.seed], size, origin)[0]
+
+    def generate_window_batch(self, seeds: Sequence[int], size: Tuple[int, int],
+                              origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """Generates the window of one world per seed as a stacked (N, X, Y) array (see generate_window)."""
+        if self.spacing is None:
+            raise ValueError("VoronoiNoise.generate_window needs a site spacing.")
+        seeds = np.asarray(seeds, dtype=np.int64).reshape(-1, 1)
+        # Sites beyond three site cells cannot be the nearest or second nearest site
+        low = np.floor(np.array(origin) / self.spacing).astype(np.int64) - 3
+        high = np.floor((np.array(origin) + np.array(size)) / self.spacing).astype(np.int64) + 4
+        cell_x, cell_y = np.meshgrid(np.arange(low[0], high[0]), np.arange(low[1], high[1]), indexing="ij")
+        cell_x, cell_y = cell_x.ravel(), cell_y.ravel()
+        points = np.stack([
+            (cell_x + hash_uniform(seeds, cell_x, cell_y, 0)) * self.spacing,
+            (cell_y + hash_uniform(seeds, cell_x, cell_y, 1)) * self.spacing,
+        ], axis=-1)
+        values = hash_uniform(seeds, cell_x, cell_y, 2).astype(np.float32)
+        labels, _, _ = nearest_sites(points, size, origin=origin)
+        return np.take_along_axis(values, labels.reshape(len(seeds), -1), axis=1).reshape(labels.shape)
@@ -0,0 +1,168 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from maps.grid import Grid2D
+from maps.map_orchestrator import MapOrchestrator
+from utilities.logger import LoggerUtility as log
+from config import EROSION_TILE_SIZE
+
+
+class SharedArray:
+    """A NumPy array backed by multiprocessing shared memory, attachable from other processes by name."""
+
+    def __init__(self, shape: Tuple[int, ...], dtype: np.dtype, name: Optional[str] = None) -> None:
+        self.shape: Tuple[int, ...] = tuple(shape)
+        self.dtype: np.dtype = np.dtype(dtype)
+        nbytes = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.owner: bool = name is None
+        # Worker processes share the parent's resource tracker, so only the owner's unlink unregisters the block
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=nbytes if self.owner else 0)
+        self.array: np.ndarray = np.ndarray(self.shape, dtype=self.dtype, buffer=self.memory.buf)
+
+    def __repr__(self) -> str:
+        return f"SharedArray(name={self.memory.name}, shape={self.shape}, dtype={self.dtype})"
+
+    def __enter__(self) -> "SharedArray":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def descriptor(self) -> Tuple[str, Tuple[int, ...], str]:
+        """What another process needs to attach to this array."""
+        return self.memory.name, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, descriptor: Tuple[str, Tuple[int, ...], str]) -> "SharedArray":
+        """Attaches to an array created in another process."""
+        name, shape, dtype = descriptor
+        return cls(shape, np.dtype(dtype), name=name)
+
+    def close(self) -> None:
+        """Releases this process' mapping, and the shared block itself if this process created it."""
+        del self.array
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+# State of a worker process, set once by _init_worker
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(seed: int, max_elevation: float, max_depth: float, settings: Dict[str, Any],
+                 descriptors: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> None:
+    """
+    Builds the worker's own generator, with the parent's settings (TerrainGenerator.worker_settings),
+    and attaches to the shared noise and result buffers.
+    """
+    from terrain.terrain_generator import TerrainGenerator
+
+    # The stand-in map only carries the seed and elevation range; results go to shared memory
+    _worker["generator"] = TerrainGenerator(MapOrchestrator(size=(1, 1), max_elevation=max_elevation, max_depth=max_depth, seed=seed))
+    for name, value in settings.items():
+        setattr(_worker["generator"], name, value)
+    _worker["buffers"] = {key: SharedArray.attach(descriptor) for key, descriptor in descriptors.items()}
+
+
+def _generate_block(origin: Tuple[int, int], size: Tuple[int, int]) -> None:
+    """Runs noise, erosion and grid assignment for one block, writing straight into the shared buffers."""
+    generator = _worker["generator"]
+    buffers = _worker["buffers"]
+    window = (slice(origin[0], origin[0] + size[0]), slice(origin[1], origin[1] + size[1]))
+    elevation = buffers["elevation"].array[window]
+    noise = buffers["noise"].array if "noise" in buffers else None
+    elevation[...] = generator.generate_window(origin, size, noise)
+    Grid2D.classify(
+        elevation,
+        generator.map.grid.max_elevation,
+        generator.map.grid.max_depth,
+        out_normalized=buffers["normalized_elevation"].array[window],
+        out_type=buffers["cell_type"].array[window],
+    )
+
+
+def _noise_block(world_origin: Tuple[int, int], origin: Tuple[int, int], size: Tuple[int, int]) -> None:
+    """Generates one block of the shared noise buffer, whose cell (0, 0) is world cell world_origin."""
+    window = (slice(origin[0], origin[0] + size[0]), slice(origin[1], origin[1] + size[1]))
+    block_origin = (world_origin[0] + origin[0], world_origin[1] + origin[1])
+    _worker["buffers"]["noise"].array[window] = _worker["generator"].noise_window(size, block_origin)
+
+
+def blocks(size: Tuple[int, int], block_size: int = EROSION_TILE_SIZE) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """Splits a grid into (origin, size) blocks aligned with the erosion tiles, so no tile is eroded twice."""
+    return [
+        ((x, y), (min(block_size, size[0] - x), min(block_size, size[1] - y)))
+        for x in range(0, size[0], block_size)
+        for y in range(0, size[1], block_size)
+    ]
+
+
+@log.log_method
+def generate_noise_parallel(map_orchestrator: MapOrchestrator, workers: int, origin: Tuple[int, int],
+                            size: Tuple[int, int], settings: Dict[str, Any]) -> np.ndarray:
+    """
+    Returns TerrainGenerator.noise_window(size, origin) for map_orchestrator's seed and the generator
+    settings (TerrainGenerator.worker_settings), generated on a pool of worker processes, one strip
+    of rows per worker.
+
+    The noise is a function of world coordinates alone, so the strips are identical to the serial
+    noise. Strips span the whole second axis because every window also places the Voronoi sites
+    around it, a cost that square blocks smaller than the site spacing would pay many times over.
+    """
+    grid = map_orchestrator.grid
+    strips = [((int(rows[0]), 0), (len(rows), size[1])) for rows in np.array_split(np.arange(size[0]), workers) if len(rows)]
+    with SharedArray(size, np.float32) as noise:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(map_orchestrator.seed, grid.max_elevation, grid.max_depth, settings, {"noise": noise.descriptor}),
+        ) as pool:
+            for future in [pool.submit(_noise_block, origin, strip, strip_size) for strip, strip_size in strips]:
+                future.result()
+        result = np.array(noise.array)
+    log.success(f"Parallel noise generation complete on {workers} workers.")
+    return result
+
+
+@log.log_method
+def generate_heightmap_parallel(map_orchestrator: MapOrchestrator, workers: int, settings: Dict[str, Any],
+                                noise: Optional[np.ndarray] = None) -> None:
+    """
+    Generates the heightmap of map_orchestrator's grid on a pool of worker processes, whose
+    generators take settings (TerrainGenerator.worker_settings).
+
+    Every block is one erosion tile, a pure function of the seed and its world coordinates, so the
+    result is identical to the serial TerrainGenerator.generate_heightmap. A tile is the finest
+    split of the erosion that keeps it identical. noise, if given, is the map's noise from
+    TerrainGenerator.generate_noise (see generate_noise_parallel), shared with the workers instead
+    of regenerated.
+    """
+    grid = map_orchestrator.grid
+    buffers = {
+        "elevation": SharedArray(grid.size, np.float32),
+        "normalized_elevation": SharedArray(grid.size, np.float32),
+        "cell_type": SharedArray(grid.size, np.uint8),
+    }
+    if noise is not None:
+        buffers["noise"] = SharedArray(noise.shape, noise.dtype)
+        np.copyto(buffers["noise"].array, noise)
+    try:
+        descriptors = {key: buffer.descriptor for key, buffer in buffers.items()}
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(map_orchestrator.seed, grid.max_elevation, grid.max_depth, settings, descriptors),
+        ) as pool:
+            for future in [pool.submit(_generate_block, origin, size) for origin, size in blocks(grid.size)]:
+                future.result()
+        np.copyto(grid.elevation, buffers["elevation"].array)
+        np.copyto(grid.normalized_elevation, buffers["normalized_elevation"].array)
+        np.copyto(grid.cell_type, buffers["cell_type"].array)
+        grid._refresh_indexes((slice(0, grid.size[0]), slice(0, grid.size[1])), "elevation", "type")
+    finally:
+        for buffer in buffers.values():
+            buffer.close()
+    log.success(f"Parallel heightmap generation complete on {workers} workers.")
@@ -1,15 +1,80 @@
-
+from collections import OrderedDict
+from dataclasses import asdict, fields
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import numpy as np
+from maps.grid import WATER
 from maps.map_orchestrator import MapOrchestrator
+from maps.precipitation_map import PrecipitationMap
+from maps.biome_map import BiomeMap
 from .noise_ops import PerlinNoise, VoronoiNoise
-from .erosion import Erosion
+from .erosion import Erosion, HydraulicErosion
+from .parallel import generate_heightmap_parallel, generate_noise_parallel
+from .hydrology import Depressions, RiverNetwork, extract_rivers, fill_depressions
+from .climate import PrecipitationModel
+from .biomes import BIOME_NAMES, BIOME_PALETTE, BiomeClassifier
 from utilities.logger import LoggerUtility as log
-from config import PERLIN_SCALE, VORONOI_REGIONS
+from utilities.stage_cache import StageCache
+from config import (
+    PERLIN_SCALE,
+    PERLIN_OCTAVES,
+    PERLIN_PERSISTENCE,
+    PERLIN_LACUNARITY,
+    PERLIN_CHUNK_ROWS,
+    VORONOI_REGIONS,
+    VORONOI_SITE_SPACING,
+    EROSION_ITERATIONS,
+    EROSION_TILE_SIZE,
+    EROSION_TILE_HALO,
+    EROSION_TILE_CACHE_SIZE,
+    GENERATION_WORKERS,
+    RIVER_ACCUMULATION_THRESHOLD,
+)
+
+PERLIN_WEIGHT: float = 0.7
+VORONOI_WEIGHT: float = 0.3
+# Upper bound of the combined noise (pnoise2-style Perlin stays within [-1, 1], Voronoi values are < 1).
+# Elevations are scaled by this fixed bound instead of the map maximum so every tile is normalized alike.
+HEIGHT_REFERENCE: float = PERLIN_WEIGHT + VORONOI_WEIGHT
+
+
+def erosion_rng(seed: int, tile_x: int, tile_y: int) -> np.random.Generator:
+    """Returns the random generator eroding one world-aligned tile of the world of seed."""
+    mask = 0xFFFFFFFF  # SeedSequence entropy must be non-negative
+    return np.random.default_rng([seed & mask, tile_x & mask, tile_y & mask])
+
 
 class TerrainGenerator:
-    """Generates terrain using noise and erosion."""
+    """
+    Generates terrain using noise and erosion.
+
+    Generation runs as stages (noise, heightmap, depressions, rivers, precipitation, biomes) whose
+    outputs go through an optional StageCache. Parameters live on the generator (self.perlin,
+    self.voronoi, self.erosion_iterations, self.river_threshold, self.climate, self.biome_classifier), so after changing one, generate only recomputes
+    the stage it belongs to and the stages after it.
+    """
 
-    def __init__(self, map_orchestrator: MapOrchestrator) -> None:
+    def __init__(self, map_orchestrator: MapOrchestrator, workers: int = GENERATION_WORKERS,
+                 cache: Optional[StageCache] = None) -> None:
         self.map = map_orchestrator
+        self.workers = workers
+        self.cache = cache  # Without one every stage is recomputed
+        self.stage_keys: Dict[str, str] = {}  # Key of the latest output of every stage
+        # Recently eroded tiles, by (recipe key, tile_x, tile_y), so nearby windows and tiles reuse them
+        self.eroded_tiles: "OrderedDict[Tuple[str, int, int], np.ndarray]" = OrderedDict()
+        self.tile_cache_size = EROSION_TILE_CACHE_SIZE
+        self.erosion_iterations = EROSION_ITERATIONS
+        self.river_threshold = RIVER_ACCUMULATION_THRESHOLD
+        self.climate = PrecipitationModel()
+        self.biome_classifier = BiomeClassifier()
+        self.perlin = PerlinNoise(
+            scale=PERLIN_SCALE,
+            seed=self.map.seed,
+            octaves=PERLIN_OCTAVES,
+            persistence=PERLIN_PERSISTENCE,
+            lacunarity=PERLIN_LACUNARITY,
+            chunk_rows=PERLIN_CHUNK_ROWS,
+        )
+        self.voronoi = VoronoiNoise(regions=VORONOI_REGIONS, seed=self.map.seed, spacing=VORONOI_SITE_SPACING)
         log.success("Terrain generator initialized.")
 
     def __repr__(self) -> str:
@@ -19,37 +84,255 @@ class TerrainGenerator:
         return "TerrainGenerator: generates terrain using noise and erosion"
 
 
+    def run_stage(self, stage: str, params: Dict[str, Any], compute: Callable[[], Dict[str, np.ndarray]],
+                  upstream: Sequence[str] = ()) -> Dict[str, np.ndarray]:
+        """Runs a stage through the cache, if there is one, and records the key of its output."""
+        if self.cache is None:
+            key, arrays = StageCache.key(stage, self.map.seed, params, upstream), compute()
+        else:
+            key, arrays = self.cache.run(stage, self.map.seed, params, compute, upstream)
+        self.stage_keys[stage] = key
+        return arrays
+
+    def noise_bounds(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """Returns the world (origin, size) of the noise under every erosion tile of the map, halos included."""
+        tiles = [-(-side // EROSION_TILE_SIZE) for side in self.map.grid.size]
+        return (-EROSION_TILE_HALO, -EROSION_TILE_HALO), tuple(count * EROSION_TILE_SIZE + 2 * EROSION_TILE_HALO for count in tiles)
+
+    def noise_window(self, size: Tuple[int, int], origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """Returns the combined Perlin and Voronoi noise of any window of the unbounded world."""
+        return (
+            self.perlin.generate(size, origin) * PERLIN_WEIGHT +
+            self.voronoi.generate_window(size, origin) * VORONOI_WEIGHT
+        )
+
+    def noise_params(self) -> Dict[str, Any]:
+        """The parameters the combined noise depends on."""
+        perlin = {name: getattr(self.perlin, name) for name in ("scale", "seed", "octaves", "persistence", "lacunarity", "offset")}
+        voronoi = {name: getattr(self.voronoi, name) for name in ("regions", "seed", "spacing")}
+        return {"perlin": perlin, "voronoi": voronoi, "weights": (PERLIN_WEIGHT, VORONOI_WEIGHT)}
+
+    def worker_settings(self) -> Dict[str, Any]:
+        """The generator attributes the noise and heightmap depend on, copied onto the generators of worker processes."""
+        return {"perlin": self.perlin, "voronoi": self.voronoi, "erosion_iterations": self.erosion_iterations}
+
+    @log.log_method
+    def generate_noise(self) -> np.ndarray:
+        """
+        Returns the combined noise of the map's erosion tiles (a cached stage); see noise_bounds.
+        With several workers the noise is generated in blocks on a process pool.
+        """
+        params = dict(self.noise_params(), bounds=self.noise_bounds())
+        origin, size = self.noise_bounds()
+
+        def generate() -> Dict[str, np.ndarray]:
+            if self.workers > 1:
+                return {"noise": generate_noise_parallel(self.map, self.workers, origin, size, self.worker_settings())}
+            return {"noise": self.noise_window(size, origin)}
+
+        return self.run_stage("noise", params, generate)["noise"]
+
     @log.log_method
     def generate_heightmap(self) -> None:
-        """Generates a heightmap using Perlin and Voronoi noise."""
-        perlin = PerlinNoise(scale=PERLIN_SCALE, seed=self.map.seed)
-        voronoi = VoronoiNoise(regions=VORONOI_REGIONS, seed=self.map.seed)
-
-        # Combine Perlin and Voronoi noise
-        heightmap = (
-            perlin.generate(self.map.grid.size) * 0.7 +
-            voronoi.generate(self.map.grid.size) * 0.3
-        )
-        heightmap = Erosion.apply(heightmap, iterations=5)
+        """Generates a heightmap by eroding Perlin and Voronoi noise (a cached stage)."""
+        noise = self.generate_noise()
+        grid = self.map.grid
+
+        def erode() -> Dict[str, np.ndarray]:
+            if self.workers > 1:
+                generate_heightmap_parallel(self.map, self.workers, self.worker_settings(), noise)
+            else:
+                grid.set_elevation_map(self.generate_window((0, 0), grid.size, noise))
+            return {"elevation": grid.elevation}
+
+        params = {
+            "iterations": self.erosion_iterations,
+            "erosion": asdict(HydraulicErosion()),
+            "tile_size": EROSION_TILE_SIZE,
+            "halo": EROSION_TILE_HALO,
+            "max_elevation": grid.max_elevation,
+            "max_depth": grid.max_depth,
+        }
+        elevation = self.run_stage("heightmap", params, erode, upstream=(self.stage_keys["noise"],))["elevation"]
+        if elevation is not grid.elevation:
+            grid.set_elevation_map(elevation)
+
+        log.success("Heightmap generation complete.")
+
+    @log.log_method
+    def generate_tile(self, tile_x: int, tile_y: int, tile_size: int) -> np.ndarray:
+        """Returns the elevation (kilometers) of one tile of the unbounded world."""
+        return self.generate_window((tile_x * tile_size, tile_y * tile_size), (tile_size, tile_size))
+
+    def generate_window(self, origin: Tuple[int, int], size: Tuple[int, int], noise: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the elevation (kilometers) of any window of the unbounded world, from the seed alone.
+
+        Noise is a function of world coordinates, and erosion runs on world-aligned
+        EROSION_TILE_SIZE tiles (plus a halo) seeded by their tile coordinates, so every world
+        cell gets the same elevation whichever window or tile order it is generated in.
+        noise, if given, is the map's noise from generate_noise (the window must lie within the map).
+        """
+        heightmap = np.empty(size, dtype=np.float32)
+        first = (origin[0] // EROSION_TILE_SIZE, origin[1] // EROSION_TILE_SIZE)
+        last = ((origin[0] + size[0] - 1) // EROSION_TILE_SIZE, (origin[1] + size[1] - 1) // EROSION_TILE_SIZE)
+        for tile_x in range(first[0], last[0] + 1):
+            for tile_y in range(first[1], last[1] + 1):
+                tile_origin = (tile_x * EROSION_TILE_SIZE, tile_y * EROSION_TILE_SIZE)
+                tile = self.eroded_tile(tile_x, tile_y, noise)
+                # Copy the part of the erosion tile that overlaps the window
+                x0, y0 = max(origin[0], tile_origin[0]), max(origin[1], tile_origin[1])
+                x1 = min(origin[0] + size[0], tile_origin[0] + EROSION_TILE_SIZE)
+                y1 = min(origin[1] + size[1], tile_origin[1] + EROSION_TILE_SIZE)
+                heightmap[x0 - origin[0]:x1 - origin[0], y0 - origin[1]:y1 - origin[1]] = \
+                    tile[x0 - tile_origin[0]:x1 - tile_origin[0], y0 - tile_origin[1]:y1 - tile_origin[1]]
 
         # Normalize heightmap to elevation values
         max_height = self.map.grid.max_elevation + self.map.grid.max_depth
-        normalized_map = (heightmap * max_height / heightmap.max()).astype(float)
+        heightmap *= max_height / HEIGHT_REFERENCE
+        return heightmap
 
-        # Assign heights to the grid
-        for x in range(self.map.grid.size[0]):
-            for y in range(self.map.grid.size[1]):
-                elevation = normalized_map[x, y]
-                self.map.grid.set_cell_property(x, y, "elevation", elevation)
+    def eroded_tile(self, tile_x: int, tile_y: int, noise: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the combined, eroded noise of one world-aligned erosion tile.
 
-        log.success("Heightmap generation complete.")
+        The simulation covers the tile plus EROSION_TILE_HALO cells on every side so water and
+        sediment can cross the tile border; only the tile itself is kept. The noise is generated
+        unless the map's noise (from generate_noise) is given.
+
+        The last tile_cache_size tiles are kept (keyed by everything they depend on), so windows
+        and tiles smaller than an erosion tile do not erode it again.
+        """
+        recipe = {"noise": self.noise_params(), "iterations": self.erosion_iterations, "erosion": asdict(HydraulicErosion())}
+        key = (StageCache.key("eroded_tile", self.map.seed, recipe), tile_x, tile_y)
+        if key in self.eroded_tiles:
+            self.eroded_tiles.move_to_end(key)
+            return self.eroded_tiles[key]
+
+        origin = (tile_x * EROSION_TILE_SIZE - EROSION_TILE_HALO, tile_y * EROSION_TILE_SIZE - EROSION_TILE_HALO)
+        size = (EROSION_TILE_SIZE + 2 * EROSION_TILE_HALO,) * 2
+        if noise is None:
+            heightmap = self.noise_window(size, origin)
+        else:
+            # noise[0, 0] is world cell (-EROSION_TILE_HALO, -EROSION_TILE_HALO)
+            start = (origin[0] + EROSION_TILE_HALO, origin[1] + EROSION_TILE_HALO)
+            heightmap = noise[start[0]:start[0] + size[0], start[1]:start[1] + size[1]]
+        heightmap = Erosion.apply(heightmap, iterations=self.erosion_iterations, rng=self.tile_rng(tile_x, tile_y))
+        tile = heightmap[EROSION_TILE_HALO:EROSION_TILE_HALO + EROSION_TILE_SIZE, EROSION_TILE_HALO:EROSION_TILE_HALO + EROSION_TILE_SIZE].copy()
+        tile.flags.writeable = False  # Shared by every caller
+        if self.tile_cache_size > 0:
+            self.eroded_tiles[key] = tile
+            while len(self.eroded_tiles) > self.tile_cache_size:
+                self.eroded_tiles.popitem(last=False)
+        return tile
+
+    def tile_rng(self, tile_x: int, tile_y: int) -> np.random.Generator:
+        """Returns the random generator of one erosion tile, derived from the seed and tile coordinates."""
+        return erosion_rng(self.map.seed, tile_x, tile_y)
+
+    @log.log_method
+    def fill_depressions(self) -> None:
+        """
+        Fills the pits of the heightmap and stores the filled surface, lakes and basins on the map (a
+        cached stage, keyed by the content of the grid's elevation, which may have been edited).
+        """
+        elevation = self.map.grid.elevation_map()
+
+        def fill() -> Dict[str, np.ndarray]:
+            depressions = fill_depressions(elevation)
+            return {field.name: getattr(depressions, field.name) for field in fields(depressions)}
+
+        arrays = self.run_stage("depressions", {}, fill, upstream=(StageCache.digest(elevation),))
+        self.map.depressions = Depressions(**arrays)
+        log.success(f"Depressions filled: {len(self.map.depressions)} basins, {int(self.map.depressions.lakes().sum())} lake cells.")
+
+    @log.log_method
+    def generate_rivers(self, threshold: Optional[float] = None) -> None:
+        """
+        Routes flow over the filled heightmap and stores the river network on the map (a cached
+        stage, keyed by the content of the filled surface).
+        """
+        threshold = threshold if threshold is not None else self.river_threshold
+        if self.map.depressions is None:
+            self.fill_depressions()
+        filled = self.map.depressions.filled
+
+        def route() -> Dict[str, np.ndarray]:
+            rivers = extract_rivers(filled, threshold)
+            return {"shape": np.array(rivers.shape), "cells": rivers.cells, "downstream": rivers.downstream, "accumulation": rivers.accumulation}
+
+        arrays = self.run_stage("rivers", {"threshold": threshold}, route, upstream=(StageCache.digest(filled),))
+        self.map.rivers = RiverNetwork(
+            shape=tuple(int(side) for side in arrays["shape"]),
+            cells=arrays["cells"],
+            downstream=arrays["downstream"],
+            accumulation=arrays["accumulation"],
+        )
+        log.success(f"River network extracted: {len(self.map.rivers)} river cells.")
+
+    @log.log_method
+    def generate_precipitation(self) -> None:
+        """
+        Simulates orographic precipitation over the heightmap and stores it on the map as a
+        PrecipitationMap (a cached stage, keyed by the content of the grid's elevation).
+        """
+        grid = self.map.grid
+        elevation = grid.elevation_map()
+        params = dict(asdict(self.climate), max_elevation=grid.max_elevation, max_depth=grid.max_depth)
+        arrays = self.run_stage(
+            "precipitation", params,
+            # The air passes over the sea surface, not the sea floor
+            lambda: {"precipitation": self.climate.simulate(np.maximum(elevation, grid.max_depth), grid.type_map() == WATER)},
+            upstream=(StageCache.digest(elevation),),
+        )
+        # PrecipitationMap is indexed [y, x]
+        precipitation = PrecipitationMap(width=grid.size[0], height=grid.size[1], dtype=np.float32)
+        precipitation.set_region((0, 0), arrays["precipitation"].T)
+        self.map.precipitation = precipitation
+        log.success(f"Precipitation simulated: mean {float(arrays['precipitation'].mean()):.4f} per cell.")
+
+    @log.log_method
+    def generate_biomes(self) -> None:
+        """
+        Classifies every cell into a biome from its temperature and precipitation and stores the
+        result on the map as a BiomeMap (a cached stage, keyed by the content of its inputs).
+        """
+        if self.map.precipitation is None:
+            self.generate_precipitation()
+        grid = self.map.grid
+        elevation = grid.elevation_map()
+        precipitation = self.map.precipitation.get_values().T  # PrecipitationMap is indexed [y, x]
+        params = dict(asdict(self.biome_classifier), max_elevation=grid.max_elevation, max_depth=grid.max_depth)
+        arrays = self.run_stage(
+            "biomes", params,
+            # Temperatures fall with the height above sea level (max_depth)
+            lambda: {"biomes": self.biome_classifier.classify(elevation - grid.max_depth, precipitation, grid.type_map() == WATER)},
+            upstream=(StageCache.digest(elevation), StageCache.digest(precipitation)),
+        )
+        biomes = BiomeMap(width=grid.size[0], height=grid.size[1], names=BIOME_NAMES, palette=BIOME_PALETTE)
+        biomes.set_region((0, 0), arrays["biomes"].T)  # BiomeMap is indexed [y, x]
+        self.map.biomes = biomes
+        log.success(f"Biomes classified: {biomes.coverage()}.")
 
     @log.log_method
-    def generate(self) -> None:
-        """Full terrain generation process."""
+    def generate(self, progress: Optional[Callable[[str], None]] = None) -> None:
+        """Full terrain generation process. progress, if given, is called with the name of every stage as it starts."""
+        report = progress if progress is not None else (lambda stage: None)
         log.info("Generating terrain...")
+        report("heightmap")
         self.generate_heightmap()
+        log.info("Placing rivers...")
+        report("rivers")
+        self.fill_depressions()
+        self.generate_rivers()
+        log.info("Simulating climate...")
+        report("climate")
+        self.generate_precipitation()
+        report("biomes")
+        self.generate_biomes()
         log.info("Populating graph...")
+        report("graph")
         self.map.initialize_graph()
         log.success("Graph population complete.")
-            
\ No newline at end of file
+        if self.cache is not None:
+            log.info(f"Stage cache: {self.cache.hits} hits, {self.cache.misses} misses.")
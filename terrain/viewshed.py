@@ -0,0 +1,227 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from utilities.logger import LoggerUtility as log
+from .climate import bilinear
+from .parallel import SharedArray
+from config import (
+    VIEWSHED_OBSERVER_HEIGHT,
+    VIEWSHED_TARGET_HEIGHT,
+    VIEWSHED_MAX_DISTANCE,
+    VIEWSHED_CHUNK_SAMPLES,
+    VIEWSHED_WORKERS,
+)
+
+
+@dataclass(frozen=True)
+class LineOfSight:
+    """
+    Visibility over an elevation map (kilometers, indexed [x, y]), without earth curvature.
+
+    Sight lines are sampled once per cell along their major axis, with the terrain interpolated
+    across it. A cell is visible from an observer when no sample between them rises above the
+    straight line from the observer's eye (observer_height above the ground) to the target
+    (target_height above the ground).
+
+    viewshed casts a ray from the observer to every cell on the edge of its reach (the R2 sweep):
+    the running maximum of the sampled slopes along a ray is its horizon. Each cell is decided by
+    the ray passing closest to its centre: visible if its own slope clears that ray's horizon.
+    That ray runs up to `offset` cells beside the true sight line, which moves the terrain it
+    samples by at most offset times the map's steepest step between neighbouring cells; cells
+    whose clearance is within that error are decided exactly with visible(), so the viewshed
+    agrees with point-to-point line of sight. Rays are processed as 2D arrays,
+    VIEWSHED_CHUNK_SAMPLES samples at a time.
+    """
+    observer_height: float = VIEWSHED_OBSERVER_HEIGHT
+    target_height: float = VIEWSHED_TARGET_HEIGHT
+    max_distance: float = VIEWSHED_MAX_DISTANCE  # In cells
+
+    def viewshed(self, elevation: np.ndarray, observer: Tuple[int, int]) -> np.ndarray:
+        """Returns the (X, Y) boolean map of the cells visible from observer."""
+        elevation = np.asarray(elevation, dtype=np.float32)
+        size = elevation.shape
+        ox, oy = int(observer[0]), int(observer[1])
+        if not (0 <= ox < size[0] and 0 <= oy < size[1]):
+            raise IndexError(f"Observer {observer} is outside the map of size {size}.")
+        eye = float(elevation[ox, oy]) + self.observer_height
+        visible = np.zeros(size, dtype=bool)
+        visible[ox, oy] = True
+        # Of the ray deciding every cell: how far it passes from the cell's centre, and by how much
+        # (kilometers, at the cell) the cell clears its horizon
+        offset = np.full(size, np.inf, dtype=np.float32)
+        margin = np.zeros(size, dtype=np.float32)
+        offset[ox, oy] = 0
+
+        # Targets of the rays: the edge of the box the observer can reach
+        reach = size[0] + size[1] if np.isinf(self.max_distance) else int(np.ceil(self.max_distance))
+        x0, x1 = max(0, ox - reach), min(size[0] - 1, ox + reach)
+        y0, y1 = max(0, oy - reach), min(size[1] - 1, oy + reach)
+        xs, ys = np.arange(x0, x1 + 1), np.arange(y0, y1 + 1)
+        targets = np.unique(np.concatenate([
+            np.stack([xs, np.full_like(xs, y0)], axis=1), np.stack([xs, np.full_like(xs, y1)], axis=1),
+            np.stack([np.full_like(ys, x0), ys], axis=1), np.stack([np.full_like(ys, x1), ys], axis=1),
+        ]), axis=0)
+        dx, dy = targets[:, 0] - ox, targets[:, 1] - oy
+        steps = np.maximum(np.abs(dx), np.abs(dy))
+        dx, dy, steps = dx[steps > 0], dy[steps > 0], steps[steps > 0]
+        if len(steps) == 0:
+            return visible
+        max_step = max(float(np.abs(np.diff(elevation, axis=axis)).max()) for axis in (0, 1) if size[axis] > 1)
+
+        length = int(steps.max())
+        k = np.arange(1, length + 1, dtype=np.float64)
+        chunk = max(1, VIEWSHED_CHUNK_SAMPLES // length)
+        for start in range(0, len(steps), chunk):
+            ray = slice(start, start + chunk)
+            fraction = k / steps[ray, np.newaxis]
+            x = ox + dx[ray, np.newaxis] * fraction
+            y = oy + dy[ray, np.newaxis] * fraction
+            valid = fraction <= 1
+            distance = np.hypot(x - ox, y - oy)
+            terrain, _ = bilinear(elevation, x, y)
+            slope = (terrain - eye) / distance
+            slope[~valid] = -np.inf
+            horizon = np.empty_like(slope)
+            horizon[:, 0] = -np.inf
+            np.maximum.accumulate(slope[:, :-1], axis=1, out=horizon[:, 1:])
+            # The cells the rays cross, and whether each clears the horizon before it
+            cell_x = np.rint(np.clip(x, 0, size[0] - 1)).astype(np.intp)
+            cell_y = np.rint(np.clip(y, 0, size[1] - 1)).astype(np.intp)
+            cell_distance = np.hypot(cell_x - ox, cell_y - oy)
+            crossed = valid & (cell_distance <= self.max_distance)
+            clearance = (elevation[cell_x, cell_y] + np.float32(self.target_height) - eye) - horizon * cell_distance
+            # Keep the crossing closest to every cell's centre: sort by cell, then by quantized offset
+            cell = (cell_x * size[1] + cell_y)[crossed]
+            miss = np.hypot(x - cell_x, y - cell_y)[crossed].astype(np.float32)
+            order = np.argsort(cell * (1 << 21) + (miss * (1 << 20)).astype(np.int64))
+            cell, miss, clearance = cell[order], miss[order], clearance[crossed][order]
+            first = np.ones(len(cell), dtype=bool)
+            np.not_equal(cell[1:], cell[:-1], out=first[1:])
+            cell, miss, clearance = cell[first], miss[first], clearance[first]
+            closer = miss < offset.ravel()[cell]
+            offset.ravel()[cell[closer]] = miss[closer]
+            margin.ravel()[cell[closer]] = clearance[closer]
+
+        decided = np.isfinite(offset)
+        visible |= decided & (margin >= 0)
+        # Interpolated terrain changes by at most sqrt(2) * max_step per cell of lateral shift; 2 also
+        # covers the ray's samples falling slightly apart from the sight line's along its length
+        uncertain = np.argwhere(decided & (np.abs(margin) <= 2 * max_step * np.where(decided, offset, 0) + 1e-6))
+        if len(uncertain):
+            visible[uncertain[:, 0], uncertain[:, 1]] = self.visible(elevation, np.broadcast_to((ox, oy), uncertain.shape), uncertain)
+        visible[ox, oy] = True
+        return visible
+
+    @log.log_method
+    def viewsheds(self, elevation: np.ndarray, observers: Sequence[Tuple[int, int]],
+                  workers: int = VIEWSHED_WORKERS) -> np.ndarray:
+        """Returns the (N, X, Y) boolean viewsheds of N observers, computed on workers processes."""
+        elevation = np.asarray(elevation, dtype=np.float32)
+        observers = np.asarray(observers, dtype=np.int64).reshape(-1, 2)
+        if workers <= 1 or len(observers) <= 1:
+            result = np.empty((len(observers),) + elevation.shape, dtype=bool)
+            for index, observer in enumerate(observers):
+                result[index] = self.viewshed(elevation, observer)
+            return result
+        with SharedArray((len(observers),) + elevation.shape, bool) as output:
+            self._run_parallel(elevation, observers, workers, output)
+            result = np.array(output.array)
+        log.success(f"{len(observers)} viewsheds computed on {workers} workers.")
+        return result
+
+    @log.log_method
+    def coverage(self, elevation: np.ndarray, observers: Sequence[Tuple[int, int]],
+                 workers: int = VIEWSHED_WORKERS) -> np.ndarray:
+        """
+        Returns the (X, Y) number of observers that see every cell, without keeping the individual
+        viewsheds (so hundreds of observers need no more memory than one count map per worker).
+        """
+        elevation = np.asarray(elevation, dtype=np.float32)
+        observers = np.asarray(observers, dtype=np.int64).reshape(-1, 2)
+        if workers <= 1 or len(observers) <= 1:
+            counts = np.zeros(elevation.shape, dtype=np.int32)
+            for observer in observers:
+                counts += self.viewshed(elevation, observer)
+            return counts
+        counts = self._run_parallel(elevation, observers, workers, None)
+        log.success(f"Coverage of {len(observers)} observers computed on {workers} workers.")
+        return counts
+
+    def visible(self, elevation: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """
+        Point-to-point line of sight, vectorized over pairs: returns whether each of the (P, 2)
+        targets cells is visible from the matching sources cell.
+        """
+        elevation = np.asarray(elevation, dtype=np.float32)
+        sources = np.asarray(sources, dtype=np.int64).reshape(-1, 2)
+        targets = np.asarray(targets, dtype=np.int64).reshape(-1, 2)
+        if sources.shape != targets.shape:
+            raise ValueError("visible needs as many sources as targets.")
+        delta = targets - sources
+        steps = np.abs(delta).max(axis=1)
+        far = np.hypot(delta[:, 0], delta[:, 1]) > self.max_distance
+        eye = elevation[sources[:, 0], sources[:, 1]] + np.float32(self.observer_height)
+        aim = elevation[targets[:, 0], targets[:, 1]] + np.float32(self.target_height)
+        result = np.ones(len(steps), dtype=bool)
+        length = int(steps.max()) - 1 if len(steps) else 0
+        if length <= 0:
+            return result & ~far
+        k = np.arange(1, length + 1, dtype=np.float64)
+        chunk = max(1, VIEWSHED_CHUNK_SAMPLES // length)
+        for start in range(0, len(steps), chunk):
+            pair = slice(start, start + chunk)
+            fraction = k / np.maximum(steps[pair, np.newaxis], 1)
+            x = sources[pair, 0, np.newaxis] + delta[pair, 0, np.newaxis] * fraction
+            y = sources[pair, 1, np.newaxis] + delta[pair, 1, np.newaxis] * fraction
+            terrain, _ = bilinear(elevation, x, y)
+            line = eye[pair, np.newaxis] + (aim - eye)[pair, np.newaxis] * fraction.astype(np.float32)
+            blocked = (terrain > line) & (fraction < 1)
+            result[pair] = ~blocked.any(axis=1)
+        return result & ~far
+
+    def _run_parallel(self, elevation: np.ndarray, observers: np.ndarray, workers: int,
+                      output: Optional[SharedArray]) -> Optional[np.ndarray]:
+        """
+        Splits the observers into batches for a pool of workers sharing the elevation. Each batch
+        writes its viewsheds into output, or, without output, returns its coverage counts (summed here).
+        """
+        batches = np.array_split(np.arange(len(observers)), min(len(observers), workers * 4))
+        with SharedArray(elevation.shape, np.float32) as shared:
+            np.copyto(shared.array, elevation)
+            descriptors = {"elevation": shared.descriptor}
+            if output is not None:
+                descriptors["output"] = output.descriptor
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self, descriptors)) as pool:
+                futures = [pool.submit(_viewshed_batch, batch, observers[batch]) for batch in batches if len(batch)]
+                counts = None
+                for future in futures:
+                    partial = future.result()
+                    if partial is not None:
+                        counts = partial if counts is None else counts + partial
+        return counts
+
+
+# State of a worker process, set once by _init_worker
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(model: LineOfSight, descriptors: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> None:
+    """Keeps the model and attaches to the shared elevation (and output) buffers."""
+    _worker["model"] = model
+    _worker["buffers"] = {key: SharedArray.attach(descriptor) for key, descriptor in descriptors.items()}
+
+
+def _viewshed_batch(indices: np.ndarray, observers: np.ndarray) -> Optional[np.ndarray]:
+    """Computes the viewsheds of a batch of observers, into the shared output or as coverage counts."""
+    model = _worker["model"]
+    buffers = _worker["buffers"]
+    elevation = buffers["elevation"].array
+    if "output" in buffers:
+        for index, observer in zip(indices, observers):
+            buffers["output"].array[index] = model.viewshed(elevation, observer)
+        return None
+    counts = np.zeros(elevation.shape, dtype=np.int32)
+    for observer in observers:
+        counts += model.viewshed(elevation, observer)
+    return counts
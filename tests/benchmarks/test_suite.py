@@ -0,0 +1,24 @@
+# Test for the benchmark suite
+import json
+
+from benchmarks.suite import Result, compare, load_results, main
+
+
+class TestSuite:
+    def test_runs_and_saves_results(self, tmp_path):
+        output = tmp_path / "results.json"
+        assert main(["--sizes", "16", "32", "--cases", "perlin_generate", "grid2d", "world_load",
+                     "--repeats", "1", "--output", str(output)]) == 0
+        results = load_results(str(output))
+        assert [(result.case, result.size) for result in results] == [
+            ("perlin_generate", 16), ("perlin_generate", 32), ("grid2d", 16), ("grid2d", 32), ("world_load", 16), ("world_load", 32),
+        ]
+        assert all(result.seconds > 0 and result.cells_per_second > 0 and result.peak_bytes >= 0 for result in results)
+        assert "machine" in json.loads(output.read_text())
+
+    def test_compare_flags_regressions(self, tmp_path):
+        baseline = [Result("grid2d", 16, 256, 1.0, 256.0, 0), Result("grid2d", 32, 1024, 1.0, 1024.0, 0)]
+        results = [Result("grid2d", 16, 256, 1.1, 232.7, 0), Result("grid2d", 32, 1024, 2.0, 512.0, 0),
+                   Result("grid2d", 64, 4096, 9.0, 455.1, 0)]
+        rows = compare(results, baseline, tolerance=0.25)
+        assert [(row["size"], row["regression"]) for row in rows] == [(16, False), (32, True)]
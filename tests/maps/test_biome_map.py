@@ -0,0 +1,22 @@
+# Test for BiomeMap
+import numpy as np
+
+from maps.biome_map import BiomeMap
+from maps.generic_map import GenericMap
+
+
+class TestBiomeMap:
+    def test_round_trip_and_colors(self):
+        biome_map = BiomeMap(width=3, height=2, names=["ocean", "desert"], palette=[(0, 0, 255), (255, 255, 0)])
+        biome_map.set_region((1, 0), np.array([[1, 1], [1, 0]]))
+        assert biome_map.grid.dtype == np.uint8
+        assert biome_map.get_biome(2, 0) == "desert" and biome_map.get_biome(0, 0) == "ocean"
+        assert biome_map.coverage() == {"ocean": 3, "desert": 3}
+        assert biome_map.colors().shape == (2, 3, 3)
+        assert biome_map.colors((1, 1), (2, 1)).tolist() == [[[255, 255, 0], [0, 0, 255]]]
+
+        restored = GenericMap.from_type("BiomeMap")
+        restored.from_dict(biome_map.to_dict())
+        assert np.array_equal(restored.grid, biome_map.grid) and restored.grid.dtype == np.uint8
+        assert restored.names == biome_map.names
+        assert np.array_equal(restored.palette, biome_map.palette)
@@ -0,0 +1,23 @@
+# Test for GenericMap
+import pytest
+
+import maps
+from maps.generic_map import MAP_MODULES, GenericMap
+from maps.height_map import HeightMap
+
+
+class TestGenericMap:
+    def test_registry_covers_every_map_module(self):
+        classes = GenericMap.discover_map_classes()
+        assert set(MAP_MODULES) <= set(classes)
+        assert all(cls.map_type == map_type for map_type, cls in classes.items())
+
+    def test_from_type(self):
+        height_map = GenericMap.from_type("HeightMap", width=4, height=3)
+        assert type(height_map) is HeightMap and height_map.grid.shape == (3, 4)
+        with pytest.raises(KeyError):
+            GenericMap.from_type("NoSuchMap")
+
+    def test_package_exports_load_lazily(self):
+        assert maps.HeightMap is HeightMap
+        assert set(maps.__all__) <= set(dir(maps))
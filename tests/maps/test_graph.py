@@ -0,0 +1,61 @@
+# Test for TerrainGraph
+import networkx as nx
+import numpy as np
+
+from maps.graph import TerrainGraph
+from maps.grid import Grid2D
+
+
+def grid_with_terrain(size=(5, 4)) -> Grid2D:
+    grid = Grid2D(size, max_elevation=5.0, max_depth=1.0)
+    grid.set_elevation_map(np.linspace(-1.0, 4.0, size[0] * size[1], dtype=np.float32).reshape(size))
+    return grid
+
+
+def networkx_reference(grid: Grid2D) -> nx.DiGraph:
+    """The graph MapOrchestrator.initialize_graph used to build node by node."""
+    graph = nx.DiGraph()
+    size_x, size_y = grid.size
+    for x in range(size_x):
+        for y in range(size_y):
+            graph.add_node((x, y), **grid.get_cell(x, y))
+            for dx, dy in ((-1, 0), (0, -1), (-1, -1), (1, -1), (-1, 1), (1, 1)):
+                if 0 <= x + dx < size_x and 0 <= y + dy < size_y:
+                    graph.add_edge((x + dx, y + dy), (x, y))
+    return graph
+
+
+class TestTerrainGraph:
+    def test_matches_networkx_construction(self):
+        grid = grid_with_terrain()
+        graph = TerrainGraph(grid)
+        reference = networkx_reference(grid)
+        exported = graph.to_networkx()
+        assert graph.number_of_nodes() == reference.number_of_nodes()
+        assert graph.number_of_edges() == reference.number_of_edges()
+        assert set(exported.edges) == set(reference.edges)
+        assert dict(exported.nodes(data=True)) == dict(reference.nodes(data=True))
+        for node in reference.nodes:
+            assert {tuple(position) for position in graph.get_neighbors(node)} == set(reference.neighbors(node))
+
+    def test_neighbors_and_attributes_are_views(self):
+        grid = grid_with_terrain()
+        graph = TerrainGraph(grid)
+        _, targets = graph.csr()
+        # One flat index per edge; coordinates only at get_neighbors
+        assert targets.ndim == 1 and targets.dtype == np.int32
+        assert np.shares_memory(graph.get_neighbor_indices((2, 2)), targets)
+        size_y = grid.size[1]
+        assert sorted(graph.get_neighbor_indices((2, 2)).tolist()) == sorted(x * size_y + y for x, y in graph.get_neighbors((2, 2)))
+        attributes = graph.attributes()
+        assert np.shares_memory(attributes["elevation"], grid.elevation)
+        grid.set_cell_elevation(1, 1, 2.5)
+        assert attributes["elevation"][1, 1] == 2.5 and graph.get_node((1, 1))["elevation"] == 2.5
+
+    def test_explicit_nodes_and_edges(self):
+        graph = TerrainGraph(grid_with_terrain())
+        graph.add_node((9, 9), name="harbour")
+        graph.add_edge((0, 0), (9, 9), kind="road")
+        assert graph.number_of_nodes() == 21
+        assert (9, 9) in {tuple(position) for position in graph.get_neighbors((0, 0))}
+        assert graph.to_networkx().edges[(0, 0), (9, 9)] == {"kind": "road"}
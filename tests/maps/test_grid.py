@@ -0,0 +1,109 @@
+
+# Test for Grid2D
+import numpy as np
+import pytest
+
+import maps.grid as grid_module
+from maps.grid import AIR, CELL_TYPES, LAND, WATER, Grid2D, Grid3D, cell_type_code
+
+
+class TestGrid2D:
+    def test_initialization(self):
+        grid = Grid2D((4, 3), max_elevation=5.0, max_depth=1.0)
+        assert grid.elevation.dtype == np.float32
+        assert grid.cell_type.dtype == np.uint8
+        assert grid.elevation_map().shape == (4, 3)
+        assert np.all(grid.type_map() == WATER)
+        assert grid.get_cell(0, 0) == {"elevation": 0.0, "normalized_elevation": 0.0, "type": "water"}
+
+    def test_accessors_are_read_only_views(self):
+        grid = Grid2D((4, 3), max_elevation=5.0, max_depth=1.0)
+        view = grid.normalized_elevation_map()
+        assert np.shares_memory(view, grid.normalized_elevation)
+        assert not view.flags.writeable
+
+    def test_set_elevation_map_matches_per_cell(self):
+        elevation = np.linspace(-2.0, 5.0, 12, dtype=np.float32).reshape(4, 3)
+        bulk = Grid2D((4, 3), max_elevation=5.0, max_depth=1.0)
+        bulk.set_elevation_map(elevation)
+        per_cell = Grid2D((4, 3), max_elevation=5.0, max_depth=1.0)
+        for x in range(4):
+            for y in range(3):
+                per_cell.set_cell_elevation(x, y, float(elevation[x, y]))
+        assert np.array_equal(bulk.elevation, per_cell.elevation)
+        assert np.allclose(bulk.normalized_elevation, per_cell.normalized_elevation)
+        assert np.array_equal(bulk.cell_type, per_cell.cell_type)
+        assert set(np.unique(bulk.cell_type)) == {WATER, LAND}
+
+    def test_set_property_map_window(self, monkeypatch):
+        monkeypatch.setattr("maps.grid.CELL_TYPES", list(CELL_TYPES))  # "rock" is registered on a copy
+        grid = Grid2D((4, 4), max_elevation=5.0, max_depth=1.0)
+        grid.set_property_map("elevation", np.full((2, 2), 3.0), origin=(1, 2))
+        assert grid.get_cell_property(1, 2, "elevation") == 3.0
+        assert grid.get_cell_property(1, 2, "normalized_elevation") == np.float32(0.5)
+        assert grid.get_cell_property(0, 0, "elevation") == 0.0
+        grid.set_property_map("type", np.array([["land", "rock"]]), origin=(0, 0))
+        assert grid.get_cell_property(0, 1, "type") == "rock"
+        assert "rock" in grid_module.CELL_TYPES and "rock" not in CELL_TYPES
+
+    def test_extra_properties(self):
+        grid = Grid2D((2, 2), max_elevation=5.0, max_depth=1.0)
+        assert grid.get_cell_property(0, 0, "moisture") is None
+        grid.set_cell_property(0, 0, "moisture", 0.25)
+        assert grid.get_cell_property(0, 0, "moisture") == 0.25
+        assert grid.get_cell(0, 0)["moisture"] == 0.25
+        # Cells of an existing layer that were never set read like a missing layer
+        assert grid.get_cell_property(1, 1, "moisture") is None and "moisture" not in grid.get_cell(1, 1)
+
+    def test_spatial_indexes_follow_writes(self):
+        grid = Grid2D((20, 12), max_elevation=5.0, max_depth=1.0)
+        grid.set_elevation_map(np.full((20, 12), 1.0))
+        elevation, types = grid.spatial_index("elevation"), grid.spatial_index("type")
+        grid.set_elevation_map(np.full((2, 3), -2.0), origin=(5, 4))
+        grid.set_cell_elevation(17, 9, 4.5)
+        assert elevation.highest() == (4.5, (17, 9))
+        assert types.any_in_range(WATER, WATER, (4, 3), (4, 4)) and not types.any_in_range(WATER, WATER, (10, 0), (10, 12))
+        assert grid.spatial_index("normalized_elevation").stats((5, 4), (2, 3)).maximum == pytest.approx(-2.0 / 6.0)
+
+
+# Test for Grid3D
+class TestGrid3D:
+    def test_defaults_are_derived_from_z(self):
+        grid = Grid3D((500, 500), max_elevation=5.0, max_depth=1.0)
+        assert grid.shape == (500, 500, 6000)
+        assert grid.override_count == 0
+        assert grid.get_cell_property(10, 20, 500, "type") == "water"
+        assert grid.get_cell_property(10, 20, 1500, "type") == "air"
+        assert np.isclose(grid.get_cell_property(10, 20, 1500, "elevation"), 1.5)
+        assert grid.get_cell_property(10, 20, 1500, "moisture") is None
+
+    def test_overrides_in_columns_and_slabs(self):
+        grid = Grid3D((8, 8), max_elevation=0.01, max_depth=0.005)  # 15 z levels
+        grid.set_cell_property(2, 3, 4, "type", "rock")
+        grid.set_cells_property(np.array([2, 5]), np.array([3, 5]), np.array([10, 1]), "elevation", [7.0, 9.0])
+        column = grid.get_column(2, 3, "type")
+        assert CELL_TYPES[column[4]] == "rock"
+        assert column[3] == WATER and column[10] == AIR
+        assert grid.get_column(2, 3, "elevation")[10] == 7.0
+
+        slab = grid.get_slab("elevation", z_range=(0, 12), x_range=(2, 6), y_range=(3, 6))
+        assert slab.shape == (4, 3, 12)
+        assert slab[0, 0, 10] == 7.0 and slab[3, 2, 1] == 9.0
+        assert np.isclose(slab[1, 1, 5], 0.005)
+
+    def test_later_writes_win(self):
+        grid = Grid3D((4, 4), max_elevation=0.01, max_depth=0.005)
+        grid.set_cell_property(1, 1, 1, "moisture", 1.0)
+        grid.set_cells_property(1, 1, 1, "moisture", 2.0)
+        grid.set_cell_property(1, 1, 1, "moisture", 3.0)
+        assert grid.get_cell_property(1, 1, 1, "moisture") == 3.0
+        assert grid.override_count == 1
+
+    def test_fill_columns(self):
+        grid = Grid3D((4, 4), max_elevation=0.01, max_depth=0.005)
+        grid.fill_columns([0, 3], [0, 2], z_start=[2, 5], z_stop=[4, 20], key="type", value="rock")
+        columns = grid.get_columns([0, 3, 1], [0, 2, 1], "type")
+        rock = cell_type_code("rock")
+        assert list(np.flatnonzero(columns[0] == rock)) == [2, 3]
+        assert list(np.flatnonzero(columns[1] == rock)) == list(range(5, 15))
+        assert not np.any(columns[2] == rock)
@@ -1,6 +1,7 @@
 import numpy as np
+import pytest
 
-from ..maps.grid_map import GridMap
+from maps.grid_map import GridMap
 
 # Test for GridMap
 class TestGridMap:
@@ -17,4 +18,51 @@ class TestGridMap:
         restored_map.from_dict(serialized)
         assert np.array_equal(grid_map.grid, restored_map.grid)
         assert grid_map.width == restored_map.width
-        assert grid_map.height == restored_map.height
\ No newline at end of file
+        assert grid_map.height == restored_map.height
+
+    def test_regions_and_masks(self):
+        grid_map = GridMap(width=6, height=4, dtype="float32")
+        grid_map.set_region((2, 1), np.arange(6, dtype=np.float32).reshape(2, 3))
+        assert grid_map.grid.dtype == np.float32
+        assert np.array_equal(grid_map.get_region((2, 1), (3, 2)), np.arange(6).reshape(2, 3))
+        assert grid_map.get_data(4, 2) == 5.0
+        grid_map.set_masked(grid_map.grid > 3, -1.0)
+        assert grid_map.get_values().min() == -1.0 and np.count_nonzero(grid_map.grid == -1.0) == 2
+        with pytest.raises(IndexError):
+            grid_map.get_region((4, 0), (3, 1))
+
+    def test_in_place_rescale_and_clamp(self):
+        grid_map = GridMap(width=4, height=4, dtype="float16")
+        grid_map.set_region((0, 0), np.linspace(-2, 6, 16).reshape(4, 4))
+        grid = grid_map.grid
+        grid_map.rescale(10.0, 20.0)
+        assert grid_map.grid is grid and grid_map.data_range() == (10.0, 20.0)
+        grid_map.clamp(12.0, 15.0)
+        assert grid_map.data_range() == (12.0, 15.0)
+
+    def test_quantized_int16(self):
+        values = np.linspace(0.0, 1000.0, 20).reshape(4, 5)
+        grid_map = GridMap(width=5, height=4, dtype="int16", value_range=(0.0, 1000.0))
+        grid_map.set_region((0, 0), values)
+        assert grid_map.grid.dtype == np.int16 and grid_map.quantized
+        assert np.allclose(grid_map.get_values(), values, atol=grid_map.scale)
+        grid_map.normalize()
+        assert np.allclose(grid_map.data_range(), (0.0, 1.0))
+        grid_map.clamp(0.25, 0.75)
+        low, high = grid_map.data_range()
+        assert 0.25 <= low < 0.25 + grid_map.scale and 0.75 - grid_map.scale < high <= 0.75
+        restored = GridMap()
+        restored.from_dict(grid_map.to_dict())
+        assert restored.grid.dtype == np.int16 and np.array_equal(restored.get_values(), grid_map.get_values())
+        grid_map.convert("float32")
+        assert grid_map.grid.dtype == np.float32 and np.allclose(grid_map.grid, restored.get_values())
+
+    def test_spatial_index(self):
+        grid_map = GridMap(width=6, height=4, dtype="uint8", value_range=(0.0, 255.0))
+        index = grid_map.spatial_index()
+        grid_map.set_data(5, 1, 200.0)
+        assert index.highest() == (200.0, (1, 5))  # Indexed [y, x], like the grid
+        grid_map.rescale(0.0, 1.0)
+        assert index.stats().maximum == pytest.approx(1.0)
+        grid_map.convert("float32")
+        assert grid_map.spatial_index() is not index and grid_map.spatial_index().find(1.0, 1.0).tolist() == [[1, 5]]
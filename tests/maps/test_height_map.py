@@ -1,5 +1,7 @@
 
 # Test for HeightMap
+import numpy as np
+
 from maps.height_map import HeightMap
 
 
@@ -10,3 +12,11 @@ class TestHeightMap:
         height_map.normalize()
         assert height_map.grid.min() == 0.0
         assert height_map.grid.max() == 1.0
+
+    def test_normal_grid_follows_bulk_writes(self):
+        height_map = HeightMap(width=4, height=3, height_range=(0, 100), dtype="int16")
+        height_map.set_height(1, 1, 50.0)
+        height_map.set_region((2, 0), np.full((2, 2), 25.0))
+        height_map.set_masked(np.eye(3, 4, dtype=bool), 100.0)
+        assert np.allclose(height_map.normal_grid, height_map.get_values() / 100.0)
+        assert np.isclose(height_map.get_normalized_height(1, 1), 1.0) and np.isclose(height_map.get_height(3, 1), 25.0, atol=0.01)
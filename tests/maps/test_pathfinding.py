@@ -0,0 +1,73 @@
+# Test for PathFinder
+import heapq
+
+import numpy as np
+
+from maps.grid import Grid2D
+from maps.map_orchestrator import MapOrchestrator
+from maps.pathfinding import MOVES, PathCost, PathFinder
+from terrain.noise_ops import PerlinNoise
+
+
+def hilly_grid(size=(40, 30)) -> Grid2D:
+    grid = Grid2D(size, max_elevation=5.0, max_depth=1.0)
+    grid.set_elevation_map(PerlinNoise(scale=0.1, seed=2, octaves=3).generate(size) * 3 + 0.5)
+    return grid
+
+
+def heap_dijkstra(costs: np.ndarray, source) -> np.ndarray:
+    """Textbook per-cell Dijkstra over the step costs."""
+    _, size_x, size_y = costs.shape
+    distance = np.full((size_x, size_y), np.inf)
+    distance[source] = 0
+    heap = [(0.0, source)]
+    while heap:
+        cost, (x, y) = heapq.heappop(heap)
+        if cost > distance[x, y]:
+            continue
+        for direction, (dx, dy) in enumerate(MOVES):
+            candidate = cost + costs[direction, x, y]
+            if np.isfinite(candidate) and candidate < distance[x + dx, y + dy]:
+                distance[x + dx, y + dy] = candidate
+                heapq.heappush(heap, (candidate, (x + dx, y + dy)))
+    return distance
+
+
+class TestPathFinder:
+    def test_distance_field_matches_dijkstra(self):
+        pathfinder = PathFinder(hilly_grid())
+        field = pathfinder.distance_field([(3, 4)])
+        assert np.allclose(field.distance, heap_dijkstra(pathfinder.step_costs(), (3, 4)))
+        assert pathfinder.distance_field([(3, 4)]) is field  # Cached
+
+    def test_a_star_finds_the_cheapest_path(self):
+        pathfinder = PathFinder(hilly_grid())
+        path = pathfinder.find_path((2, 2), (35, 25))
+        assert tuple(path[0]) == (2, 2) and tuple(path[-1]) == (35, 25)
+        assert np.all(np.abs(np.diff(path, axis=0)).max(axis=1) == 1)
+        assert np.isclose(pathfinder.path_cost(path), pathfinder.distance_field([(2, 2)]).distance[35, 25])
+
+    def test_water_and_steep_steps_are_avoided(self):
+        grid = Grid2D((9, 9), max_elevation=5.0, max_depth=1.0)
+        elevation = np.full((9, 9), 2.0, dtype=np.float32)
+        elevation[4, :8] = -0.5  # A lake wall with a gap at y = 8
+        grid.set_elevation_map(elevation)
+        pathfinder = PathFinder(grid, PathCost(water_cost=np.inf))
+        path = pathfinder.find_path((0, 0), (8, 0))
+        assert not np.any(path[:, 0] == 4) or np.all(path[path[:, 0] == 4, 1] == 8)
+        blocked = PathFinder(grid, PathCost(water_cost=np.inf, max_grade=0.1))
+        elevation[4, 8] = 3.0  # Close the gap with a cliff
+        grid.set_elevation_map(elevation)
+        assert blocked.find_path((0, 0), (8, 0)) is None
+
+    def test_batches_match_single_queries(self):
+        orchestrator = MapOrchestrator(size=(40, 30), max_elevation=5.0, max_depth=1.0, seed=0)
+        orchestrator.grid = hilly_grid()
+        orchestrator.initialize_graph()
+        pairs = [((1, 1), (30, 20)), ((1, 1), (5, 25)), ((1, 1), (38, 2)), ((1, 1), (20, 20)), ((10, 5), (0, 29))]
+        paths = orchestrator.find_paths(pairs)
+        pathfinder = orchestrator.pathfinder()
+        assert ((1, 1),) in pathfinder.fields and ((10, 5),) not in pathfinder.fields
+        for (source, target), path in zip(pairs, paths):
+            single = orchestrator.find_path(source, target)
+            assert np.isclose(pathfinder.path_cost(path), pathfinder.path_cost(single))
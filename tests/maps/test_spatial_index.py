@@ -0,0 +1,37 @@
+# Test for MinMaxPyramid
+import numpy as np
+import pytest
+
+from maps.spatial_index import MinMaxPyramid
+
+
+class TestMinMaxPyramid:
+    def test_queries_match_a_scan(self):
+        rng = np.random.default_rng(4)
+        values = rng.random((61, 45)).astype(np.float32)
+        values[10:12, 20:30] = np.nan
+        index = MinMaxPyramid(values, leaf=4)
+        for _ in range(50):
+            origin = (int(rng.integers(0, 61)), int(rng.integers(0, 45)))
+            shape = (int(rng.integers(1, 62 - origin[0])), int(rng.integers(1, 46 - origin[1])))
+            window = values[origin[0]:origin[0] + shape[0], origin[1]:origin[1] + shape[1]].astype(np.float64)
+            stats = index.stats(origin, shape)
+            if stats.count:
+                assert stats.minimum == np.nanmin(window) and stats.maximum == np.nanmax(window)
+                assert stats.mean == pytest.approx(np.nanmean(window))
+            assert stats.count == np.count_nonzero(~np.isnan(window))
+            low = float(rng.random()) * 0.9
+            matches = (window >= low) & (window <= low + 0.05)
+            assert np.array_equal(index.find(low, low + 0.05, origin, shape), np.argwhere(matches) + origin)
+            assert index.any_in_range(low, low + 0.05, origin, shape) == matches.any()
+
+    def test_refresh_after_writes(self):
+        values = np.zeros((40, 30))
+        index = MinMaxPyramid(values, leaf=4)
+        values[12:15, 7:9] = 5.0
+        index.refresh((12, 7), (3, 2))
+        assert index.highest() == (5.0, (12, 7))
+        assert index.stats((0, 0), (12, 30)).maximum == 0.0
+        assert not index.any_in_range(1.0, 4.0)
+        with pytest.raises(IndexError):
+            index.stats((35, 0), (10, 10))
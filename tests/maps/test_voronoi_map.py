@@ -1,6 +1,11 @@
 
 # Test for VoronoiMap
-from maps.voronoi_map import VoronoiMap
+import numpy as np
+import pytest
+
+from maps.voronoi_map import REGION_ARRAYS, VoronoiMap
+from terrain.noise_ops import VoronoiNoise
+from world.world_data import WorldData
 
 
 class TestVoronoiMap:
@@ -25,3 +30,52 @@ class TestVoronoiMap:
         assert restored_map.graph.has_node(2)
         assert restored_map.graph.has_edge(1, 2)
         assert restored_map.get_data(1)["type"] == "land"
+
+    def test_from_labels(self):
+        labels = np.array([
+            [5, 5, 7],
+            [5, 9, 7],
+            [9, 9, 7],
+        ])
+        voronoi_map = VoronoiMap.from_labels(labels)
+        assert voronoi_map.region_ids.tolist() == [5, 7, 9]
+        assert voronoi_map.areas.tolist() == [3, 3, 3]
+        assert voronoi_map.centroids[0].tolist() == pytest.approx([1 / 3, 1 / 3])
+        lengths = {(int(voronoi_map.region_ids[a]), int(voronoi_map.region_ids[b])): int(length)
+                   for (a, b), length in zip(voronoi_map.boundaries, voronoi_map.boundary_lengths)}
+        assert lengths == {(5, 7): 1, (5, 9): 3, (7, 9): 2}
+        assert voronoi_map.get_data(9)["area"] == 3
+        assert voronoi_map.graph.edges[9, 5]["length"] == 3
+        with pytest.raises(KeyError):
+            voronoi_map.get_data(6)
+
+    def test_compact_storage_round_trip(self, tmp_path):
+        labels, _, _ = VoronoiNoise(regions=40, seed=2).generate_regions((64, 48))
+        voronoi_map = VoronoiMap.from_labels(labels)
+        world = WorldData(meta_data={"width": 64, "height": 48})
+        world.add_map("regions", voronoi_map)
+        world.save(str(tmp_path))
+        restored = WorldData.load(str(tmp_path)).get_map("regions")
+        assert restored.compact
+        for name in REGION_ARRAYS:
+            assert np.array_equal(getattr(restored, name), getattr(voronoi_map, name))
+
+        from_json = VoronoiMap()
+        from_json.from_dict(voronoi_map.to_dict())
+        assert np.array_equal(from_json.boundaries, voronoi_map.boundaries)
+        assert from_json.graph.number_of_edges() == len(voronoi_map.boundaries)
+
+    def test_edits_through_graph_are_kept(self):
+        voronoi_map = VoronoiMap.from_labels(np.array([[1, 1, 2], [3, 2, 2]]))
+        voronoi_map.graph.nodes[1]["type"] = "land"
+        voronoi_map.graph.add_node(99)
+        assert not voronoi_map.compact
+
+        restored = VoronoiMap()
+        restored.from_dict(voronoi_map.to_dict())
+        assert restored.get_data(1)["type"] == "land"
+        assert restored.graph.has_node(99) and restored.graph.has_edge(1, 2)
+
+        empty = VoronoiMap()
+        empty.graph.add_node(5)
+        assert not empty.compact and empty.to_dict()["graph"]["nodes"] == [{"id": 5}]
@@ -0,0 +1,67 @@
+# Test for TileRenderer
+import glob
+import os
+
+import numpy as np
+from PIL import Image
+
+import rendering.tiles as tiles_module
+from rendering.colormaps import colorize, colormap_lut, shaded_lut
+from rendering.tiles import TileRenderer, downsample, hillshade
+
+
+def ramp(size=(300, 200)) -> np.ndarray:
+    x, y = np.indices(size, dtype=np.float32)
+    return (x + y) / (size[0] + size[1] - 2)
+
+
+class TestTileRenderer:
+    def test_colormap_lookup(self):
+        lut = colormap_lut("terrain")
+        assert lut.shape == (256, 3) and lut.dtype == np.uint8
+        assert tuple(lut[-1]) == (255, 255, 255)
+        pixels = colorize(np.array([0.0, 1.0, 2.0]), shaded_lut(lut, 1, 0.35)).view(np.uint8).reshape(-1, 4)
+        assert tuple(pixels[0, :3]) == tuple(lut[0]) and tuple(pixels[2]) == (255, 255, 255, 255)
+
+    def test_hillshade_lights_slopes_facing_the_light(self):
+        x, _ = np.indices((20, 20), dtype=np.float32)
+        # Light from the west (azimuth 270): terrain rising to the east faces it, terrain falling to the east does not
+        assert hillshade(x * 0.1, azimuth=270).mean() > hillshade(-x * 0.1, azimuth=270).mean()
+        assert np.allclose(hillshade(np.zeros((4, 4)), altitude=90), 1)
+
+    def test_downsample_averages_blocks(self):
+        image = np.arange(16, dtype=np.uint8).reshape(2, 2, 4)
+        assert np.array_equal(downsample(image)[0, 0], [6, 7, 8, 9])
+        assert downsample(np.zeros((5, 3, 4), dtype=np.uint8)).shape == (3, 2, 4)
+
+    def test_renders_pyramid_and_skips_unchanged_tiles(self, tmp_path):
+        renderer = TileRenderer(str(tmp_path), tile_size=64, workers=2)
+        values = ramp()
+        stats = renderer.render(values, relief=values)
+        # 300 x 200 cells need zoom 3 (8 x 4 tiles of 64 at 512 x 256 pixels) down to one tile at zoom 0
+        assert renderer.max_zoom((200, 300)) == 3
+        assert stats.written == 5 * 4 + 3 * 2 + 2 * 1 + 1 and stats.skipped == 0
+        tile = np.asarray(Image.open(os.path.join(tmp_path, "3", "4", "3.png")))
+        assert tile.shape == (64, 64, 4)
+        assert np.all(tile[8:, :, 3] == 0) and np.all(tile[:8, :44, 3] == 255)  # Past the map's edge is transparent
+
+        values[:10, :10] = 0
+        again = TileRenderer(str(tmp_path), tile_size=64, workers=2).render(values, relief=values)
+        assert again.written == 4 and again.skipped == stats.written - 4  # One tile per zoom level changed
+
+    def test_unchanged_tiles_are_not_colorized(self, tmp_path, monkeypatch):
+        values = ramp()
+        TileRenderer(str(tmp_path / "tiles"), tile_size=64).render(values, relief=values)
+        shaded = []
+        monkeypatch.setattr(tiles_module, "hillshade", lambda relief: shaded.append(relief.shape) or hillshade(relief))
+        again = TileRenderer(str(tmp_path / "tiles"), tile_size=64).render(values, relief=values)
+        assert again.written == 0 and shaded == []
+
+        # A cell on a tile's edge also shades the tile next to it
+        values[64, 5] = 1
+        TileRenderer(str(tmp_path / "tiles"), tile_size=64).render(values, relief=values)
+        assert shaded == [(65, 65), (66, 65)]  # Tiles (0, 0) and (1, 0) with their margins
+        TileRenderer(str(tmp_path / "fresh"), tile_size=64).render(values, relief=values)
+        for path in glob.glob(str(tmp_path / "fresh" / "*" / "*" / "*.png")):
+            expected = np.asarray(Image.open(path))
+            assert np.array_equal(np.asarray(Image.open(path.replace("fresh", "tiles"))), expected)
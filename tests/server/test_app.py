@@ -0,0 +1,97 @@
+# Test for the job server
+import asyncio
+import json
+
+from server.app import JobServer
+from server.jobs import Job, JobManager, JobRequest
+
+
+async def call(port, method, path, payload=None):
+    """One HTTP request; returns the status and the body (chunked bodies decoded)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    head, _, data = (await reader.read()).partition(b"\r\n\r\n")
+    writer.close()
+    if b"transfer-encoding: chunked" in head.lower():
+        chunks = b""
+        while True:
+            size, _, data = data.partition(b"\r\n")
+            if int(size, 16) == 0:
+                break
+            chunks, data = chunks + data[:int(size, 16)], data[int(size, 16) + 2:]
+        data = chunks
+    return int(head.split()[1]), data
+
+
+class TestJobServer:
+    def test_request_validation(self):
+        request = JobRequest.from_payload({"seed": 3, "size": [64, 48], "params": {"river_threshold": 50}})
+        assert request.params == (("river_threshold", 50.0),)
+        assert request.key == JobRequest.from_payload({"size": [64, 48], "params": {"river_threshold": 50.0}, "seed": 3}).key
+        invalid = (
+            {"size": [0, 10]}, {"colour": "red"}, {"params": {"workers": 4}}, [1, 2],
+            {"params": {"erosion_iterations": 1000000000}}, {"params": {"erosion_iterations": -1}},
+            {"params": {"river_threshold": "nan"}}, {"params": {"river_threshold": "inf"}},
+            {"params": {"river_threshold": -5}}, {"max_depth": "inf"},
+        )
+        for payload in invalid:
+            try:
+                JobRequest.from_payload(payload)
+            except ValueError:
+                continue
+            raise AssertionError(f"{payload} was accepted.")
+
+    def test_evicted_results_lose_their_tiles(self, tmp_path):
+        manager = JobManager(directory=str(tmp_path), result_cache=1)
+        jobs = []
+        for seed in (1, 2):
+            request = JobRequest.from_payload({"seed": seed, "size": [8, 8]})
+            job = Job(request.key, request, str(tmp_path / request.key), status="done", events=[{"event": "done"}])
+            (tmp_path / job.id).mkdir()
+            manager.jobs[job.id] = job
+            jobs.append(job)
+        manager._forget_old_results()
+        assert list(manager.jobs) == [jobs[1].id]
+        assert not (tmp_path / jobs[0].id).exists() and (tmp_path / jobs[1].id).exists()
+
+    def test_jobs_stream_progress_and_share_identical_requests(self, tmp_path):
+        async def scenario():
+            server = JobServer(JobManager(directory=str(tmp_path), workers=1, cache_directory=None), port=0)
+            await server.start()
+            try:
+                payload = {"seed": 7, "size": [96, 80], "params": {"erosion_iterations": 2}}
+                # A burst of identical requests, one of them following the job
+                streamed, first, second = await asyncio.gather(
+                    call(server.port, "POST", "/jobs?stream=1", payload),
+                    call(server.port, "POST", "/jobs", payload),
+                    call(server.port, "POST", "/jobs", payload),
+                )
+                events = [json.loads(line) for line in streamed[1].splitlines()]
+                job_id = events[0]["id"]
+                assert first[0] == second[0] == 202
+                assert {json.loads(first[1])["id"], json.loads(second[1])["id"]} == {job_id}
+                assert server.manager.get(job_id).requests == 3
+
+                kinds = [event["event"] for event in events[1:]]
+                assert kinds[0] == "queued" and kinds[-1] == "done"
+                assert [event["stage"] for event in events[1:] if event["event"] == "stage"] == ["heightmap", "rivers", "climate", "biomes", "graph", "tiles"]
+                tiles = [event for event in events[1:] if event["event"] == "tile"]
+                assert len(tiles) == events[-1]["tiles"] > 0
+                status, png = await call(server.port, "GET", tiles[0]["url"])
+                assert status == 200 and png.startswith(b"\x89PNG")
+
+                # Finished jobs replay their events and are reused
+                status, replay = await call(server.port, "GET", f"/jobs/{job_id}/events")
+                assert [json.loads(line) for line in replay.splitlines()] == events[1:]
+                status, again = await call(server.port, "POST", "/jobs", payload)
+                assert json.loads(again)["reused"] and json.loads(again)["status"] == "done"
+
+                assert (await call(server.port, "GET", "/jobs/unknown"))[0] == 404
+                assert (await call(server.port, "POST", "/jobs", {"size": [-1, 5]}))[0] == 400
+                assert (await call(server.port, "DELETE", f"/jobs/{job_id}"))[0] == 405
+            finally:
+                await server.close()
+
+        asyncio.run(scenario())
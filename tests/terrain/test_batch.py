@@ -0,0 +1,57 @@
+# Test for BatchGenerator
+import numpy as np
+import pytest
+
+from maps.map_orchestrator import MapOrchestrator
+from terrain.batch import BatchGenerator, WorldStats
+from terrain.terrain_generator import TerrainGenerator
+
+
+def make_batch(size=(48, 40), chunk_worlds=2) -> BatchGenerator:
+    batch = BatchGenerator(size, max_elevation=5.0, max_depth=1.0, chunk_worlds=chunk_worlds)
+    batch.erosion_iterations = 3
+    return batch
+
+
+class TestBatchGenerator:
+    def test_worlds_match_terrain_generator(self):
+        # Three seeds over two chunks, two erosion tiles along x
+        elevation, stats = make_batch(size=(300, 40)).generate([7, 42, 1000])
+        assert elevation.shape == (3, 300, 40)
+        for world, seed in zip(elevation, (7, 42, 1000)):
+            generator = TerrainGenerator(MapOrchestrator(size=(300, 40), max_elevation=5.0, max_depth=1.0, seed=seed))
+            generator.erosion_iterations = 3
+            generator.generate_heightmap()
+            assert np.array_equal(world, generator.map.grid.elevation)
+
+    def test_statistics(self):
+        batch = make_batch()
+        elevation, stats = batch.generate([1, 2, 3])
+        assert len(stats) == 3 and np.array_equal(stats.seeds, [1, 2, 3])
+        assert np.allclose(stats.mean_elevation, elevation.mean(axis=(1, 2)))
+        assert np.array_equal(stats.max_elevation, elevation.max(axis=(1, 2)))
+        assert np.allclose(stats.histogram.sum(axis=1), 1)
+        expected, _ = np.histogram(elevation[1], bins=stats.bin_edges)
+        assert np.allclose(stats.histogram[1], expected / elevation[1].size)
+        sea_level = batch.max_depth
+        assert np.allclose(stats.land_fraction, (elevation >= sea_level).mean(axis=(1, 2)))
+        assert len(np.unique(stats.land_fraction)) == 3 and stats.land_fraction.min() < 1
+        assert np.all(stats.ruggedness > 0)
+
+        # A sweep keeps only the statistics, chunk by chunk
+        swept = batch.sweep([1, 2, 3])
+        for name in ("land_fraction", "mean_elevation", "ruggedness", "histogram"):
+            assert np.allclose(getattr(swept, name), getattr(stats, name))
+
+    def test_rank(self):
+        stats = WorldStats(
+            seeds=np.array([10, 20, 30]),
+            land_fraction=np.array([0.2, 0.9, 0.5]),
+            mean_elevation=np.zeros(3), min_elevation=np.zeros(3), max_elevation=np.zeros(3),
+            ruggedness=np.array([3.0, 1.0, 2.0]),
+            histogram=np.zeros((3, 4)), bin_edges=np.linspace(-1, 5, 5),
+        )
+        assert stats.rank("land_fraction").tolist() == [20, 30, 10]
+        assert stats.rank("ruggedness", descending=False).tolist() == [20, 30, 10]
+        with pytest.raises(ValueError):
+            stats.rank("histogram")
@@ -0,0 +1,30 @@
+# Test for BiomeClassifier
+import numpy as np
+import pytest
+
+from terrain.biomes import BiomeClassifier, WHITTAKER_TABLE, OCEAN, SNOW, DESERT, TAIGA, TROPICAL_RAINFOREST
+
+
+class TestBiomeClassifier:
+    def test_every_table_cell(self):
+        classifier = BiomeClassifier(north_temperature=-10.0, south_temperature=30.0, lapse_rate=0.0)
+        # Along y the temperature runs -10, 3.3, 16.7, 30: one land row of the table each; along x one moisture bin each
+        elevation = np.zeros((5, 4))
+        precipitation = np.array([0.0, 0.0007, 0.0015, 0.003, 0.01])[:, np.newaxis].repeat(4, axis=1)
+        biomes = classifier.classify(elevation, precipitation)
+        assert biomes.dtype == np.uint8
+        assert np.array_equal(biomes, WHITTAKER_TABLE[:4].T)
+
+    def test_water_and_altitude(self):
+        classifier = BiomeClassifier(north_temperature=25.0, south_temperature=25.0)
+        elevation = np.array([[0.0, 0.0, 5.0]])
+        precipitation = np.array([[0.01, 0.0, 0.01]])
+        water = np.array([[True, False, False]])
+        assert classifier.classify(elevation, precipitation, water).tolist() == [[OCEAN, DESERT, SNOW]]
+        assert classifier.temperature(np.array([[1.0]]))[0, 0] == pytest.approx(25.0 - classifier.lapse_rate)
+        assert classifier.classify(np.array([[3.5]]), np.array([[0.003]]))[0, 0] == TAIGA
+        assert classifier.classify(np.array([[-0.5]]), np.array([[0.01]]))[0, 0] == TROPICAL_RAINFOREST  # Dry land below sea level
+
+    def test_table_shape(self):
+        with pytest.raises(ValueError):
+            BiomeClassifier().classify(np.zeros((2, 2)), np.zeros((2, 2)), table=WHITTAKER_TABLE[:4])
@@ -0,0 +1,47 @@
+# Test for PrecipitationModel
+import numpy as np
+
+from terrain.climate import PrecipitationModel
+
+
+def ridge(size=(120, 90), centre=60) -> np.ndarray:
+    x = np.arange(size[0])[:, np.newaxis]
+    return np.broadcast_to(2.0 * np.exp(-((x - centre) / 10.0) ** 2), size).astype(np.float32)
+
+
+def row_by_row(model: PrecipitationModel, elevation: np.ndarray, water: np.ndarray) -> np.ndarray:
+    """The recurrence stepped one row at a time, for a wind from the west (along +x)."""
+    moisture = np.full(elevation.shape[1], model.humidity)
+    rain = np.zeros(elevation.shape)
+    for x in range(elevation.shape[0]):
+        grade = (elevation[x] - elevation[max(x - 1, 0)]) / model.cell_size
+        fraction = np.minimum(model.base_rate + model.orographic_rate * np.maximum(grade, 0), model.max_rain_fraction)
+        fraction = fraction * np.exp(-model.lee_drying * np.maximum(-grade, 0))
+        recharge = model.ocean_recharge * water[x]
+        rain[x] = fraction * moisture
+        moisture = (1 - fraction - recharge) * moisture + recharge * model.humidity
+    return rain
+
+
+class TestPrecipitationModel:
+    def test_windward_rain_and_rain_shadow(self):
+        rain = PrecipitationModel(wind_direction=270).simulate(ridge())
+        assert rain[45:60, 45].mean() > 5 * rain[5:20, 45].mean()  # Windward slope vs. plain upwind
+        assert rain[65:110, 45].max() < rain[5:20, 45].mean()  # Lee side
+        flipped = PrecipitationModel(wind_direction=90).simulate(ridge()[::-1].copy())[::-1]
+        assert np.allclose(flipped, rain, atol=1e-6)  # Wind from the east on the mirrored map
+
+    def test_matches_the_recurrence(self):
+        elevation = np.random.default_rng(3).random((150, 40)).astype(np.float32)
+        water = np.zeros(elevation.shape, dtype=bool)
+        water[:30] = water[90:100] = True
+        model = PrecipitationModel(wind_direction=270)
+        assert np.allclose(model.simulate(elevation, water, block=16), row_by_row(model, elevation, water), rtol=1e-4, atol=1e-7)
+
+    def test_any_direction(self):
+        elevation = ridge((80, 80), centre=40)
+        north = PrecipitationModel(wind_direction=0).simulate(elevation.T.copy()).T
+        assert np.allclose(north, PrecipitationModel(wind_direction=270).simulate(elevation), atol=1e-6)
+        for direction in (30.0, 135.0, 222.5):
+            rain = PrecipitationModel(wind_direction=direction).simulate(elevation)
+            assert rain.shape == elevation.shape and np.all(np.isfinite(rain)) and rain.min() >= 0
@@ -0,0 +1,60 @@
+
+# Test for Erosion
+import numpy as np
+import pytest
+
+from terrain.erosion import Erosion, HydraulicErosion, _advect
+from terrain.noise_ops import PerlinNoise
+
+
+def hills(size=(64, 48)) -> np.ndarray:
+    return PerlinNoise(scale=0.08, seed=1, octaves=3).generate(size) * 0.7 + 0.4
+
+
+class TestErosion:
+    def test_deterministic_for_a_seeded_generator(self):
+        first = Erosion.apply(hills(), iterations=20, rng=np.random.default_rng(5))
+        second = Erosion.apply(hills(), iterations=20, rng=np.random.default_rng(5))
+        assert np.array_equal(first, second)
+        assert not np.array_equal(first, Erosion.apply(hills(), iterations=20, rng=np.random.default_rng(6)))
+
+    def test_moves_material_downhill(self):
+        heightmap = hills()
+        eroded = HydraulicErosion().run(heightmap, 100, np.random.default_rng(0))
+        assert np.all(np.isfinite(eroded))
+        change = eroded - heightmap
+        # Peaks lose material, low ground receives some, and little mass is created or lost
+        assert change[heightmap > np.quantile(heightmap, 0.9)].mean() < 0
+        assert change.max() > 0
+        assert abs(change.sum()) < 0.05 * np.abs(change).sum() + 1e-3 * heightmap.size
+
+    def test_stack_with_one_generator_per_map_matches_single_runs(self):
+        stack = np.stack([hills(), hills()[::-1].copy(), hills() * 0.5])
+        eroded = Erosion.apply(stack, iterations=10, rng=[np.random.default_rng(seed) for seed in (1, 2, 3)])
+        for heightmap, result, seed in zip(stack, eroded, (1, 2, 3)):
+            assert np.array_equal(result, Erosion.apply(heightmap, iterations=10, rng=np.random.default_rng(seed)))
+        with pytest.raises(ValueError):
+            Erosion.apply(stack, iterations=1, rng=[np.random.default_rng(1)])
+
+    def test_no_cell_rises_above_its_neighbourhood(self):
+        def height_above_neighbours(heightmap):
+            padded = np.pad(heightmap, 1, mode="edge")
+            neighbours = [padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]]
+            return (heightmap - np.max(neighbours, axis=0)).max()
+
+        for seed in (1, 2, 3):
+            heightmap = PerlinNoise(scale=0.05, seed=seed, octaves=3).generate((96, 96)) * 0.7 + 0.4
+            eroded = Erosion.apply(heightmap, iterations=50, rng=np.random.default_rng(0))
+            # The noise's own bumps stand about 0.01 above their neighbours; deposits must not pile far higher
+            assert height_above_neighbours(eroded) < height_above_neighbours(heightmap) + 0.05
+
+    def test_no_iterations_is_identity(self):
+        heightmap = hills()
+        assert np.allclose(Erosion.apply(heightmap, iterations=0, rng=np.random.default_rng(0)), heightmap)
+
+    def test_advect_shifts_content(self):
+        field = np.zeros((5, 5), dtype=np.float32)
+        field[2, 2] = 1
+        moved = _advect(field, np.ones_like(field), np.zeros_like(field))
+        assert moved[3, 2] == 1 and moved[2, 2] == 0
+        assert np.array_equal(_advect(field, np.zeros_like(field), np.zeros_like(field)), field)
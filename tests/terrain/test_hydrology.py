@@ -0,0 +1,128 @@
+# Test for Hydrology
+import heapq
+
+import numpy as np
+
+from terrain.hydrology import (
+    NO_FLOW,
+    OFF_MAP,
+    d8_flow_directions,
+    extract_rivers,
+    fill_depressions,
+    flow_accumulation,
+    flow_receivers,
+    route_flats,
+    topological_order,
+)
+from terrain.noise_ops import PerlinNoise
+
+
+def brute_force_accumulation(receivers: np.ndarray) -> np.ndarray:
+    """Follows every cell's flow path to its end, counting each visited cell."""
+    accumulation = np.zeros(len(receivers))
+    for cell in range(len(receivers)):
+        accumulation[cell] += 1
+        while receivers[cell] != cell:
+            cell = receivers[cell]
+            accumulation[cell] += 1
+    return accumulation
+
+
+def cellwise_priority_flood(elevation: np.ndarray) -> np.ndarray:
+    """Textbook priority-flood: grow inwards from the border, always from the lowest flooded cell."""
+    size_x, size_y = elevation.shape
+    filled = elevation.astype(np.float32).copy()
+    done = np.zeros(elevation.shape, dtype=bool)
+    done[[0, -1], :] = done[:, [0, -1]] = True
+    heap = [(filled[x, y], x, y) for x, y in zip(*np.nonzero(done))]
+    heapq.heapify(heap)
+    while heap:
+        level, x, y = heapq.heappop(heap)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size_x and 0 <= ny < size_y and not done[nx, ny]:
+                    done[nx, ny] = True
+                    filled[nx, ny] = max(level, filled[nx, ny])
+                    heapq.heappush(heap, (filled[nx, ny], nx, ny))
+    return filled
+
+
+class TestHydrology:
+    def test_directions_follow_steepest_descent(self):
+        x, y = np.indices((5, 6), dtype=np.float32)
+        directions = d8_flow_directions(x + 2 * y)
+        # Steepest drop is diagonal towards -x, -y except along the low edges
+        assert directions[3, 3] == 0
+        assert directions[0, 3] == 3  # Straight towards -y on the x = 0 edge
+        assert directions[0, 0] == NO_FLOW
+        receivers = flow_receivers(directions)
+        assert receivers[3 * 6 + 3] == 2 * 6 + 2
+
+    def test_topological_order_puts_sources_first(self):
+        heightmap = PerlinNoise(scale=0.1, seed=3, octaves=3).generate((40, 30))
+        receivers = flow_receivers(d8_flow_directions(heightmap))
+        order, level_starts = topological_order(receivers)
+        assert np.array_equal(np.sort(order), np.arange(len(receivers)))
+        level = np.empty(len(receivers), dtype=np.int64)
+        for index, (start, stop) in enumerate(zip(level_starts[:-1], level_starts[1:])):
+            level[order[start:stop]] = index
+        flowing = receivers != np.arange(len(receivers))
+        assert np.all(level[flowing] < level[receivers[flowing]])
+
+    def test_accumulation_matches_brute_force(self):
+        heightmap = PerlinNoise(scale=0.07, seed=8, octaves=4).generate((32, 36))
+        receivers = flow_receivers(d8_flow_directions(heightmap))
+        accumulation = flow_accumulation(receivers, topological_order(receivers))
+        assert np.array_equal(accumulation, brute_force_accumulation(receivers))
+
+    def test_rivers_above_threshold(self):
+        x, y = np.indices((20, 20), dtype=np.float32)
+        valley = np.abs(x - 10) + 0.1 * y  # Everything drains into the x = 10 line, which flows to y = 0
+        rivers = extract_rivers(valley, threshold=25)
+        assert set(rivers.coordinates()[:, 0]) == {10}
+        assert rivers.sources().size == 1
+        assert np.all(np.diff(rivers.accumulation[np.argsort(rivers.coordinates()[:, 1])]) < 0)
+        assert rivers.mask().sum() == len(rivers)
+
+    def test_fill_matches_cellwise_priority_flood(self):
+        for seed in range(3):
+            heightmap = PerlinNoise(scale=0.15, seed=seed, octaves=4).generate((40, 50))
+            depressions = fill_depressions(heightmap)
+            assert np.array_equal(depressions.filled, cellwise_priority_flood(heightmap))
+            assert np.all(depressions.depth >= 0)
+            assert np.array_equal(depressions.filled, np.maximum(heightmap, depressions.spill_levels[depressions.basins]))
+
+    def test_pit_becomes_lake_with_spill_point(self):
+        x, y = np.indices((7, 7), dtype=np.float32)
+        slope = x + 1 + 0 * y  # Drains towards x = 0
+        slope[3, 3] = 0.5  # Pit whose lowest neighbours (x = 2) are at 3
+        depressions = fill_depressions(slope)
+        assert depressions.depth[3, 3] == 2.5 and depressions.lakes().sum() == 1
+        lake = depressions.basins[3, 3]
+        assert depressions.spill_levels[lake] == 3
+        spill_cell, spill_target = depressions.spill_cells[lake], depressions.spill_targets[lake]
+        assert depressions.basins.flat[spill_cell] == lake
+        assert depressions.basins.flat[spill_target] != lake and slope.flat[spill_target] <= 3
+        # Basins at the map edge spill straight off the map
+        assert depressions.spill_targets[depressions.basins[0, 0]] == OFF_MAP
+
+    def test_level_areas_are_one_basin(self):
+        heightmap = np.maximum(PerlinNoise(scale=0.15, seed=1, octaves=3).generate((60, 50)), 0)  # Clamped floors, like eroded maps
+        heightmap[20:30, 10:40] = 0  # One floor reaching no border...
+        heightmap[19, 10:40] = heightmap[30, 10:40] = heightmap[19:31, 9] = heightmap[19:31, 40] = 1  # ...walled in
+        depressions = fill_depressions(heightmap)
+        assert np.array_equal(depressions.filled, cellwise_priority_flood(heightmap))
+        assert len(np.unique(depressions.basins[20:30, 10:40])) == 1
+        floors = heightmap == 0
+        assert len(depressions) < np.count_nonzero(floors) // 10
+
+    def test_filled_surface_drains_to_the_border(self):
+        heightmap = PerlinNoise(scale=0.12, seed=4, octaves=3).generate((30, 30))
+        filled = fill_depressions(heightmap).filled
+        receivers = route_flats(filled, flow_receivers(d8_flow_directions(filled)))
+        outlets = receivers
+        for _ in range(filled.size):
+            outlets = outlets[outlets]
+        x, y = np.divmod(outlets, filled.shape[1])
+        assert np.all((x == 0) | (y == 0) | (x == filled.shape[0] - 1) | (y == filled.shape[1] - 1))
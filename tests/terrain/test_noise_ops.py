@@ -0,0 +1,84 @@
+
+# Test for PerlinNoise
+import numpy as np
+
+from terrain.noise_ops import PerlinNoise, VoronoiNoise, nearest_sites
+
+
+class TestPerlinNoise:
+    def test_matches_reference(self):
+        perlin = PerlinNoise(scale=0.1, seed=42)
+        assert np.allclose(perlin.generate((40, 30)), perlin.generate_reference((40, 30)), atol=1e-5)
+
+    def test_fbm_with_offset_matches_reference(self):
+        perlin = PerlinNoise(scale=0.07, seed=3, octaves=4, persistence=0.45, lacunarity=2.1, offset=(-37.5, 12.25))
+        assert np.allclose(perlin.generate((32, 24)), perlin.generate_reference((32, 24)), atol=1e-5)
+
+    def test_chunked_rows_are_identical(self):
+        whole = PerlinNoise(scale=0.1, seed=7, octaves=3).generate((50, 20))
+        chunked = PerlinNoise(scale=0.1, seed=7, octaves=3, chunk_rows=7).generate((50, 20))
+        assert np.array_equal(whole, chunked)
+
+    def test_deterministic_per_seed(self):
+        assert np.array_equal(PerlinNoise(0.1, 5).generate((16, 16)), PerlinNoise(0.1, 5).generate((16, 16)))
+        assert not np.array_equal(PerlinNoise(0.1, 5).generate((16, 16)), PerlinNoise(0.1, 6).generate((16, 16)))
+
+    def test_batch_matches_one_world_per_seed(self):
+        batch = PerlinNoise(scale=0.1, seed=0, octaves=3, chunk_rows=7).generate_batch([5, 300, -2], (20, 16), origin=(-4, 9))
+        for world, seed in zip(batch, (5, 300, -2)):
+            assert np.array_equal(world, PerlinNoise(scale=0.1, seed=seed, octaves=3).generate((20, 16), origin=(-4, 9)))
+
+    def test_seeds_agreeing_modulo_256_differ(self):
+        worlds = PerlinNoise(scale=0.25, seed=0).generate_batch([1, 257, 2], (64, 64))
+        # No world is another one shifted by whole lattice cells (4 cells at this scale)
+        for first, second in [(0, 1), (0, 2), (1, 2)]:
+            for dx in range(-32, 33, 4):
+                for dy in range(-32, 33, 4):
+                    a = worlds[first][max(dx, 0):64 + min(dx, 0), max(dy, 0):64 + min(dy, 0)]
+                    b = worlds[second][max(-dx, 0):64 + min(-dx, 0), max(-dy, 0):64 + min(-dy, 0)]
+                    assert not np.allclose(a, b, atol=1e-4)
+
+
+# Test for VoronoiNoise
+class TestVoronoiNoise:
+    @staticmethod
+    def brute_force(points, size):
+        x, y = np.meshgrid(np.arange(size[0]), np.arange(size[1]), indexing="ij")
+        distances = np.hypot(x[..., np.newaxis] - points[:, 0], y[..., np.newaxis] - points[:, 1])
+        return distances.argmin(axis=-1), np.sort(distances, axis=-1)
+
+    def test_generate_matches_per_pixel_search(self):
+        voronoi = VoronoiNoise(regions=10, seed=42)
+        labels, _ = self.brute_force(voronoi.sites((40, 30)), (40, 30))
+        assert np.array_equal(voronoi.generate((40, 30)), labels / 10)
+
+    def test_regions_f1_f2_with_many_sites(self):
+        rng = np.random.default_rng(0)
+        size = (90, 70)
+        points = rng.random((2000, 2)) * np.array(size)
+        labels, f1, f2 = nearest_sites(points, size)
+        expected_labels, distances = self.brute_force(points, size)
+        assert np.array_equal(labels, expected_labels)
+        assert np.allclose(f1, distances[..., 0], atol=1e-4)
+        assert np.allclose(f2, distances[..., 1], atol=1e-4)
+
+    def test_sparse_sites_fall_back_to_wider_search(self):
+        points = np.array([[0.5, 0.7], [79.3, 58.1], [40.2, 2.9]])
+        labels, f1, f2 = nearest_sites(points, (80, 60), sites_per_bucket=0.01)
+        expected_labels, distances = self.brute_force(points, (80, 60))
+        assert np.array_equal(labels, expected_labels)
+        assert np.allclose(f2, distances[..., 1], atol=1e-4)
+
+    def test_stacked_diagrams_are_independent(self):
+        rng = np.random.default_rng(1)
+        points = rng.random((3, 40, 2)) * np.array([50, 30])
+        labels, f1, f2 = nearest_sites(points, (50, 30), origin=(0.5, -1.0))
+        for index in range(3):
+            expected = nearest_sites(points[index], (50, 30), origin=(0.5, -1.0))
+            assert np.array_equal(labels[index], expected[0])
+            assert np.array_equal(f1[index], expected[1]) and np.array_equal(f2[index], expected[2])
+
+    def test_window_batch_matches_one_world_per_seed(self):
+        batch = VoronoiNoise(regions=10, seed=0, spacing=12.5).generate_window_batch([3, 4], (40, 30), origin=(-7, 20))
+        for world, seed in zip(batch, (3, 4)):
+            assert np.array_equal(world, VoronoiNoise(regions=10, seed=seed, spacing=12.5).generate_window((40, 30), origin=(-7, 20)))
@@ -0,0 +1,101 @@
+
+# Test for TerrainGenerator
+import numpy as np
+
+from maps.grid import WATER
+from maps.map_orchestrator import MapOrchestrator
+from terrain.biomes import OCEAN
+from terrain.erosion import Erosion
+from terrain.terrain_generator import TerrainGenerator
+from utilities.stage_cache import StageCache
+
+
+def make_generator(seed: int = 42, size=(48, 40)) -> TerrainGenerator:
+    return TerrainGenerator(MapOrchestrator(size=size, max_elevation=5.0, max_depth=1.0, seed=seed))
+
+
+class TestTerrainGenerator:
+    def test_adjacent_tiles_match_a_larger_window(self):
+        generator = make_generator()
+        window = generator.generate_window((-32, 224), (64, 64))
+        tiles = [[generator.generate_tile(tx, ty, 32) for ty in (7, 8)] for tx in (-1, 0)]
+        assert np.array_equal(window, np.block(tiles))
+
+    def test_tiles_do_not_depend_on_generation_order(self):
+        first = make_generator()
+        first.generate_tile(3, 4, 32)
+        late = first.generate_tile(0, 0, 32)
+        assert np.array_equal(late, make_generator().generate_tile(0, 0, 32))
+
+    def test_small_tiles_reuse_the_eroded_tile(self, monkeypatch):
+        generator = make_generator()
+        expected = generator.generate_window((0, 0), (64, 32))
+        generator.eroded_tiles.clear()
+        calls = []
+        apply = Erosion.apply
+        monkeypatch.setattr(Erosion, "apply", lambda *args, **kwargs: calls.append(1) or apply(*args, **kwargs))
+        tiles = [generator.generate_tile(tx, 0, 32) for tx in (0, 1)]
+        assert np.array_equal(np.concatenate(tiles), expected)
+        assert len(calls) == 1
+
+        # Anything the tile depends on is part of its key
+        generator.erosion_iterations = 2
+        generator.generate_tile(0, 0, 32)
+        assert len(calls) == 2 and len(generator.eroded_tiles) == 2
+
+    def test_heightmap_is_the_origin_window(self):
+        generator = make_generator()
+        generator.generate_heightmap()
+        assert np.array_equal(generator.map.grid.elevation_map(), generator.generate_window((0, 0), (48, 40)))
+
+    def test_seed_changes_the_world(self):
+        assert not np.array_equal(make_generator(1).generate_tile(0, 0, 16), make_generator(2).generate_tile(0, 0, 16))
+
+    def test_parallel_matches_serial(self):
+        serial = make_generator(size=(300, 270))
+        parallel = TerrainGenerator(MapOrchestrator(size=(300, 270), max_elevation=5.0, max_depth=1.0, seed=42), workers=2)
+        for generator in (serial, parallel):
+            # Tuned parameters reach the workers
+            generator.perlin.scale = 0.03
+            generator.perlin.octaves = 3
+            generator.voronoi.spacing = 40.0
+            generator.erosion_iterations = 20
+        index = parallel.map.grid.spatial_index()
+        serial.generate_heightmap()
+        parallel.generate_heightmap()
+        assert np.array_equal(serial.generate_noise(), parallel.generate_noise())
+        assert np.array_equal(serial.map.grid.elevation, parallel.map.grid.elevation)
+        assert np.array_equal(serial.map.grid.normalized_elevation, parallel.map.grid.normalized_elevation)
+        assert np.array_equal(serial.map.grid.cell_type, parallel.map.grid.cell_type)
+        assert index.highest()[0] == serial.map.grid.elevation.max()
+
+    def test_generated_world_has_ocean(self):
+        generator = make_generator(size=(96, 80))
+        generator.generate()
+        grid = generator.map.grid
+        water = grid.type_map() == WATER
+        assert 0 < water.mean() < 1
+        assert np.array_equal(water, grid.elevation < grid.max_depth)
+        # Biomes are indexed [y, x]
+        assert np.array_equal(generator.map.biomes.grid.T == OCEAN, water)
+
+    def test_cached_stages_rerun_only_downstream_of_a_change(self, tmp_path):
+        cache = StageCache(str(tmp_path))
+        generator = TerrainGenerator(MapOrchestrator(size=(48, 40), max_elevation=5.0, max_depth=1.0, seed=42), cache=cache)
+        generator.generate()
+        first = dict(generator.stage_keys)
+        assert cache.misses == 6 and cache.hits == 0
+        generator.erosion_iterations += 5
+        generator.generate()
+        assert generator.stage_keys["noise"] == first["noise"] and cache.hits == 1
+        assert all(generator.stage_keys[stage] != first[stage] for stage in ("heightmap", "depressions", "rivers", "precipitation", "biomes"))
+        # A new process (empty memory) with the same parameters loads every stage from disk
+        restored = TerrainGenerator(MapOrchestrator(size=(48, 40), max_elevation=5.0, max_depth=1.0, seed=42), cache=StageCache(str(tmp_path)))
+        restored.erosion_iterations = generator.erosion_iterations
+        restored.generate()
+        assert restored.cache.hits == 6 and restored.cache.misses == 0
+        assert np.array_equal(restored.map.grid.elevation, generator.map.grid.elevation)
+        assert np.array_equal(restored.map.grid.cell_type, generator.map.grid.cell_type)
+        assert np.array_equal(restored.map.rivers.mask(), generator.map.rivers.mask())
+        assert np.array_equal(restored.map.precipitation.grid, generator.map.precipitation.grid)
+        assert np.array_equal(restored.map.biomes.grid, generator.map.biomes.grid)
@@ -0,0 +1,42 @@
+# Test for LineOfSight
+import numpy as np
+
+from terrain.viewshed import LineOfSight
+
+
+def hills(size=(120, 100)) -> np.ndarray:
+    x, y = np.mgrid[0:size[0], 0:size[1]] / 100.0
+    return (np.sin(x * 13) * np.cos(y * 9) + 0.5 * np.sin(x * 29 + y * 17)).astype(np.float32)
+
+
+class TestLineOfSight:
+    def test_flat_ground_wall_and_range(self):
+        model = LineOfSight()
+        assert model.viewshed(np.zeros((40, 30)), (3, 4)).all()
+        wall = np.zeros((40, 40), dtype=np.float32)
+        wall[20, :] = 1.0
+        visible = model.viewshed(wall, (10, 10))
+        assert visible[:21].all() and not visible[21:].any()
+        assert model.visible(wall, [[10, 10], [10, 10]], [[19, 30], [30, 10]]).tolist() == [True, False]
+        near = LineOfSight(max_distance=5).viewshed(np.zeros((30, 30)), (15, 15))
+        assert np.array_equal(near, np.hypot(*np.mgrid[-15:15, -15:15]) <= 5)
+
+    def test_viewshed_matches_pairwise_line_of_sight(self):
+        model = LineOfSight()
+        rough = np.random.default_rng(0).random((60, 50)).astype(np.float32)
+        for elevation, observers in [(hills(), [(60, 50), (10, 90), (119, 0)]), (rough, [(30, 25), (0, 49)])]:
+            cells = np.argwhere(np.ones(elevation.shape, dtype=bool))
+            for observer in observers:
+                visible = model.viewshed(elevation, observer)
+                pairwise = model.visible(elevation, np.repeat([observer], len(cells), axis=0), cells).reshape(elevation.shape)
+                assert 0.001 < visible.mean() < 0.99
+                # Every cell the sweep marks visible is visible pairwise, and the other way round
+                assert np.array_equal(visible, pairwise)
+
+    def test_batched_observers_on_workers(self):
+        elevation = hills((60, 50))
+        observers = [(5, 5), (30, 25), (55, 40), (10, 45)]
+        model = LineOfSight()
+        viewsheds = model.viewsheds(elevation, observers, workers=2)
+        assert np.array_equal(viewsheds[1], model.viewshed(elevation, observers[1]))
+        assert np.array_equal(model.coverage(elevation, observers, workers=2), viewsheds.sum(axis=0))
@@ -0,0 +1,28 @@
+# Test for import time and deferred dependencies
+import json
+import os
+import subprocess
+import sys
+
+from config import IMPORT_TIME_BUDGET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("networkx", "noise", "matplotlib", "scipy")
+
+SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import maps, maps.generic_map, maps.map_orchestrator, world.world_data, terrain.terrain_generator
+from maps.generic_map import GenericMap
+GenericMap.from_type("HeightMap")
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))
+"""
+
+
+class TestImports:
+    def test_generation_modules_import_within_budget(self):
+        output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        assert result["loaded"] == []
+        assert result["seconds"] < IMPORT_TIME_BUDGET
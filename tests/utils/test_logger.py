@@ -0,0 +1,63 @@
+# Test for LoggerUtility
+import json
+
+import numpy as np
+
+import utilities.logger as logger_module
+from utilities.logger import LoggerUtility as log, Profiler
+
+
+class TestLoggerUtility:
+    def test_spans_nest_and_aggregate(self):
+        profiler = Profiler()
+        with profiler.span("outer"):
+            for _ in range(3):
+                with profiler.span("inner"):
+                    pass
+        report = profiler.report()
+        assert report["stages"]["inner"]["calls"] == 3
+        assert report["stages"]["outer"]["total_s"] >= report["stages"]["inner"]["total_s"]
+        assert [record["depth"] for record in report["spans"]] == [1, 1, 1, 0]
+        assert report["stages"]["outer"]["peak_bytes"] is None
+
+    def test_memory_peaks(self):
+        profiler = Profiler(trace_memory=True)
+        with profiler.span("outer"):
+            with profiler.span("allocate"):
+                block = np.ones(1_000_000)
+                del block
+            with profiler.span("idle"):
+                pass
+        stages = profiler.report()["stages"]
+        assert stages["allocate"]["peak_bytes"] >= 8_000_000
+        assert stages["idle"]["peak_bytes"] < 1_000_000
+        assert stages["outer"]["peak_bytes"] >= stages["allocate"]["peak_bytes"]
+
+    def test_records_are_capped_but_totals_are_not(self):
+        profiler = Profiler(max_records=2)
+        for _ in range(5):
+            with profiler.span("step"):
+                pass
+        report = profiler.report()
+        assert len(report["spans"]) == 2 and report["dropped_spans"] == 3
+        assert report["stages"]["step"]["calls"] == 5
+
+    def test_log_method_times_calls_and_writes_report(self, tmp_path):
+        @log.log_method
+        def double(value):
+            return value * 2
+
+        calls = logger_module.profiler.stages.get(double.__qualname__, {}).get("calls", 0)
+        assert double(4) == 8
+        assert logger_module.profiler.stages[double.__qualname__]["calls"] == calls + 1
+        log.write_report(str(tmp_path / "profile.json"))
+        with open(tmp_path / "profile.json") as file:
+            assert double.__qualname__ in json.load(file)["stages"]
+
+    def test_log_method_can_be_a_no_op(self, monkeypatch):
+        monkeypatch.setattr(logger_module, "LOG_METHOD_ENABLED", False)
+
+        def method():
+            return 1
+
+        assert log.log_method(method) is method
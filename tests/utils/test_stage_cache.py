@@ -0,0 +1,31 @@
+# Test for StageCache
+import numpy as np
+
+from utilities.stage_cache import StageCache
+
+
+class TestStageCache:
+    def test_keys_depend_on_every_input(self):
+        key = StageCache.key("noise", 1, {"scale": 0.1}, ["abc"])
+        assert key == StageCache.key("noise", 1, {"scale": 0.1}, ["abc"])
+        assert len({key, StageCache.key("noise", 2, {"scale": 0.1}, ["abc"]), StageCache.key("noise", 1, {"scale": 0.2}, ["abc"]),
+                    StageCache.key("noise", 1, {"scale": 0.1}, ["abd"]), StageCache.key("erosion", 1, {"scale": 0.1}, ["abc"])}) == 5
+        assert StageCache.digest(np.zeros(4)) != StageCache.digest(np.zeros(4, dtype=np.float32))
+
+    def test_computes_once_and_reloads_from_disk(self, tmp_path):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"values": np.arange(6).reshape(2, 3)}
+
+        cache = StageCache(str(tmp_path), memory_entries=1)
+        key, fresh = cache.run("stage", 0, {}, compute)
+        _, cached = cache.run("stage", 0, {}, compute)
+        assert len(calls) == 1 and np.array_equal(fresh["values"], cached["values"])
+        assert not cached["values"].flags.writeable
+        cache.run("other", 0, {}, compute)  # Evicts the first output from memory
+        assert key not in cache.entries and np.array_equal(cache.get(key)["values"], fresh["values"])
+        assert np.array_equal(StageCache(str(tmp_path)).get(key)["values"], fresh["values"])
+        cache.clear()
+        assert cache.get(key) is None
@@ -0,0 +1,99 @@
+# Test for WorldData
+import json
+import os
+
+import numpy as np
+import pytest
+
+from maps.grid_map import GridMap
+from maps.height_map import HeightMap
+from maps.precipitation_map import PrecipitationMap
+from maps.voronoi_map import VoronoiMap
+from world.world_data import WORLD_MANIFEST, WorldData
+
+
+def sample_world() -> WorldData:
+    world = WorldData(meta_data={"width": 6, "height": 4, "seed": 7})
+    heights = HeightMap(width=6, height=4, height_range=(0, 5000))
+    heights.grid = np.arange(24, dtype=np.float32).reshape(4, 6)
+    heights.normal_grid = heights.grid / 23
+    world.add_map("heights", heights)
+    world.add_map("rain", PrecipitationMap(width=6, height=4, default_value=0.5))
+    regions = VoronoiMap()
+    regions.add_region(node_id=1, properties={"type": "land"})
+    world.add_map("regions", regions)
+    return world
+
+
+class TestWorldData:
+    def test_save_and_load_round_trip(self, tmp_path):
+        sample_world().save(str(tmp_path), chunk_rows=3)
+        loaded = WorldData.load(str(tmp_path))
+        assert loaded.seed == 7 and loaded.width == 6
+        heights = loaded.get_map("heights")
+        assert isinstance(heights, HeightMap) and heights.height_range == (0, 5000)
+        assert isinstance(heights.grid, np.memmap) and not heights.grid.flags.writeable
+        assert np.array_equal(heights.grid, np.arange(24, dtype=np.float32).reshape(4, 6))
+        assert heights.get_data(2, 1) == 8
+        assert isinstance(loaded.get_map("rain"), PrecipitationMap)
+        assert loaded.get_map("regions").get_data(1)["type"] == "land"
+
+    def test_arrays_stay_out_of_the_manifest(self, tmp_path):
+        sample_world().save(str(tmp_path))
+        with open(os.path.join(tmp_path, WORLD_MANIFEST)) as file:
+            manifest = json.load(file)
+        assert "grid" not in manifest["maps"]["heights"]["metadata"]
+        assert manifest["maps"]["heights"]["arrays"]["grid"]["shape"] == [4, 6]
+
+    def test_read_window(self, tmp_path):
+        sample_world().save(str(tmp_path))
+        window = WorldData.read_window(str(tmp_path), "heights", origin=(1, 2), size=(3, 2))
+        assert np.array_equal(window, np.arange(24, dtype=np.float32).reshape(4, 6)[2:4, 1:4])
+        with pytest.raises(IndexError):
+            WorldData.read_window(str(tmp_path), "heights", origin=(5, 0), size=(3, 1))
+
+    def test_interrupted_save_over_a_world_is_not_loadable(self, tmp_path, monkeypatch):
+        sample_world().save(str(tmp_path))
+
+        def interrupted(*args, **kwargs):
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(np.lib.format, "open_memmap", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            sample_world().save(str(tmp_path))
+        with pytest.raises(FileNotFoundError):
+            WorldData.load(str(tmp_path))
+
+    def test_save_into_the_loaded_directory(self, tmp_path):
+        world = sample_world()
+        big = GridMap(width=300, height=200, dtype="float32")
+        big.set_region((0, 0), np.arange(60000, dtype=np.float32).reshape(200, 300))
+        world.add_map("big", big)
+        world.save(str(tmp_path))
+        loaded = WorldData.load(str(tmp_path))
+        del loaded.maps["rain"]
+        loaded.save(str(tmp_path), chunk_rows=7)
+        reloaded = WorldData.load(str(tmp_path))
+        assert np.array_equal(reloaded.get_map("big").grid, np.arange(60000, dtype=np.float32).reshape(200, 300))
+        assert np.array_equal(reloaded.get_map("heights").grid, np.arange(24, dtype=np.float32).reshape(4, 6))
+        assert "rain" not in reloaded.maps
+        assert not [name for name in os.listdir(tmp_path) if name.startswith("rain") or name.endswith(".tmp")]
+
+    def test_map_names_stay_inside_the_directory(self, tmp_path):
+        world = WorldData(meta_data={"width": 3, "height": 2})
+        world.add_map("../outside", GridMap(width=3, height=2, default_value=1.0))
+        world.add_map("_._outside", GridMap(width=3, height=2, default_value=2.0))
+        world.save(str(tmp_path / "world"))
+        assert sorted(os.listdir(tmp_path)) == ["world"]
+        assert len(os.listdir(tmp_path / "world")) == 3
+        loaded = WorldData.load(str(tmp_path / "world"))
+        assert loaded.get_map("../outside").get_data(0, 0) == 1.0
+        assert loaded.get_map("_._outside").get_data(0, 0) == 2.0
+
+    def test_json_round_trip_uses_map_types(self, tmp_path):
+        world = WorldData(meta_data={"seed": 1})
+        world.add_map("base", GridMap(width=3, height=2, default_value=1.0))
+        world.to_json(str(tmp_path / "world.json"))
+        loaded = WorldData.from_json(str(tmp_path / "world.json"))
+        assert type(loaded.get_map("base")) is GridMap
+        assert np.array_equal(loaded.get_map("base").grid, np.ones((2, 3)))
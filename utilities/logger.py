@@ -1,14 +1,24 @@
+import json
 import logging
+import os
+import reprlib
 import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
 from loguru import logger
 from functools import wraps
 from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
 from config import (
     LOGGING_LEVEL,
     ENABLE_TERMINAL_LOGGING,
     ENABLE_FILE_LOGGING,
     LOG_FILE_PATH,
     VERBOSE_LOGGING,
+    LOG_METHOD_ENABLED,
+    PROFILE_MEMORY,
+    PROFILE_MAX_RECORDS,
 )
 
 # InterceptHandler to route standard logging calls to Loguru
@@ -42,6 +52,109 @@ if ENABLE_FILE_LOGGING:
     )
 
 
+# Bounded reprs for logged arguments, so logging a call never stringifies a whole grid
+_short_repr = reprlib.Repr()
+_short_repr.maxstring = _short_repr.maxother = 200
+
+
+class Profiler:
+    """
+    Collects timed spans (perf_counter_ns) for the per-run report: totals per stage name, and
+    the individual spans in start order. With trace_memory, each span also records the peak
+    memory traced by tracemalloc while it ran, above what was allocated when it started.
+    """
+
+    def __init__(self, trace_memory: bool = PROFILE_MEMORY, max_records: int = PROFILE_MAX_RECORDS) -> None:
+        self.trace_memory = trace_memory
+        self.max_records = max_records
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets every recorded span."""
+        self.started: float = time.time()
+        self.origin_ns: int = time.perf_counter_ns()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.records: List[Dict[str, Any]] = []
+        self.dropped: int = 0
+        self._stack: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Times the enclosed block as one span of the stage name; spans nest."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        frame: Dict[str, Any] = {"peak": 0}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["base"] = current
+        self._stack.append(frame)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self._stack.pop()
+            peak_bytes = None
+            if self.trace_memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                peak_bytes = peak - frame["base"]
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            self._record(name, start, elapsed, len(self._stack), peak_bytes)
+
+    def _record(self, name: str, start: int, elapsed: int, depth: int, peak_bytes: Optional[int]) -> None:
+        stage = self.stages.setdefault(name, {"calls": 0, "total_ns": 0, "max_ns": 0, "peak_bytes": None})
+        stage["calls"] += 1
+        stage["total_ns"] += elapsed
+        stage["max_ns"] = max(stage["max_ns"], elapsed)
+        if peak_bytes is not None:
+            stage["peak_bytes"] = max(stage["peak_bytes"] or 0, peak_bytes)
+        if len(self.records) < self.max_records:
+            self.records.append({
+                "name": name,
+                "start_s": (start - self.origin_ns) / 1e9,
+                "duration_s": elapsed / 1e9,
+                "depth": depth,
+                "peak_bytes": peak_bytes,
+            })
+        else:
+            self.dropped += 1
+
+    def report(self) -> Dict[str, Any]:
+        """The JSON-serializable report of everything recorded since the last reset."""
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "wall_time_s": (time.perf_counter_ns() - self.origin_ns) / 1e9,
+            "memory_traced": self.trace_memory,
+            "stages": {
+                name: {
+                    "calls": stage["calls"],
+                    "total_s": stage["total_ns"] / 1e9,
+                    "mean_s": stage["total_ns"] / stage["calls"] / 1e9,
+                    "max_s": stage["max_ns"] / 1e9,
+                    "peak_bytes": stage["peak_bytes"],
+                }
+                for name, stage in sorted(self.stages.items(), key=lambda item: -item[1]["total_ns"])
+            },
+            "spans": self.records,
+            "dropped_spans": self.dropped,
+        }
+
+    def write_report(self, path: str) -> None:
+        """Writes the report as JSON."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=4)
+
+
+profiler = Profiler()
+
+
 class LoggerUtility:
     """Wrapper around Loguru for standardized logging and decorators."""
 
@@ -89,33 +202,50 @@ class LoggerUtility:
     def exception(message: str):
         logger.exception(message)
 
+    @staticmethod
+    def span(name: str):
+        """Context manager timing the enclosed block as a stage of the profiling report."""
+        return profiler.span(name)
+
+    @staticmethod
+    def write_report(path: str) -> None:
+        """Writes the per-run JSON report of stage timings."""
+        profiler.write_report(path)
+        logger.info(f"Profiling report written to {path}.")
+
     @staticmethod
     def log_method(func):
-        """Decorator to log method details (inputs, outputs, exceptions)."""
+        """
+        Decorator to log method details (inputs, outputs, exceptions) and time each call as a
+        profiling span. Messages are only formatted if a handler takes DEBUG records. With
+        LOG_METHOD_ENABLED off, the method is returned untouched.
+        """
+        if not LOG_METHOD_ENABLED:
+            return func
+        name = func.__qualname__
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            logger.debug(f"Entering: {func.__qualname__}:\n\t args:\n\t\t {args},\n\t kwargs:\n\t\t {kwargs}")
-
+            lazy = logger.opt(lazy=True)
+            lazy.debug("Entering: {}:\n\t args:\n\t\t {},\n\t kwargs:\n\t\t {}",
+                       lambda: name, lambda: _short_repr.repr(args), lambda: _short_repr.repr(kwargs))
+            start = time.perf_counter_ns()
             try:
-                result = func(*args, **kwargs)
-                exec_time = f"{(datetime.now() - datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')).total_seconds():.4f}s"
-
-                # Log the result and execution time
-                if VERBOSE_LOGGING:
-                    logger.debug(
-                        f"Exiting: {func.__qualname__}:\n\t Execution Time: {exec_time},\n\t Args:\n\t\t {args},\n\t Kwargs:\n\t\t {kwargs},\n\t Result: \n\t\t{result}"
-                    )
-                else:
-                    logger.debug(
-                        f"Exiting: {func.__qualname__}:\n\t Execution Time: {exec_time}"
-                    )
-                return result
-
+                with profiler.span(name):
+                    result = func(*args, **kwargs)
             except Exception as e:
                 # Log exceptions
                 logger.exception(f"Exception in {func.__name__}: {e}")
                 raise
 
+            exec_time = f"{(time.perf_counter_ns() - start) / 1e9:.4f}s"
+            # Log the result and execution time
+            if VERBOSE_LOGGING:
+                lazy.debug("Exiting: {}:\n\t Execution Time: {},\n\t Args:\n\t\t {},\n\t Kwargs:\n\t\t {},\n\t Result: \n\t\t{}",
+                           lambda: name, lambda: exec_time, lambda: _short_repr.repr(args),
+                           lambda: _short_repr.repr(kwargs), lambda: _short_repr.repr(result))
+            else:
+                lazy.debug("Exiting: {}:\n\t Execution Time: {}", lambda: name, lambda: exec_time)
+            return result
+
         return wrapper
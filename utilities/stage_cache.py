@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import glob
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import numpy as np
+from utilities.logger import LoggerUtility as log
+from config import STAGE_CACHE_DIR, STAGE_CACHE_MEMORY_ENTRIES
+
+STAGE_CACHE_VERSION: int = 5  # Part of every key; bump when a stage computes something else from the same parameters
+
+Arrays = Dict[str, np.ndarray]
+
+
+def _jsonable(value: Any) -> Any:
+    """Turns NumPy scalars and arrays in stage parameters into plain JSON values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return repr(value)
+
+
+class StageCache:
+    """
+    Content-addressed store of pipeline stage outputs (named arrays): one .npz file per output on
+    disk, plus an in-memory LRU of the most recent ones.
+
+    The key of an output hashes the stage name, the seed, the stage's parameters and the keys (or
+    content hashes) of its inputs. A parameter change thus changes the key of its stage and, through
+    the inputs, of every stage downstream, while the stages upstream keep their keys and hit.
+    """
+
+    def __init__(self, directory: Optional[str] = STAGE_CACHE_DIR, memory_entries: int = STAGE_CACHE_MEMORY_ENTRIES) -> None:
+        self.directory = directory  # None keeps outputs in memory only
+        self.memory_entries = memory_entries
+        self.entries: "OrderedDict[str, Arrays]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(directory={self.directory!r}, memory_entries={self.memory_entries})"
+
+    @staticmethod
+    def key(stage: str, seed: int, params: Dict[str, Any], upstream: Sequence[str] = ()) -> str:
+        """Returns the key of a stage's output from everything that determines it."""
+        recipe = json.dumps(
+            {"version": STAGE_CACHE_VERSION, "stage": stage, "seed": seed, "params": params, "upstream": list(upstream)},
+            sort_keys=True, default=_jsonable,
+        )
+        return hashlib.blake2b(recipe.encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def digest(array: np.ndarray) -> str:
+        """Returns the content hash of an array (dtype, shape and values), for inputs no stage produced."""
+        array = np.ascontiguousarray(array)
+        hasher = hashlib.blake2b(f"{array.dtype.str}{array.shape}".encode(), digest_size=16)
+        hasher.update(memoryview(array).cast("B"))
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> Optional[Arrays]:
+        """Returns the output stored under key (from memory, else from disk), or None."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        return self._remember(key, arrays)
+
+    def put(self, key: str, arrays: Arrays) -> None:
+        """
+        Stores a copy of an output; the file is written under a temporary name (one per process, so
+        processes sharing the directory never write the same file) and then renamed.
+        """
+        arrays = {name: np.array(value) for name, value in arrays.items()}
+        path = self._path(key)
+        if path is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(temporary, path)
+        self._remember(key, arrays)
+
+    def run(self, stage: str, seed: int, params: Dict[str, Any], compute: Callable[[], Arrays],
+            upstream: Sequence[str] = ()) -> Tuple[str, Arrays]:
+        """
+        Returns the key and output of a stage, computing and storing it only when it is not cached.
+        Cached outputs are shared and read-only; a fresh output is returned as compute made it.
+        """
+        key = self.key(stage, seed, params, upstream)
+        arrays = self.get(key)
+        if arrays is not None:
+            self.hits += 1
+            log.info(f"Stage '{stage}' loaded from the cache ({key}).")
+            return key, arrays
+        self.misses += 1
+        arrays = compute()
+        self.put(key, arrays)
+        log.info(f"Stage '{stage}' computed and cached ({key}).")
+        return key, arrays
+
+    def clear(self) -> None:
+        """Drops every stored output, in memory and on disk."""
+        self.entries.clear()
+        if self.directory is not None:
+            for path in glob.glob(os.path.join(self.directory, "*.npz")):
+                os.remove(path)
+
+    def _path(self, key: str) -> Optional[str]:
+        return os.path.join(self.directory, f"{key}.npz") if self.directory is not None else None
+
+    def _remember(self, key: str, arrays: Arrays) -> Arrays:
+        for array in arrays.values():
+            array.setflags(write=False)
+        self.entries[key] = arrays
+        while len(self.entries) > self.memory_entries:
+            self.entries.popitem(last=False)
+        return arrays
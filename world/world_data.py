@@ -1,7 +1,16 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 from dataclasses import dataclass, field
+import hashlib
 import json
+import os
+import re
+import numpy as np
 from maps.generic_map import GenericMap
+from config import WORLD_CHUNK_ROWS
+
+WORLD_FORMAT: str = "terrain-world"
+WORLD_FORMAT_VERSION: int = 1
+WORLD_MANIFEST: str = "manifest.json"  # Inside a world directory, next to one .npy file per map array
 
 @dataclass
 class WorldData:
@@ -70,3 +79,108 @@ class WorldData:
             map_obj.from_dict(map_data)
             instance.add_map(name, map_obj)
         return instance
+
+    def save(self, directory: str, chunk_rows: int = WORLD_CHUNK_ROWS) -> None:
+        """
+        Save the WorldData as a binary world directory: a small JSON manifest plus one row-major
+        .npy file per map array, copied in chunks of rows so memory-mapped sources are never
+        loaded whole. Any previous manifest is removed before the arrays are written and the new
+        one is written last, so an interrupted save (even over an existing world) is never loadable.
+
+        Every array is written to a temporary file and moved into place, so a world saved into the
+        directory it was loaded from keeps reading its memory-mapped sources until they are copied.
+        .npy files the new manifest does not list are removed.
+        """
+        os.makedirs(directory, exist_ok=True)
+        try:
+            os.remove(os.path.join(directory, WORLD_MANIFEST))
+        except FileNotFoundError:
+            pass
+        manifest: Dict[str, Any] = {
+            "format": WORLD_FORMAT,
+            "version": WORLD_FORMAT_VERSION,
+            "meta_data": self.meta_data,
+            "maps": {},
+        }
+        for map_name, map_obj in self.maps.items():
+            metadata, arrays = map_obj.to_arrays()
+            entry: Dict[str, Any] = {"metadata": metadata, "arrays": {}}
+            for key, array in arrays.items():
+                filename = f"{_file_stem(map_name)}.{_file_stem(key)}.npy"
+                path = os.path.join(directory, filename)
+                target = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=array.dtype, shape=array.shape)
+                for row in range(0, max(len(array), 1), chunk_rows):
+                    target[row:row + chunk_rows] = array[row:row + chunk_rows]
+                target.flush()
+                del target
+                os.replace(path + ".tmp", path)
+                entry["arrays"][key] = {"file": filename, "dtype": array.dtype.str, "shape": list(array.shape)}
+            manifest["maps"][map_name] = entry
+        listed = {info["file"] for entry in manifest["maps"].values() for info in entry["arrays"].values()}
+        for filename in os.listdir(directory):
+            if filename.endswith((".npy", ".npy.tmp")) and filename not in listed:
+                os.remove(os.path.join(directory, filename))
+        with open(os.path.join(directory, WORLD_MANIFEST), "w") as file:
+            json.dump(manifest, file, indent=4)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "WorldData":
+        """
+        Load a world directory written by save. With mmap the map arrays are read-only memory maps,
+        so opening is immediate and only the parts that are used get read from disk.
+        """
+        manifest = cls.read_manifest(directory)
+        instance = cls(meta_data=manifest["meta_data"])
+        for name, entry in manifest["maps"].items():
+            arrays = {
+                key: np.load(os.path.join(directory, info["file"]), mmap_mode="r" if mmap else None)
+                for key, info in entry["arrays"].items()
+            }
+            map_obj = GenericMap.from_type(entry["metadata"]["type"])
+            map_obj.from_arrays(entry["metadata"], arrays)
+            instance.add_map(name, map_obj)
+        return instance
+
+    @staticmethod
+    def read_manifest(directory: str) -> Dict[str, Any]:
+        """Read and check the manifest of a world directory."""
+        with open(os.path.join(directory, WORLD_MANIFEST), "r") as file:
+            manifest = json.load(file)
+        if manifest.get("format") != WORLD_FORMAT or manifest.get("version", 0) > WORLD_FORMAT_VERSION:
+            raise ValueError(f"{directory} is not a world directory this version can read.")
+        return manifest
+
+    @classmethod
+    def read_window(cls, directory: str, name: str, origin: Tuple[int, int], size: Tuple[int, int],
+                    array: str = "grid") -> np.ndarray:
+        """
+        Read a rectangular window of one map array straight from a world directory, without loading
+        the rest of the world.
+
+        Args:
+            directory (str): The world directory.
+            name (str): The map name.
+            origin (Tuple[int, int]): The (x, y) of the window's first cell.
+            size (Tuple[int, int]): The (width, height) of the window.
+            array (str): Which array of the map to read.
+
+        Returns:
+            np.ndarray: The (height, width) window.
+        """
+        info = cls.read_manifest(directory)["maps"][name]["arrays"][array]
+        data = np.load(os.path.join(directory, info["file"]), mmap_mode="r")
+        (x, y), (width, height) = origin, size
+        if x < 0 or y < 0 or y + height > data.shape[0] or x + width > data.shape[1]:
+            raise IndexError(f"Window {origin}+{size} is outside map '{name}' of shape {data.shape}.")
+        return np.array(data[y:y + height, x:x + width])
+
+
+def _file_stem(name: str) -> str:
+    """
+    A file name part for a map or array name: characters other than letters, digits, "_" and "-"
+    become "_", and a name that had any gets a short hash of the original so stems stay distinct.
+    """
+    stem = re.sub(r"[^A-Za-z0-9_-]", "_", name)
+    if stem != name or not stem:
+        stem += "-" + hashlib.blake2b(name.encode(), digest_size=4).hexdigest()
+    return stem